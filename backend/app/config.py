@@ -0,0 +1,160 @@
+"""
+运行时配置
+所有配置项均可通过环境变量覆盖
+"""
+import json
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_json(name: str, default):
+    value = os.environ.get(name)
+    return json.loads(value) if value else default
+
+
+# ========== LLM HTTP 连接池 ==========
+
+# 每个 baseUrl 的最大连接数
+LLM_POOL_MAX_CONNECTIONS = _env_int("LLM_POOL_MAX_CONNECTIONS", 20)
+# 每个 baseUrl 保持的最大空闲长连接数
+LLM_POOL_MAX_KEEPALIVE = _env_int("LLM_POOL_MAX_KEEPALIVE", 10)
+# 空闲长连接的保活时间（秒）
+LLM_POOL_KEEPALIVE_EXPIRY = _env_float("LLM_POOL_KEEPALIVE_EXPIRY", 60.0)
+# 是否启用 HTTP/2（需要安装 h2，未安装时自动回退到 HTTP/1.1）
+LLM_HTTP2 = _env_bool("LLM_HTTP2", True)
+
+# ========== LLM 响应缓存 ==========
+
+# 是否启用响应缓存
+LLM_CACHE_ENABLED = _env_bool("LLM_CACHE_ENABLED", True)
+# 内存 LRU 条目数
+LLM_CACHE_MEMORY_SIZE = _env_int("LLM_CACHE_MEMORY_SIZE", 256)
+# SQLite 缓存最大条目数，超出后按最近访问时间淘汰
+LLM_CACHE_MAX_ENTRIES = _env_int("LLM_CACHE_MAX_ENTRIES", 5000)
+# 缓存有效期（秒）
+LLM_CACHE_TTL = _env_float("LLM_CACHE_TTL", 24 * 3600)
+
+# ========== LLM 限流与熔断 ==========
+
+# 每个供应商（baseUrl + 模型）的平均请求速率（次/秒），0 表示不限速
+LLM_RATE_LIMIT_RPS = _env_float("LLM_RATE_LIMIT_RPS", 5.0)
+# 令牌桶容量（允许的突发请求数）
+LLM_RATE_LIMIT_BURST = _env_int("LLM_RATE_LIMIT_BURST", 10)
+# 每个供应商的最大并发请求数
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 8)
+# 429/5xx/连接错误的最大重试次数
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 3)
+# 指数退避的初始等待时间（秒）
+LLM_RETRY_BASE_DELAY = _env_float("LLM_RETRY_BASE_DELAY", 0.5)
+# 单次重试的最长等待时间（秒），Retry-After 超过该值时不再重试
+LLM_RETRY_MAX_DELAY = _env_float("LLM_RETRY_MAX_DELAY", 20.0)
+# 连续失败多少次后打开熔断器
+LLM_BREAKER_FAILURE_THRESHOLD = _env_int("LLM_BREAKER_FAILURE_THRESHOLD", 5)
+# 熔断后的冷却时间（秒），之后放行一个探测请求
+LLM_BREAKER_RECOVERY_TIMEOUT = _env_float("LLM_BREAKER_RECOVERY_TIMEOUT", 30.0)
+
+# ========== 多供应商故障转移与对冲 ==========
+
+# 是否在配置了备用供应商时启用对冲请求（关闭后仅在失败时故障转移）
+LLM_HEDGE_ENABLED = _env_bool("LLM_HEDGE_ENABLED", True)
+# 固定的对冲等待时间（秒），0 表示按供应商最近响应耗时的 p95 自动计算
+LLM_HEDGE_DELAY = _env_float("LLM_HEDGE_DELAY", 0.0)
+# 自动计算 p95 所需的最少样本数
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", 20)
+# 样本不足时的对冲等待时间（秒）
+LLM_HEDGE_DEFAULT_DELAY = _env_float("LLM_HEDGE_DEFAULT_DELAY", 20.0)
+
+# ========== 对话上下文窗口 ==========
+
+# 原文保留的最近消息条数，更早的消息折叠进滚动摘要
+CONTEXT_KEEP_TURNS = _env_int("CONTEXT_KEEP_TURNS", 12)
+# 超出 token 预算时，原文保留条数的下限
+CONTEXT_MIN_KEEP_TURNS = _env_int("CONTEXT_MIN_KEEP_TURNS", 2)
+# 分析提示词的 token 预算（估算值）
+CONTEXT_TOKEN_BUDGET = _env_int("CONTEXT_TOKEN_BUDGET", 6000)
+# 滚动摘要的最大字数
+CONTEXT_SUMMARY_MAX_CHARS = _env_int("CONTEXT_SUMMARY_MAX_CHARS", 400)
+# 超出保留条数的消息累计到多少条时才在后台用 LLM 更新滚动摘要（此前以原文随分析发送）
+CONTEXT_SUMMARY_BATCH = _env_int("CONTEXT_SUMMARY_BATCH", 6)
+
+# ========== 预分析 ==========
+
+# 保存买家消息时（请求携带 llmConfig）是否默认在后台提前分析，请求中的 preAnalyze 可覆盖
+SPECULATIVE_ANALYSIS = _env_bool("SPECULATIVE_ANALYSIS", False)
+
+# ========== 异步分析任务 ==========
+
+# 后台执行分析任务的 worker 数（同时进行的分析任务上限）
+ANALYSIS_WORKERS = _env_int("ANALYSIS_WORKERS", 4)
+# GET /jobs/{id}?wait= 长轮询的最长等待时间（秒）
+JOB_WAIT_MAX = _env_float("JOB_WAIT_MAX", 60)
+# 执行中的任务每隔多少秒续约一次（多进程部署时标记任务仍由本进程执行）
+JOB_HEARTBEAT_INTERVAL = _env_float("JOB_HEARTBEAT_INTERVAL", 15)
+# 执行中的任务超过多少秒未续约视为执行它的进程已退出，重新排队
+JOB_LEASE_TIMEOUT = _env_float("JOB_LEASE_TIMEOUT", 60)
+
+# ========== 批量分析 ==========
+
+# 批量分析时同时进行的会话分析数
+BATCH_ANALYZE_CONCURRENCY = _env_int("BATCH_ANALYZE_CONCURRENCY", 4)
+# 分析结果攒批写入数据库：每批最多条数
+BATCH_WRITE_SIZE = _env_int("BATCH_WRITE_SIZE", 20)
+# 分析结果攒批写入数据库：最长等待时间（秒）
+BATCH_WRITE_DELAY = _env_float("BATCH_WRITE_DELAY", 0.05)
+
+# ========== 本地规则预提取 ==========
+
+# 对话开头的“在吗”“谢谢”等简单消息是否直接使用模板回复（不调用 LLM；已有上文或累积信息时始终交给 LLM）
+LOCAL_REPLY_ENABLED = _env_bool("LOCAL_REPLY_ENABLED", True)
+# “好的”“可以”等确认类消息是否也使用模板回复（同样仅限对话开头；之后的确认可能是接受成交，默认交给 LLM）
+LOCAL_REPLY_ACK_ENABLED = _env_bool("LOCAL_REPLY_ACK_ENABLED", False)
+
+# ========== 本地报价 ==========
+
+# LLM 报价与本地规则报价区间的允许偏差比例，超出时以本地报价为准
+PRICE_CHECK_TOLERANCE = _env_float("PRICE_CHECK_TOLERANCE", 0.3)
+
+# ========== 运行指标 ==========
+
+# 是否记录 /metrics 导出的耗时指标
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# ========== LLM 用量与成本 ==========
+
+# 各模型每百万 token 的单价（JSON），如 {"deepseek-chat": {"input": 2, "output": 8}}，"*" 为默认单价
+LLM_PRICING = _env_json("LLM_PRICING", {})
+
+# ========== 数据库 ==========
+
+# 执行数据库操作的专用线程数（异步代码通过 run_in_db 调用，避免阻塞事件循环）
+DB_EXECUTOR_WORKERS = _env_int("DB_EXECUTOR_WORKERS", 4)
+# 执行中与排队中的数据库操作上限，超出时调用方等待
+DB_EXECUTOR_QUEUE_SIZE = _env_int("DB_EXECUTOR_QUEUE_SIZE", 256)
+# 连接池大小（复用的 SQLite 连接数，应不小于 DB_EXECUTOR_WORKERS），0 为每次操作新建连接
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 8)
+# 连接池耗尽时获取连接的最长等待时间（秒）
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 10.0)
+# 等待其他连接释放写锁的最长时间（毫秒，PRAGMA busy_timeout）
+DB_BUSY_TIMEOUT_MS = _env_int("DB_BUSY_TIMEOUT_MS", 5000)
+# 内存映射读取的最大字节数（PRAGMA mmap_size），0 为关闭
+DB_MMAP_SIZE = _env_int("DB_MMAP_SIZE", 256 * 1024 * 1024)
+# 每个连接的页缓存大小（KiB，PRAGMA cache_size 取负值）
+DB_CACHE_SIZE_KB = _env_int("DB_CACHE_SIZE_KB", 16 * 1024)
+# 启动时数据库结构落后是否自动迁移（关闭后需先执行 python -m app.database.migrate）
+DB_AUTO_MIGRATE = _env_bool("DB_AUTO_MIGRATE", True)
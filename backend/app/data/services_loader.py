@@ -108,18 +108,28 @@ def load_services() -> list[ServiceType]:
 
 # 缓存服务列表
 _services_cache: Optional[list[ServiceType]] = None
+# 服务列表版本号，每次（重新）加载时递增，用于失效依赖服务列表的派生缓存
+_services_version = 0
 
 
 def get_services() -> list[ServiceType]:
     """获取服务列表（带缓存）"""
-    global _services_cache
+    global _services_cache, _services_version
     if _services_cache is None:
         _services_cache = load_services()
+        _services_version += 1
     return _services_cache
 
 
 def refresh_services() -> list[ServiceType]:
     """刷新服务列表缓存"""
-    global _services_cache
+    global _services_cache, _services_version
     _services_cache = load_services()
+    _services_version += 1
     return _services_cache
+
+
+def get_services_version() -> int:
+    """当前服务列表版本号"""
+    get_services()
+    return _services_version
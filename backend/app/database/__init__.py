@@ -1,3 +1,5 @@
-from .database import get_db, init_db
+from .database import get_db, get_pool
+from .executor import db_executor, run_in_db
+from .schema import ensure_schema, init_db, migrate
 
-__all__ = ["get_db", "init_db"]
+__all__ = ["get_db", "get_pool", "init_db", "migrate", "ensure_schema", "db_executor", "run_in_db"]
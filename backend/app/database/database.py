@@ -1,221 +1,203 @@
+import os
 import sqlite3
+import threading
 from pathlib import Path
 from contextlib import contextmanager
-from typing import Generator
-
-DATABASE_PATH = Path(__file__).parent.parent.parent / "data" / "xianyu.db"
+from time import perf_counter
+from typing import Generator, Optional
+
+from .. import config as app_config
+from ..services.metrics import DB_DURATION
+
+# 可通过环境变量 DATABASE_PATH 指定数据库文件（如压测时使用临时数据库）
+DATABASE_PATH = Path(
+    os.environ.get("DATABASE_PATH") or Path(__file__).parent.parent.parent / "data" / "xianyu.db"
+)
+
+
+def default_pragmas() -> dict[str, object]:
+    """
+    每个连接建立时设置的 PRAGMA
+    - WAL：读写互不阻塞；synchronous=NORMAL 在 WAL 下只在检查点时 fsync，断电最多丢失最近的事务
+    - busy_timeout：写锁被占用时等待而不是立即报 database is locked
+    - foreign_keys：启用外键约束，使 ON DELETE CASCADE 生效
+    """
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": app_config.DB_BUSY_TIMEOUT_MS,
+        "mmap_size": app_config.DB_MMAP_SIZE,
+        "cache_size": -app_config.DB_CACHE_SIZE_KB,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+
+
+class PoolTimeoutError(Exception):
+    """连接池耗尽且等待超时"""
+
+
+class ConnectionPool:
+    """
+    SQLite 连接池
+    连接在线程间复用（同一时刻只由一个线程使用），空闲连接后进先出以保持页缓存热度；
+    size 为 0 时不复用，每次操作新建连接
+    """
+
+    def __init__(self, path: Path, size: int, timeout: float, pragmas: Optional[dict] = None):
+        self.path = path
+        self.size = max(size, 0)
+        self.timeout = timeout
+        self.pragmas = default_pragmas() if pragmas is None else pragmas
+        self._idle: list[sqlite3.Connection] = []
+        self._cond = threading.Condition()
+        self.created = 0
+        self.in_use = 0
+        self.stats = {
+            "acquired": 0,
+            "reused": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "maxInUse": 0,
+            "waitSeconds": 0.0,
+        }
+
+    def connect(self) -> sqlite3.Connection:
+        """新建连接并设置 PRAGMA"""
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """获取连接：优先复用空闲连接，未达上限时新建，否则等待归还"""
+        with self._cond:
+            self.stats["acquired"] += 1
+            if self.size > 0:
+                conn = self._take_idle()
+                if conn is None and self.created >= self.size:
+                    conn = self._wait_idle()
+                if conn is not None:
+                    self.stats["reused"] += 1
+                    self._mark_in_use()
+                    return conn
+            self.created += 1
+            self._mark_in_use()
+
+        try:
+            return self.connect()
+        except Exception:
+            with self._cond:
+                self.created -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        """归还连接；连接出错或不复用时关闭"""
+        with self._cond:
+            self.in_use -= 1
+            if discard or self.size == 0 or conn.in_transaction:
+                self.created -= 1
+                if discard:
+                    self.stats["discarded"] += 1
+            else:
+                self._idle.append(conn)
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        """关闭全部空闲连接（使用中的连接归还后仍可继续复用）"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self.created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "path": str(self.path),
+                "size": self.size,
+                "open": self.created,
+                "inUse": self.in_use,
+                "idle": len(self._idle),
+                **self.stats,
+                "waitSeconds": round(self.stats["waitSeconds"], 4),
+                "pragmas": self.pragmas,
+            }
+
+    def _take_idle(self) -> Optional[sqlite3.Connection]:
+        return self._idle.pop() if self._idle else None
+
+    def _wait_idle(self) -> Optional[sqlite3.Connection]:
+        self.stats["waits"] += 1
+        started = perf_counter()
+        try:
+            while True:
+                remaining = self.timeout - (perf_counter() - started)
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"数据库连接池已耗尽（{self.size} 个连接），等待 {self.timeout} 秒后超时")
+                self._cond.wait(remaining)
+                conn = self._take_idle()
+                if conn is not None:
+                    return conn
+                if self.created < self.size:
+                    # 有连接被关闭（出错丢弃），由调用方新建
+                    return None
+        finally:
+            self.stats["waitSeconds"] += perf_counter() - started
+
+    def _mark_in_use(self) -> None:
+        self.in_use += 1
+        self.stats["maxInUse"] = max(self.stats["maxInUse"], self.in_use)
+
+
+_pool = ConnectionPool(DATABASE_PATH, app_config.DB_POOL_SIZE, app_config.DB_POOL_TIMEOUT)
+
+
+def get_pool() -> ConnectionPool:
+    """当前连接池"""
+    return _pool
+
+
+def set_pool(pool: ConnectionPool) -> ConnectionPool:
+    """替换连接池并关闭原有的空闲连接（用于基准测试切换配置），返回原连接池"""
+    global _pool
+    previous, _pool = _pool, pool
+    previous.close()
+    return previous
 
 
 def get_db_connection() -> sqlite3.Connection:
-    """获取数据库连接"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """新建一个独立的数据库连接（不经过连接池，调用方负责关闭）"""
+    return _pool.connect()
 
 
 @contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """数据库连接上下文管理器"""
-    conn = get_db_connection()
+def get_db(operation: str = "other") -> Generator[sqlite3.Connection, None, None]:
+    """
+    数据库连接上下文管理器：从连接池借出连接，结束时提交或回滚后归还
+    operation 为该事务的名称（一般取调用函数名），耗时按它记入 DB_DURATION
+    """
+    started = perf_counter()
+    pool = _pool
+    conn = pool.acquire()
+    discard = False
     try:
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            discard = True
         raise
     finally:
-        conn.close()
-
-
-def init_db() -> None:
-    """初始化数据库表"""
-    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    with get_db() as conn:
-        cursor = conn.cursor()
-
-        # 创建历史记录表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS history_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                buyer_message TEXT NOT NULL,
-                detected_type_name TEXT,
-                confidence REAL DEFAULT 0,
-                extracted_info TEXT,
-                missing_info TEXT,
-                suggested_reply TEXT NOT NULL,
-                price_min INTEGER DEFAULT 0,
-                price_max INTEGER DEFAULT 0,
-                price_basis TEXT,
-                article_type TEXT,
-                deal_status TEXT DEFAULT 'pending',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 创建索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_history_created_at
-            ON history_records(created_at DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_history_deal_status
-            ON history_records(deal_status)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_history_article_type
-            ON history_records(article_type)
-        """)
-
-        # 创建回复模板表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reply_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                sort_order INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_templates_sort
-            ON reply_templates(sort_order)
-        """)
-
-        # 检查是否需要插入预设模板
-        cursor.execute("SELECT COUNT(*) FROM reply_templates")
-        count = cursor.fetchone()[0]
-
-        if count == 0:
-            # 插入预设模板
-            default_templates = [
-                ("开场白-友好", "亲，您好！感谢咨询~请问具体是什么类型的文章呢？方便的话告诉我一下字数要求和截止时间，我给您报个价~", 1),
-                ("开场白-专业", "您好！我是专业代写，接过各类稿件。请问您这边需要写什么主题？大概多少字？什么时候要呢？", 2),
-                ("询问字数", "好的，请问大概需要多少字呢？", 3),
-                ("询问截止日期", "请问什么时候需要呢？急稿的话需要加急费哦~", 4),
-                ("询问参考资料", "请问有参考资料或者模板吗？有的话可以发我看看~", 5),
-                ("报价话术", "这个难度的话，大概是XX元，包修改到满意为止。您看可以吗？", 6),
-                ("催单话术", "亲，考虑得怎么样啦？现在下单的话可以优先安排哦~", 7),
-                ("成交确认", "好的，那我们开始吧！请把详细要求发我，写完发您确认~", 8),
-            ]
-
-            cursor.executemany(
-                "INSERT INTO reply_templates (title, content, sort_order) VALUES (?, ?, ?)",
-                default_templates
-            )
-
-        # ========== V3 新增表 ==========
-
-        # 会话表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                status TEXT DEFAULT 'active',
-                deal_status TEXT DEFAULT 'pending',
-                deal_price INTEGER,
-                article_type TEXT,
-                requirement_summary TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sessions_status
-            ON sessions(status)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sessions_deal_status
-            ON sessions(deal_status)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sessions_created_at
-            ON sessions(created_at DESC)
-        """)
-
-        # 消息表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
-            )
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_session_id
-            ON messages(session_id)
-        """)
-
-        # AI 分析结果表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ai_analyses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL,
-                message_id INTEGER NOT NULL,
-                suggested_replies TEXT NOT NULL,
-                extracted_info TEXT NOT NULL,
-                missing_info TEXT NOT NULL,
-                can_quote BOOLEAN DEFAULT 0,
-                price_min INTEGER,
-                price_max INTEGER,
-                price_basis TEXT,
-                quick_tags TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
-                FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE
-            )
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_ai_analyses_session_id
-            ON ai_analyses(session_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_ai_analyses_message_id
-            ON ai_analyses(message_id)
-        """)
-
-        # 挽留话术模板表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS retention_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                is_default BOOLEAN DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 检查是否需要插入默认挽留话术
-        cursor.execute("SELECT COUNT(*) FROM retention_templates")
-        retention_count = cursor.fetchone()[0]
-
-        if retention_count == 0:
-            cursor.execute("""
-                INSERT INTO retention_templates (content, is_default) VALUES (?, ?)
-            """, ("虽然因为你的预算不够没成，但特别愿意帮你把把关～你可以给我链接下一个10r订单，我微信转你12r，你要写的东西我也可以帮你看看梳理一下，相当于你多2r+免费咨询。", 1))
-
-        # 要好评话术模板表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS review_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                is_default BOOLEAN DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 检查是否需要插入默认要好评话术
-        cursor.execute("SELECT COUNT(*) FROM review_templates")
-        review_count = cursor.fetchone()[0]
-
-        if review_count == 0:
-            cursor.execute("""
-                INSERT INTO review_templates (content, is_default) VALUES (?, ?)
-            """, ("感谢您的信任和支持！🎉\n\n如果对这次服务满意的话，麻烦给个好评哦～\n您的好评是对我最大的鼓励 ❤️\n\n后续有需要随时找我，老客户优惠哦～✨", 1))
+        pool.release(conn, discard=discard)
+        DB_DURATION.observe(perf_counter() - started, operation)
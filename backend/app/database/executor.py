@@ -0,0 +1,119 @@
+"""
+数据库执行器
+sqlite3 的调用是同步阻塞的，直接在事件循环中执行时，一次慢写入或锁等待会卡住所有进行中的请求与 LLM 流。
+这里用专用线程池执行数据库操作，异步代码通过 await run_in_db(fn, ...) 调用；
+等待执行的操作数有上限，超出时调用方异步等待（背压），不会无限堆积
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Optional, TypeVar
+
+from .. import config as app_config
+from ..services.metrics import DB_QUEUE_WAIT
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """专用数据库线程池 + 有界等待队列"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(workers, 1)
+        # 执行中与排队中的操作总数上限
+        self.queue_size = max(queue_size, self.workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "maxPending": 0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="db")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，循环变化时（如测试中多次启动应用）重新创建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.queue_size)
+            self._loop = loop
+            self.pending = 0
+        return self._semaphore
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在数据库线程中执行 fn(*args, **kwargs)，并沿用调用方的 contextvars"""
+        semaphore = self._get_semaphore()
+        loop = self._loop
+
+        waiting_since = perf_counter()
+        await semaphore.acquire()
+        DB_QUEUE_WAIT.observe(perf_counter() - waiting_since)
+
+        self.pending += 1
+        self.stats["submitted"] += 1
+        self.stats["maxPending"] = max(self.stats["maxPending"], self.pending)
+
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._release(semaphore)
+            raise
+        # 名额在线程中的操作真正结束后才释放：调用方被取消时，已开始的操作仍占用名额
+        future.add_done_callback(lambda _f: self._release_threadsafe(loop, semaphore))
+
+        try:
+            result = await asyncio.wrap_future(future)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["completed"] += 1
+        return result
+
+    def _release(self, semaphore: asyncio.Semaphore) -> None:
+        if semaphore is self._semaphore:
+            self.pending -= 1
+        semaphore.release()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, semaphore)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def shutdown(self) -> None:
+        """等待执行中的操作完成并关闭线程池"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queueSize": self.queue_size,
+            "pending": self.pending,
+            **self.stats,
+        }
+
+
+db_executor = DatabaseExecutor(app_config.DB_EXECUTOR_WORKERS, app_config.DB_EXECUTOR_QUEUE_SIZE)
+
+
+async def run_in_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """在数据库线程池中执行同步的数据库函数"""
+    return await db_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,40 @@
+"""
+数据库迁移命令（部署时提前执行，避免由应用启动时执行耗时的迁移）
+
+用法（在 backend 目录下）：
+    python -m app.database.migrate            # 迁移到最新版本
+    python -m app.database.migrate --status   # 只查看当前版本与待执行的迁移
+    python -m app.database.migrate --target 2 # 迁移到指定版本
+"""
+import argparse
+import logging
+
+from .migrations import MIGRATIONS
+from .schema import SCHEMA_VERSION, current_version, database_path, migrate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument("--status", action="store_true", help="只显示当前版本与待执行的迁移")
+    parser.add_argument("--target", type=int, default=None, help="迁移到指定版本（默认最新）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    current = current_version()
+    target = SCHEMA_VERSION if args.target is None else args.target
+    pending = [m for m in MIGRATIONS if current < m.version <= target]
+    print(f"数据库: {database_path()}")
+    print(f"当前版本: {current}，目标版本: {target}")
+    for migration in pending:
+        print(f"  待执行 {migration.version:>3}: {migration.description}")
+
+    if args.status or not pending:
+        return
+
+    applied = migrate(target)
+    print(f"已执行 {len(applied)} 个迁移，当前版本: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""
+数据库迁移
+按编号顺序执行，已执行到的编号记录在 PRAGMA user_version 中；
+新增表结构变更时在末尾追加一个迁移，不要修改已发布的迁移
+"""
+import logging
+import sqlite3
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """单个迁移：编号、说明与执行函数（在迁移引擎开启的事务中执行）"""
+
+    def __init__(self, version: int, description: str, apply: Callable[[sqlite3.Cursor], None]):
+        self.version = version
+        self.description = description
+        self.apply = apply
+
+
+def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> None:
+    """为已存在的表补充新增列"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row["name"] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _001_initial_schema(cursor: sqlite3.Cursor) -> None:
+    """初始表结构与预设数据（与引入迁移前的 init_db 相同，可在已有数据库上重复执行）"""
+    # 创建历史记录表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            buyer_message TEXT NOT NULL,
+            detected_type_name TEXT,
+            confidence REAL DEFAULT 0,
+            extracted_info TEXT,
+            missing_info TEXT,
+            suggested_reply TEXT NOT NULL,
+            price_min INTEGER DEFAULT 0,
+            price_max INTEGER DEFAULT 0,
+            price_basis TEXT,
+            article_type TEXT,
+            deal_status TEXT DEFAULT 'pending',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 创建索引
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_created_at
+        ON history_records(created_at DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_deal_status
+        ON history_records(deal_status)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_article_type
+        ON history_records(article_type)
+    """)
+
+    # 创建回复模板表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reply_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            sort_order INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_templates_sort
+        ON reply_templates(sort_order)
+    """)
+
+    # 检查是否需要插入预设模板
+    cursor.execute("SELECT COUNT(*) FROM reply_templates")
+    count = cursor.fetchone()[0]
+
+    if count == 0:
+        # 插入预设模板
+        default_templates = [
+            ("开场白-友好", "亲，您好！感谢咨询~请问具体是什么类型的文章呢？方便的话告诉我一下字数要求和截止时间，我给您报个价~", 1),
+            ("开场白-专业", "您好！我是专业代写，接过各类稿件。请问您这边需要写什么主题？大概多少字？什么时候要呢？", 2),
+            ("询问字数", "好的，请问大概需要多少字呢？", 3),
+            ("询问截止日期", "请问什么时候需要呢？急稿的话需要加急费哦~", 4),
+            ("询问参考资料", "请问有参考资料或者模板吗？有的话可以发我看看~", 5),
+            ("报价话术", "这个难度的话，大概是XX元，包修改到满意为止。您看可以吗？", 6),
+            ("催单话术", "亲，考虑得怎么样啦？现在下单的话可以优先安排哦~", 7),
+            ("成交确认", "好的，那我们开始吧！请把详细要求发我，写完发您确认~", 8),
+        ]
+
+        cursor.executemany(
+            "INSERT INTO reply_templates (title, content, sort_order) VALUES (?, ?, ?)",
+            default_templates
+        )
+
+    # ========== V3 新增表 ==========
+
+    # 会话表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT DEFAULT 'active',
+            deal_status TEXT DEFAULT 'pending',
+            deal_price INTEGER,
+            article_type TEXT,
+            requirement_summary TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_status
+        ON sessions(status)
+    """)
+
+    # 需求要点摘要的检查点：已覆盖的最后一条消息 ID、消息列表指纹
+    _ensure_column(cursor, "sessions", "summary_message_id", "INTEGER")
+    _ensure_column(cursor, "sessions", "summary_fingerprint", "TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_deal_status
+        ON sessions(deal_status)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_created_at
+        ON sessions(created_at DESC)
+    """)
+
+    # 消息表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_session_id
+        ON messages(session_id)
+    """)
+
+    # AI 分析结果表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            suggested_replies TEXT NOT NULL,
+            extracted_info TEXT NOT NULL,
+            missing_info TEXT NOT NULL,
+            can_quote BOOLEAN DEFAULT 0,
+            price_min INTEGER,
+            price_max INTEGER,
+            price_basis TEXT,
+            quick_tags TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+            FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE
+        )
+    """)
+
+    # 提供分析结果的 LLM 供应商
+    _ensure_column(cursor, "ai_analyses", "provider", "TEXT")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ai_analyses_session_id
+        ON ai_analyses(session_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ai_analyses_message_id
+        ON ai_analyses(message_id)
+    """)
+
+    # 挽留话术模板表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS retention_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            is_default BOOLEAN DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 检查是否需要插入默认挽留话术
+    cursor.execute("SELECT COUNT(*) FROM retention_templates")
+    retention_count = cursor.fetchone()[0]
+
+    if retention_count == 0:
+        cursor.execute("""
+            INSERT INTO retention_templates (content, is_default) VALUES (?, ?)
+        """, ("虽然因为你的预算不够没成，但特别愿意帮你把把关～你可以给我链接下一个10r订单，我微信转你12r，你要写的东西我也可以帮你看看梳理一下，相当于你多2r+免费咨询。", 1))
+
+    # 要好评话术模板表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            is_default BOOLEAN DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 检查是否需要插入默认要好评话术
+    cursor.execute("SELECT COUNT(*) FROM review_templates")
+    review_count = cursor.fetchone()[0]
+
+    if review_count == 0:
+        cursor.execute("""
+            INSERT INTO review_templates (content, is_default) VALUES (?, ?)
+        """, ("感谢您的信任和支持！🎉\n\n如果对这次服务满意的话，麻烦给个好评哦～\n您的好评是对我最大的鼓励 ❤️\n\n后续有需要随时找我，老客户优惠哦～✨", 1))
+
+    # LLM 响应缓存表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            model_id TEXT,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at
+        ON llm_cache(created_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access
+        ON llm_cache(last_access)
+    """)
+
+    # 对话滚动摘要表（移出上下文窗口的更早消息的摘要）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            session_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+    """)
+
+    # 异步分析任务表（排队中的任务在重启后继续执行）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id TEXT PRIMARY KEY,
+            session_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            llm_config TEXT,
+            use_cache BOOLEAN DEFAULT 1,
+            analysis_id INTEGER,
+            error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status
+        ON analysis_jobs(status, created_at)
+    """)
+
+    # LLM 用量表（每次 LLM 调用一行，关联到对应的 AI 分析或摘要）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            session_id INTEGER,
+            message_id INTEGER,
+            analysis_id INTEGER,
+            model_id TEXT NOT NULL,
+            base_url TEXT NOT NULL,
+            prompt_version TEXT,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            total_tokens INTEGER NOT NULL DEFAULT 0,
+            latency_ms REAL NOT NULL DEFAULT 0,
+            cost REAL,
+            cached BOOLEAN DEFAULT 0,
+            estimated BOOLEAN DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_llm_usage_created_at
+        ON llm_usage(created_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_llm_usage_session_id
+        ON llm_usage(session_id)
+    """)
+
+
+def _002_session_counters(cursor: sqlite3.Cursor) -> None:
+    """会话冗余消息数、首条消息预览与最后消息时间，由触发器维护，会话列表无需再关联查询 messages"""
+    _ensure_column(cursor, "sessions", "message_count", "INTEGER NOT NULL DEFAULT 0")
+    _ensure_column(cursor, "sessions", "first_message_preview", "TEXT")
+    _ensure_column(cursor, "sessions", "last_message_at", "DATETIME")
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_session_counters_insert
+        AFTER INSERT ON messages
+        BEGIN
+            UPDATE sessions SET
+                message_count = message_count + 1,
+                first_message_preview = COALESCE(first_message_preview, substr(NEW.content, 1, 100)),
+                last_message_at = max(COALESCE(last_message_at, NEW.created_at), NEW.created_at)
+            WHERE id = NEW.session_id;
+        END
+    """)
+    # 删除消息较少见，直接按剩余消息重新计算预览与最后消息时间
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_session_counters_delete
+        AFTER DELETE ON messages
+        BEGIN
+            UPDATE sessions SET
+                message_count = max(message_count - 1, 0),
+                first_message_preview = (
+                    SELECT substr(content, 1, 100) FROM messages
+                    WHERE session_id = OLD.session_id
+                    ORDER BY created_at ASC, id ASC LIMIT 1
+                ),
+                last_message_at = (SELECT MAX(created_at) FROM messages WHERE session_id = OLD.session_id)
+            WHERE id = OLD.session_id;
+        END
+    """)
+
+    # 回填已有会话
+    cursor.execute("""
+        UPDATE sessions SET
+            message_count = (SELECT COUNT(*) FROM messages WHERE session_id = sessions.id),
+            first_message_preview = (
+                SELECT substr(content, 1, 100) FROM messages
+                WHERE session_id = sessions.id
+                ORDER BY created_at ASC, id ASC LIMIT 1
+            ),
+            last_message_at = (SELECT MAX(created_at) FROM messages WHERE session_id = sessions.id)
+    """)
+
+    # 会话列表按更新时间倒序
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated_at
+        ON sessions(updated_at DESC)
+    """)
+
+
+def _003_full_text_search(cursor: sqlite3.Cursor) -> None:
+    """
+    消息内容与需求摘要的 FTS5 全文索引（trigram 分词，适合不分词的中文，至少 3 个字符才能命中索引）
+    外部内容表只保存索引，由触发器与原表保持同步；SQLite 未编译 FTS5 时跳过，搜索退回 LIKE
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                content, content='messages', content_rowid='id', tokenize='trigram'
+            )
+        """)
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+                requirement_summary, content='sessions', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 unavailable, session search falls back to LIKE: {e}")
+        return
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert
+        AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete
+        AFTER DELETE ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update
+        AFTER UPDATE OF content ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_fts_insert
+        AFTER INSERT ON sessions
+        BEGIN
+            INSERT INTO sessions_fts (rowid, requirement_summary) VALUES (NEW.id, NEW.requirement_summary);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_fts_delete
+        AFTER DELETE ON sessions
+        BEGIN
+            INSERT INTO sessions_fts (sessions_fts, rowid, requirement_summary)
+            VALUES ('delete', OLD.id, OLD.requirement_summary);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_fts_update
+        AFTER UPDATE OF requirement_summary ON sessions
+        BEGIN
+            INSERT INTO sessions_fts (sessions_fts, rowid, requirement_summary)
+            VALUES ('delete', OLD.id, OLD.requirement_summary);
+            INSERT INTO sessions_fts (rowid, requirement_summary) VALUES (NEW.id, NEW.requirement_summary);
+        END
+    """)
+
+    # 为已有数据建立索引
+    cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO sessions_fts (sessions_fts) VALUES ('rebuild')")
+
+
+def _004_session_list_keyset_index(cursor: sqlite3.Cursor) -> None:
+    """会话列表按 (updated_at, id) 倒序做游标分页，复合索引取代迁移 2 的单列索引"""
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_updated_at")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated_at_id
+        ON sessions(updated_at DESC, id DESC)
+    """)
+
+
+def _005_analysis_job_lease(cursor: sqlite3.Cursor) -> None:
+    """异步分析任务的执行者与续约时间，多进程部署时只重新排队租约已过期的任务"""
+    _ensure_column(cursor, "analysis_jobs", "worker_id", "TEXT")
+    _ensure_column(cursor, "analysis_jobs", "heartbeat_at", "DATETIME")
+
+
+def _006_session_list_filter_indexes(cursor: sqlite3.Cursor) -> None:
+    """
+    按状态/成交状态筛选的会话列表同样按 (updated_at, id) 游标分页，
+    复合索引让筛选后的每一页按索引顺序读取而不必排序整个筛选结果；取代原来的单列索引
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_status")
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_deal_status")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_status_updated_at_id
+        ON sessions(status, updated_at DESC, id DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_deal_status_updated_at_id
+        ON sessions(deal_status, updated_at DESC, id DESC)
+    """)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "初始表结构与预设数据", _001_initial_schema),
+    Migration(2, "会话消息数、首条消息预览与最后消息时间", _002_session_counters),
+    Migration(3, "消息与需求摘要全文索引", _003_full_text_search),
+    Migration(4, "会话列表游标分页索引 (updated_at, id)", _004_session_list_keyset_index),
+    Migration(5, "异步分析任务租约", _005_analysis_job_lease),
+    Migration(6, "会话列表按状态筛选的游标分页索引", _006_session_list_filter_indexes),
+]
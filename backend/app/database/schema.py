@@ -0,0 +1,149 @@
+"""
+数据库迁移引擎
+- 已执行到的迁移编号保存在 PRAGMA user_version 中，应用启动时只需读取一次即可确认结构是最新的
+- 多个进程（如多个 uvicorn worker）同时启动时，由取得文件锁的进程执行迁移，其余进程等待锁释放后直接跳过
+- 每个迁移在单独的事务中执行并同时更新 user_version，失败时回滚且不影响已完成的迁移
+
+也可以在部署时通过 python -m app.database.migrate 提前执行
+"""
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .. import config as app_config
+from .database import get_pool
+from .migrations import MIGRATIONS
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有 flock，依赖 SQLite 的写锁保证同一迁移只执行一次
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 当前代码所需的数据库结构版本
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+class SchemaVersionError(Exception):
+    """数据库结构版本与代码不匹配"""
+
+
+def database_path() -> Path:
+    """当前连接池使用的数据库文件"""
+    return Path(get_pool().path)
+
+
+def _connect() -> sqlite3.Connection:
+    """迁移专用连接（自动提交模式，事务由迁移引擎显式控制）"""
+    path = database_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = get_pool().connect()
+    conn.isolation_level = None
+    return conn
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def current_version() -> int:
+    """读取数据库当前的结构版本（新数据库为 0）"""
+    conn = _connect()
+    try:
+        return get_version(conn)
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _migration_lock() -> Iterator[None]:
+    """进程间互斥锁（数据库文件旁的 .migrate.lock 文件）"""
+    if fcntl is None:
+        yield
+        return
+
+    path = database_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".migrate.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info("Another process is migrating the database, waiting")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def migrate(target: Optional[int] = None) -> list[int]:
+    """
+    执行待执行的迁移（默认迁移到最新版本），返回本次执行的迁移编号
+
+    Raises:
+        SchemaVersionError: 数据库版本高于目标版本（由更新的代码创建，不支持降级）
+    """
+    target = SCHEMA_VERSION if target is None else target
+    applied = []
+
+    with _migration_lock():
+        conn = _connect()
+        try:
+            current = get_version(conn)
+            if current > target:
+                raise SchemaVersionError(
+                    f"数据库结构版本 {current} 高于目标版本 {target}，请使用更新版本的代码"
+                )
+
+            for migration in MIGRATIONS:
+                if migration.version <= current or migration.version > target:
+                    continue
+
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # 取得写锁后再次确认，避免与未使用文件锁的进程重复执行
+                    if get_version(conn) >= migration.version:
+                        conn.execute("ROLLBACK")
+                        continue
+                    migration.apply(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {migration.version}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                applied.append(migration.version)
+                logger.info(f"Applied migration {migration.version}: {migration.description}")
+        finally:
+            conn.close()
+
+    return applied
+
+
+def ensure_schema() -> int:
+    """
+    应用启动时检查数据库结构版本：已是最新时只读取一次 user_version；
+    落后时按 DB_AUTO_MIGRATE 自动迁移，或提示先执行迁移命令。返回当前版本
+    """
+    current = current_version()
+    if current == SCHEMA_VERSION:
+        return current
+    if current > SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"数据库结构版本 {current} 高于代码支持的版本 {SCHEMA_VERSION}，请使用更新版本的代码"
+        )
+    if not app_config.DB_AUTO_MIGRATE:
+        raise SchemaVersionError(
+            f"数据库结构版本 {current} 落后于 {SCHEMA_VERSION}，请先执行 python -m app.database.migrate"
+        )
+
+    migrate()
+    return SCHEMA_VERSION
+
+
+def init_db() -> None:
+    """初始化数据库（迁移到最新版本，保留旧名称供脚本使用）"""
+    migrate()
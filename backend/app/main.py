@@ -1,15 +1,30 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import services, prompts, templates, sessions
-from .database import init_db
+from fastapi.responses import PlainTextResponse
+from .routers import services, prompts, templates, sessions, llm, jobs, usage, db
+from .database import db_executor, ensure_schema, get_pool, run_in_db
+from .services import http_pool, job_service, metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：检查数据库结构版本、启动分析任务 worker；关闭时停止 worker 并释放 LLM 连接池与数据库资源"""
+    await run_in_db(ensure_schema)
+    await job_service.start_workers()
+    yield
+    await job_service.stop_workers()
+    await http_pool.close_all()
+    db_executor.shutdown()
+    get_pool().close()
 
-# 初始化数据库
-init_db()
 
 app = FastAPI(
     title="闲鱼代写助手 API",
     description="帮助闲鱼代写卖家专业回复买家咨询",
     version="4.1.0",
+    lifespan=lifespan,
 )
 
 # CORS 配置
@@ -20,12 +35,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 按路由记录请求耗时（最外层，包含 CORS 处理）
+app.add_middleware(metrics.MetricsMiddleware)
 
 # 注册路由
 app.include_router(services.router, prefix="/api", tags=["服务"])
 app.include_router(prompts.router, prefix="/api", tags=["提示词"])
 app.include_router(templates.router, prefix="/api", tags=["回复模板"])
 app.include_router(sessions.router, prefix="/api", tags=["会话"])
+app.include_router(llm.router, prefix="/api", tags=["大模型"])
+app.include_router(jobs.router, prefix="/api", tags=["任务"])
+app.include_router(usage.router, prefix="/api", tags=["用量"])
+app.include_router(db.router, prefix="/api", tags=["数据库"])
 
 
 @app.get("/")
@@ -36,3 +57,9 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
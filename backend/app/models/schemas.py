@@ -1,14 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import Optional
 from datetime import datetime
 
 
-class LLMConfig(BaseModel):
+class LLMProvider(BaseModel):
     baseUrl: str
     apiKey: str
     modelId: str
 
 
+class LLMConfig(LLMProvider):
+    fallbacks: list[LLMProvider] = []  # 备用供应商，按顺序故障转移/对冲
+
+
 class ServiceType(BaseModel):
     id: int
     name: str
@@ -139,6 +143,8 @@ class SessionSummary(BaseModel):
     articleType: Optional[str] = None
     previewMessage: str  # 第一条买家消息的前100字
     messageCount: int
+    lastMessageAt: Optional[datetime] = None
+    snippet: Optional[str] = None  # 搜索时命中内容的高亮片段（HTML 已转义，命中处为 <mark>）
     createdAt: datetime
     updatedAt: datetime
 
@@ -146,10 +152,11 @@ class SessionSummary(BaseModel):
 class SessionListResponse(BaseModel):
     """会话列表响应"""
     items: list[SessionSummary]
-    total: int
-    page: int
+    total: Optional[int] = None  # 按游标翻页时不统计（None）
+    page: Optional[int] = None
     pageSize: int
-    totalPages: int
+    totalPages: Optional[int] = None
+    nextCursor: Optional[str] = None  # 下一页游标，没有更多数据时为 None
 
 
 # ========== V3 消息模型 ==========
@@ -167,13 +174,24 @@ class CreateMessageRequest(BaseModel):
     """创建消息请求"""
     content: str
     role: str = "buyer"
+    llmConfig: Optional[LLMConfig] = None  # 买家消息携带 LLM 配置时可在后台提前分析
+    preAnalyze: Optional[bool] = None  # 是否提前分析，为空时使用 SPECULATIVE_ANALYSIS 配置
 
 
 class AddMessageRequest(BaseModel):
     """添加消息并分析请求"""
-    content: str
+    content: str = ""
     role: str = "buyer"
+    messageId: Optional[int] = None  # 分析已保存的消息（与 content 二选一）
     llmConfig: Optional[LLMConfig] = None  # 如果是买家消息，需要LLM配置进行分析
+    useCache: bool = True  # 是否允许使用 LLM 响应缓存
+
+    @model_validator(mode="after")
+    def _check_content_or_message(self):
+        """content 与 messageId 必须且只能传一个，避免保存并分析空消息"""
+        if bool(self.content) == (self.messageId is not None):
+            raise ValueError("content 与 messageId 必须且只能提供一个")
+        return self
 
 
 # ========== V3 AI分析模型 ==========
@@ -207,6 +225,7 @@ class AIAnalysis(BaseModel):
     canQuote: bool
     priceEstimate: Optional[PriceEstimateV3] = None
     quickTags: list[str]
+    provider: Optional[str] = None  # 实际提供分析结果的供应商（modelId@baseUrl）
     createdAt: datetime
 
 
@@ -223,6 +242,36 @@ class SendMessageResponse(BaseModel):
     error: Optional[str] = None  # 分析失败时的错误信息
 
 
+class AnalysisJob(BaseModel):
+    """异步分析任务"""
+    id: str
+    sessionId: int
+    messageId: int
+    status: str  # queued, running, succeeded, failed
+    message: Optional[Message] = None
+    analysis: Optional[AIAnalysis] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    """批量分析请求"""
+    sessionIds: list[int]
+    llmConfig: LLMConfig
+    useCache: bool = True
+
+
+class BatchAnalyzeItem(BaseModel):
+    """批量分析中单个会话的结果（NDJSON 每行一条）"""
+    sessionId: int
+    status: str  # succeeded, failed, skipped
+    message: Optional[Message] = None
+    analysis: Optional[AIAnalysis] = None
+    error: Optional[str] = None
+
+
 # ========== V3 会话详情 ==========
 
 class SessionDetail(BaseModel):
@@ -269,3 +318,78 @@ class RequirementSummary(BaseModel):
 class SummarizeRequest(BaseModel):
     """提炼需求要点请求"""
     llmConfig: LLMConfig
+    useCache: bool = True  # 是否允许使用 LLM 响应缓存
+
+
+# ========== 报价 ==========
+
+class QuoteRequest(BaseModel):
+    """报价计算请求"""
+    serviceIds: Optional[list[int]] = None  # 待报价的服务，为空时按 articleType 匹配，仍为空则计算全部服务
+    articleType: Optional[str] = None
+    wordCount: Optional[int] = None  # 按千字计价的服务使用
+    quantity: Optional[float] = None  # 按页/分钟/篇计价的服务使用
+    deadline: Optional[str] = None
+    urgency: Optional[str] = None  # 正常、加急、特急，为空时根据 deadline 判断
+    complexity: Optional[str] = None  # simple、complex，为空时给出简单到复杂的区间
+
+
+class QuoteItem(BaseModel):
+    """单个服务的报价"""
+    serviceId: int
+    serviceName: str
+    unit: str
+    quantity: float
+    min: int
+    max: int
+    basis: str
+
+
+class QuoteResponse(BaseModel):
+    """报价计算结果"""
+    urgency: str
+    complexity: Optional[str] = None
+    items: list[QuoteItem]
+
+
+# ========== LLM 用量 ==========
+
+class LLMUsageRecord(BaseModel):
+    """单次 LLM 调用的用量记录"""
+    id: int
+    kind: str  # analysis, history_summary, requirement_summary
+    sessionId: Optional[int] = None
+    messageId: Optional[int] = None
+    analysisId: Optional[int] = None
+    modelId: str
+    baseUrl: str
+    promptVersion: Optional[str] = None
+    promptTokens: int
+    completionTokens: int
+    totalTokens: int
+    latencyMs: float
+    cost: Optional[float] = None  # 未在 LLM_PRICING 中配置单价时为空
+    cached: bool = False  # 命中响应缓存（不消耗 token）
+    estimated: bool = False  # 供应商未返回 usage，token 数为估算值
+    createdAt: datetime
+
+
+class UsageGroup(BaseModel):
+    """用量汇总中的一组"""
+    key: str
+    calls: int
+    cachedCalls: int = 0
+    estimatedCalls: int = 0
+    promptTokens: int = 0
+    completionTokens: int = 0
+    totalTokens: int = 0
+    cost: Optional[float] = None
+    avgLatencyMs: Optional[float] = None  # 不含缓存命中
+    maxLatencyMs: Optional[float] = None
+
+
+class UsageSummaryResponse(BaseModel):
+    """用量汇总"""
+    groupBy: str  # day, model, promptVersion, kind, session
+    items: list[UsageGroup]
+    total: UsageGroup
@@ -1,21 +1,135 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
+from string import Formatter
+from typing import Optional
 
 # 模板目录
 TEMPLATES_DIR = Path(__file__).parent / "templates"
 
+# 各模板允许使用的占位符
+TEMPLATE_FIELDS = {
+    "analyze_v3": frozenset({
+        "service_count",
+        "service_list",
+        "conversation_history",
+        "latest_message",
+        "accumulated_info",
+    }),
+}
+
+# 两次检查模板文件是否变化的最短间隔（秒）
+CHECK_INTERVAL = 1.0
+
+
+class LoadedTemplate:
+    """已加载并校验过的模板"""
+
+    def __init__(self, text: str, mtime_ns: int, size: int):
+        self.text = text
+        self.hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.checked_at = time.monotonic()
+
+
+def validate_template(name: str, content: str) -> None:
+    """检查模板语法与占位符，不合法时抛出 ValueError"""
+    try:
+        fields = {field for _, field, _, _ in Formatter().parse(content) if field is not None}
+    except ValueError as e:
+        raise ValueError(f"模板格式错误: {e}（字面量花括号请写成 {{{{ 或 }}}}）")
+
+    allowed = TEMPLATE_FIELDS.get(name)
+    if allowed is None:
+        return
+
+    unknown = sorted(field for field in fields if field not in allowed)
+    if unknown:
+        raise ValueError(f"模板包含未知占位符: {', '.join(unknown)}")
+
+
+class TemplateRegistry:
+    """
+    进程内模板缓存
+
+    模板只在文件的 mtime/大小变化（且内容哈希变化）或通过 save_template 保存后才重新加载，
+    占位符在加载时校验一次。
+    """
+
+    def __init__(self):
+        self._templates: dict[str, LoadedTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> LoadedTemplate:
+        """获取模板（必要时从磁盘重新加载）"""
+        cached = self._templates.get(name)
+        if cached is not None and time.monotonic() - cached.checked_at < CHECK_INTERVAL:
+            return cached
+
+        with self._lock:
+            return self._refresh(name, self._templates.get(name))
+
+    def put(self, name: str, content: str) -> LoadedTemplate:
+        """保存后直接更新缓存"""
+        stat = get_template_path(name).stat()
+        with self._lock:
+            loaded = LoadedTemplate(content, stat.st_mtime_ns, stat.st_size)
+            self._templates[name] = loaded
+            return loaded
+
+    def _refresh(self, name: str, cached: Optional[LoadedTemplate]) -> LoadedTemplate:
+        template_path = get_template_path(name)
+        if not template_path.exists():
+            raise FileNotFoundError(f"模板文件不存在: {template_path}")
+
+        stat = template_path.stat()
+        if cached is not None and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+            cached.checked_at = time.monotonic()
+            return cached
+
+        content = template_path.read_text(encoding="utf-8")
+        if cached is not None and hashlib.sha256(content.encode("utf-8")).hexdigest() == cached.hash:
+            # 仅 mtime 变化（如 touch），内容未变
+            cached.mtime_ns, cached.size = stat.st_mtime_ns, stat.st_size
+            cached.checked_at = time.monotonic()
+            return cached
+
+        validate_template(name, content)
+        loaded = LoadedTemplate(content, stat.st_mtime_ns, stat.st_size)
+        self._templates[name] = loaded
+        return loaded
+
+
+template_registry = TemplateRegistry()
+
 
 def load_template(name: str) -> str:
     """从文件加载提示词模板"""
-    template_path = TEMPLATES_DIR / f"{name}.txt"
-    if not template_path.exists():
-        raise FileNotFoundError(f"模板文件不存在: {template_path}")
-    return template_path.read_text(encoding="utf-8")
+    return template_registry.get(name).text
 
 
 def save_template(name: str, content: str) -> None:
-    """保存提示词模板到文件"""
-    template_path = TEMPLATES_DIR / f"{name}.txt"
-    template_path.write_text(content, encoding="utf-8")
+    """保存提示词模板到文件（先写临时文件再原子替换，避免读到写了一半的文件）"""
+    validate_template(name, content)
+
+    template_path = get_template_path(name)
+    fd, tmp_path = tempfile.mkstemp(dir=TEMPLATES_DIR, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, template_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    template_registry.put(name, content)
 
 
 def get_template_path(name: str) -> Path:
@@ -0,0 +1,82 @@
+"""
+提示词静态前缀缓存
+将模板拆分为与会话无关的静态前缀（说明、服务列表、报价规则）和按会话填充的后缀。
+静态前缀按模板与服务列表的版本预先渲染一次并缓存，保证逐字节稳定，
+便于支持前缀缓存（prompt caching）的模型供应商复用。
+"""
+from string import Formatter
+from typing import Callable, Hashable
+
+# 与会话无关的占位符
+STATIC_FIELDS = frozenset({"service_count", "service_list"})
+
+
+def split_template(template: str) -> tuple[str, str]:
+    """
+    在第一个按会话填充的占位符处拆分模板
+
+    Returns:
+        (静态部分, 动态部分)，两部分均仍为可 format 的模板文本
+    """
+    static_parts: list[str] = []
+    dynamic_parts: list[str] = []
+    target = static_parts
+
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if literal:
+            target.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field not in STATIC_FIELDS:
+            target = dynamic_parts
+        placeholder = "{" + field
+        if conversion:
+            placeholder += "!" + conversion
+        if spec:
+            placeholder += ":" + spec
+        target.append(placeholder + "}")
+
+    return "".join(static_parts), "".join(dynamic_parts)
+
+
+class CompiledPrompt:
+    """已渲染静态前缀的提示词"""
+
+    def __init__(self, prefix: str, suffix_template: str, static_values: dict):
+        self.prefix = prefix
+        self.suffix_template = suffix_template
+        self.static_values = static_values
+
+    def render(self, **values) -> str:
+        """拼接静态前缀与按会话填充的后缀"""
+        return self.prefix + self.suffix_template.format(**self.static_values, **values)
+
+
+# 模板名 -> (版本, 编译结果)
+_compiled: dict[str, tuple[Hashable, CompiledPrompt]] = {}
+
+
+def get_compiled_prompt(
+    name: str,
+    template: str,
+    version: Hashable,
+    build_static_values: Callable[[], dict],
+) -> CompiledPrompt:
+    """
+    获取编译后的提示词
+
+    version 应同时反映模板内容与静态填充值（如服务列表）的版本，变化时重新渲染静态前缀
+    """
+    cached = _compiled.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    static_values = build_static_values()
+    static_template, suffix_template = split_template(template)
+    compiled = CompiledPrompt(
+        prefix=static_template.format(**static_values),
+        suffix_template=suffix_template,
+        static_values=static_values,
+    )
+    _compiled[name] = (version, compiled)
+    return compiled
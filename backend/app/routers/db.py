@@ -0,0 +1,17 @@
+"""
+数据库运行状态路由
+"""
+from fastapi import APIRouter
+
+from ..database import db_executor, get_pool
+
+router = APIRouter()
+
+
+@router.get("/db/stats")
+async def get_db_stats():
+    """获取数据库连接池与执行线程池的使用情况"""
+    return {
+        "pool": get_pool().snapshot(),
+        "executor": db_executor.snapshot(),
+    }
@@ -0,0 +1,21 @@
+"""
+异步任务路由
+"""
+from fastapi import APIRouter, HTTPException, Query
+
+from ..models.schemas import AnalysisJob
+from ..services import job_service
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJob)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="任务未完成时最多等待的秒数（长轮询）"),
+):
+    """获取分析任务状态，完成后附带分析结果"""
+    job = await job_service.wait_for_job(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
@@ -0,0 +1,33 @@
+"""
+LLM 运行状态路由
+"""
+from fastapi import APIRouter
+
+from ..database import run_in_db
+from ..services.hedging import latency_tracker
+from ..services.llm_cache import response_cache
+from ..services.rate_limiter import get_provider_states
+
+router = APIRouter()
+
+
+@router.get("/llm/cache/stats")
+async def get_cache_stats():
+    """获取 LLM 响应缓存命中统计"""
+    return await run_in_db(response_cache.stats)
+
+
+@router.delete("/llm/cache")
+async def clear_cache():
+    """清空 LLM 响应缓存"""
+    await response_cache.clear_async()
+    return {"success": True}
+
+
+@router.get("/llm/providers")
+async def get_providers():
+    """获取各 LLM 供应商的限流、熔断状态与响应耗时（用于调整对冲等待时间）"""
+    return {
+        "items": get_provider_states(),
+        "hedging": latency_tracker.stats(),
+    }
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from ..prompts.analyze_prompt import load_template, save_template
 
@@ -18,7 +19,7 @@ async def get_prompts():
     """获取提示词模板"""
     try:
         return PromptTemplates(
-            analyze_v3=load_template("analyze_v3"),
+            analyze_v3=await run_in_threadpool(load_template, "analyze_v3"),
         )
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -29,7 +30,10 @@ async def update_prompts(request: UpdatePromptRequest):
     """更新提示词模板"""
     try:
         if request.analyze_v3 is not None:
-            save_template("analyze_v3", request.analyze_v3)
+            # 写入、fsync 与替换文件在线程池中执行，不阻塞事件循环
+            await run_in_threadpool(save_template, "analyze_v3", request.analyze_v3)
         return {"success": True, "message": "提示词已更新"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存失败: {str(e)}")
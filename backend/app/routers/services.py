@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
-from ..models.schemas import ServiceType
+from ..models.schemas import QuoteRequest, QuoteResponse, ServiceType
 from ..data.services_loader import get_services, refresh_services
+from ..services import pricing
 
 router = APIRouter()
 
@@ -27,3 +28,16 @@ async def refresh_services_list():
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"刷新服务列表失败: {str(e)}")
+
+
+@router.post("/quote", response_model=QuoteResponse)
+async def quote_services(request: QuoteRequest):
+    """按报价规则计算服务报价区间"""
+    try:
+        return pricing.quote(request)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"计算报价失败: {str(e)}")
@@ -2,8 +2,10 @@
 V3 会话路由
 处理会话、消息、挽留话术的 HTTP 请求
 """
+import json
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, Optional
 
 from ..models.schemas import (
     CreateSessionRequest,
@@ -19,8 +21,10 @@ from ..models.schemas import (
     SummarizeRequest,
     RequirementSummary,
     LLMConfig,
+    BatchAnalyzeRequest,
 )
-from ..services import session_service
+from ..database import run_in_db
+from ..services import job_service, session_service
 
 router = APIRouter()
 
@@ -32,7 +36,7 @@ async def create_session(request: CreateSessionRequest = None):
     """创建新会话"""
     if request is None:
         request = CreateSessionRequest()
-    result = session_service.create_session(request)
+    result = await run_in_db(session_service.create_session, request)
     return result
 
 
@@ -42,22 +46,28 @@ async def get_session_list(
     pageSize: int = Query(20, ge=1, le=100),
     status: Optional[str] = Query(None, description="会话状态: active, closed"),
     dealStatus: Optional[str] = Query(None, description="成交状态: pending, success, failed"),
-    search: Optional[str] = Query(None, description="搜索关键词"),
+    search: Optional[str] = Query(None, description="搜索关键词（空格分隔多个词，需同时命中；结果按相关度排序）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor，传入时忽略 page 且不统计总数"),
 ):
     """获取会话列表"""
-    return session_service.get_session_list(
-        page=page,
-        page_size=pageSize,
-        status=status,
-        deal_status=dealStatus,
-        search=search,
-    )
+    try:
+        return await run_in_db(
+            session_service.get_session_list,
+            page=page,
+            page_size=pageSize,
+            status=status,
+            deal_status=dealStatus,
+            search=search,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/sessions/{session_id}", response_model=SessionDetail)
 async def get_session(session_id: int):
     """获取会话详情"""
-    session = session_service.get_session_by_id(session_id)
+    session = await run_in_db(session_service.get_session_by_id, session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="会话不存在")
     return session
@@ -66,7 +76,7 @@ async def get_session(session_id: int):
 @router.patch("/sessions/{session_id}")
 async def update_session(session_id: int, request: UpdateSessionRequest):
     """更新会话"""
-    success = session_service.update_session(session_id, request)
+    success = await run_in_db(session_service.update_session, session_id, request)
     if not success:
         raise HTTPException(status_code=404, detail="会话不存在")
     return {"success": True}
@@ -75,7 +85,7 @@ async def update_session(session_id: int, request: UpdateSessionRequest):
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: int):
     """删除会话"""
-    success = session_service.delete_session(session_id)
+    success = await run_in_db(session_service.delete_session, session_id)
     if not success:
         raise HTTPException(status_code=404, detail="会话不存在")
     return {"success": True}
@@ -85,9 +95,14 @@ async def delete_session(session_id: int):
 
 @router.post("/sessions/{session_id}/messages", response_model=Message)
 async def add_message(session_id: int, request: CreateMessageRequest):
-    """添加消息到会话（仅保存消息，不进行AI分析）"""
+    """
+    添加消息到会话
+
+    默认仅保存消息；买家消息携带 llmConfig 且开启预分析时，在后台提前进行AI分析，
+    之后以 messageId 调用 /analyze 可直接获取或等待该结果
+    """
     try:
-        message = session_service.add_message(session_id, request)
+        message = await session_service.add_message(session_id, request)
         return message
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -96,7 +111,7 @@ async def add_message(session_id: int, request: CreateMessageRequest):
 @router.get("/sessions/{session_id}/messages", response_model=list[Message])
 async def get_messages(session_id: int):
     """获取会话的所有消息"""
-    messages = session_service.get_messages(session_id)
+    messages = await run_in_db(session_service.get_messages, session_id)
     return messages
 
 
@@ -105,7 +120,7 @@ async def get_messages(session_id: int):
 @router.get("/retention-template", response_model=RetentionTemplate)
 async def get_retention_template():
     """获取默认挽留话术"""
-    template = session_service.get_retention_template()
+    template = await run_in_db(session_service.get_retention_template)
     if template is None:
         raise HTTPException(status_code=404, detail="挽留话术不存在")
     return template
@@ -114,7 +129,7 @@ async def get_retention_template():
 @router.put("/retention-template")
 async def update_retention_template(request: UpdateRetentionTemplateRequest):
     """更新默认挽留话术"""
-    session_service.update_retention_template(request)
+    await run_in_db(session_service.update_retention_template, request)
     return {"success": True}
 
 
@@ -123,7 +138,7 @@ async def update_retention_template(request: UpdateRetentionTemplateRequest):
 @router.get("/review-template", response_model=RetentionTemplate)
 async def get_review_template():
     """获取默认要好评话术"""
-    template = session_service.get_review_template()
+    template = await run_in_db(session_service.get_review_template)
     if template is None:
         raise HTTPException(status_code=404, detail="要好评话术不存在")
     return template
@@ -132,31 +147,53 @@ async def get_review_template():
 @router.put("/review-template")
 async def update_review_template(request: UpdateRetentionTemplateRequest):
     """更新默认要好评话术"""
-    session_service.update_review_template(request)
+    await run_in_db(session_service.update_review_template, request)
     return {"success": True}
 
 
 # ========== 消息分析 ==========
 
 @router.post("/sessions/{session_id}/analyze", response_model=SendMessageResponse)
-async def analyze_message(session_id: int, request: AddMessageRequest):
+async def analyze_message(
+    session_id: int,
+    request: AddMessageRequest,
+    run_async: bool = Query(False, alias="async", description="是否异步执行（立即返回任务 ID）"),
+):
     """
     发送买家消息并进行AI分析
 
-    - 保存买家消息到会话
+    - 保存买家消息到会话（传入 messageId 时改为分析已保存的消息，已预分析则直接返回）
     - 获取完整对话历史
     - 调用LLM进行多轮对话分析
     - 返回3-5个推荐回复、提取的信息、报价建议等
+
+    async=1 时保存消息后立即返回 202 和任务 ID，通过 GET /jobs/{id} 查询结果
     """
     if request.llmConfig is None:
         raise HTTPException(status_code=400, detail="缺少LLM配置")
 
+    if run_async:
+        return await _submit_analysis_job(session_id, request)
+
+    if request.messageId is not None:
+        # 先校验消息存在、属于本会话且为买家消息
+        await _resolve_message(session_id, request)
+
     try:
-        result = await session_service.send_message_and_analyze(
-            session_id=session_id,
-            content=request.content,
-            config=request.llmConfig,
-        )
+        if request.messageId is not None:
+            result = await session_service.analyze_message(
+                session_id=session_id,
+                message_id=request.messageId,
+                config=request.llmConfig,
+                use_cache=request.useCache,
+            )
+        else:
+            result = await session_service.send_message_and_analyze(
+                session_id=session_id,
+                content=request.content,
+                config=request.llmConfig,
+                use_cache=request.useCache,
+            )
 
         if "error" in result:
             # 消息已保存但分析失败，返回具体错误信息
@@ -176,6 +213,108 @@ async def analyze_message(session_id: int, request: AddMessageRequest):
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
 
+async def _resolve_message(session_id: int, request: AddMessageRequest) -> Message:
+    """获取待分析的消息：传入 messageId 时使用已保存的消息，否则保存新的买家消息"""
+    if request.messageId is not None:
+        message = await run_in_db(session_service.get_message_by_id, request.messageId)
+        if message is None:
+            raise HTTPException(status_code=404, detail="消息不存在")
+        # 只能分析本会话中的买家消息
+        if message.sessionId != session_id:
+            raise HTTPException(status_code=400, detail="消息不属于该会话")
+        if message.role != "buyer":
+            raise HTTPException(status_code=400, detail="只能分析买家消息")
+        return message
+
+    try:
+        return await session_service.add_message(
+            session_id, CreateMessageRequest(content=request.content, role="buyer")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+async def _submit_analysis_job(session_id: int, request: AddMessageRequest) -> JSONResponse:
+    """保存消息（或使用已保存的消息）并提交异步分析任务"""
+    message = await _resolve_message(session_id, request)
+
+    job = await job_service.submit_analysis_job(
+        session_id=session_id,
+        message_id=message.id,
+        config=request.llmConfig,
+        use_cache=request.useCache,
+    )
+    return JSONResponse(
+        status_code=202,
+        content={"jobId": job.id, **job.model_dump(mode="json")},
+    )
+
+
+@router.post("/sessions/{session_id}/analyze/stream")
+async def analyze_message_stream(session_id: int, request: AddMessageRequest):
+    """
+    发送买家消息并以 SSE 流式返回AI分析
+
+    - 保存买家消息后立即推送 message 事件
+    - 每生成一条推荐回复即推送 reply 事件
+    - 随后推送 extractedInfo、priceEstimate 事件
+    - 最终推送已保存的 analysis 事件（失败时为 error 事件）
+    """
+    if request.llmConfig is None:
+        raise HTTPException(status_code=400, detail="缺少LLM配置")
+
+    message = await _resolve_message(session_id, request)
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield _format_sse("message", message.model_dump(mode="json"))
+        async for event, data in session_service.stream_message_analysis(
+            session_id=session_id,
+            message=message,
+            config=request.llmConfig,
+            use_cache=request.useCache,
+        ):
+            yield _format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 禁用 Nginx 缓冲，保证事件即时送达
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/sessions/analyze-batch")
+async def analyze_sessions_batch(request: BatchAnalyzeRequest):
+    """
+    批量分析多个会话中尚未回复的最新买家消息
+
+    - 各会话并发分析（并发数受 BATCH_ANALYZE_CONCURRENCY 限制）
+    - 以 NDJSON 流式返回，每完成一个会话输出一行结果
+    - 没有待回复买家消息的会话返回 skipped
+    """
+    async def result_stream() -> AsyncIterator[str]:
+        async for item in session_service.analyze_sessions_batch(
+            session_ids=request.sessionIds,
+            config=request.llmConfig,
+            use_cache=request.useCache,
+        ):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化一条 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # ========== 需求提炼 ==========
 
 @router.post("/sessions/{session_id}/summarize", response_model=RequirementSummary)
@@ -191,6 +330,7 @@ async def summarize_requirements(session_id: int, request: SummarizeRequest):
         summary = await session_service.summarize_session_requirements(
             session_id=session_id,
             config=request.llmConfig,
+            use_cache=request.useCache,
         )
         return RequirementSummary(**summary)
     except ValueError as e:
@@ -0,0 +1,45 @@
+"""
+LLM 用量路由
+"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..database import run_in_db
+from ..models.schemas import LLMUsageRecord, UsageSummaryResponse
+from ..services import usage_service
+
+router = APIRouter()
+
+
+@router.get("/usage", response_model=UsageSummaryResponse)
+async def get_usage_summary(
+    groupBy: str = Query("day", description="汇总维度: day, model, promptVersion, kind, session"),
+    since: Optional[str] = Query(None, description="起始时间（含），如 2024-01-01"),
+    until: Optional[str] = Query(None, description="截止时间（不含），如 2024-02-01"),
+    sessionId: Optional[int] = Query(None, description="只统计指定会话"),
+    kind: Optional[str] = Query(None, description="用量类型: analysis, history_summary, requirement_summary"),
+):
+    """按维度汇总 LLM token 用量与成本"""
+    try:
+        return await run_in_db(
+            usage_service.get_usage_summary,
+            group_by=groupBy,
+            since=since,
+            until=until,
+            session_id=sessionId,
+            kind=kind,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取用量统计失败: {str(e)}")
+
+
+@router.get("/usage/sessions/{session_id}", response_model=list[LLMUsageRecord])
+async def get_session_usage(session_id: int):
+    """获取会话的全部 LLM 调用记录"""
+    try:
+        return await run_in_db(usage_service.get_session_usage, session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取会话用量失败: {str(e)}")
@@ -0,0 +1,67 @@
+"""
+分析结果攒批写入
+并发产生的分析结果先放入缓冲区，攒够一批或等待超时后在同一个事务中写入
+"""
+import asyncio
+from typing import Optional
+
+from .. import config as app_config
+from ..database import run_in_db
+from ..models.schemas import AIAnalysis
+
+
+class AnalysisBatchWriter:
+    """分析结果批量写入器，save() 在所在批次写入后返回已保存的分析"""
+
+    def __init__(self, max_batch: Optional[int] = None, max_delay: Optional[float] = None):
+        self.max_batch = max(max_batch or app_config.BATCH_WRITE_SIZE, 1)
+        self.max_delay = max_delay if max_delay is not None else app_config.BATCH_WRITE_DELAY
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writing: set[asyncio.Task] = set()
+        self.batches = 0
+        self.saved = 0
+
+    async def save(self, **item) -> AIAnalysis:
+        """加入缓冲区并等待写入（参数同 session_service.save_analysis）"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        """立即写入缓冲区中的全部结果（在数据库线程中执行，不阻塞事件循环）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._write(batch))
+        # 保留引用，避免写入中的任务被回收
+        self._writing.add(task)
+        task.add_done_callback(self._writing.discard)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        from .session_service import save_analyses
+
+        try:
+            analyses = await run_in_db(save_analyses, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.saved += len(analyses)
+        for (_, future), analysis in zip(batch, analyses):
+            if not future.done():
+                future.set_result(analysis)
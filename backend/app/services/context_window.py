@@ -0,0 +1,62 @@
+"""
+对话上下文窗口
+估算 token 数，并决定哪些历史消息原文保留、哪些折叠进滚动摘要
+"""
+import math
+import re
+
+from .. import config as app_config
+
+# 中日韩字符（含全角标点），大多数分词器中约 1 字 1 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本 token 数：中日韩字符按 1 字 1 token，其余按 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def split_window(messages: list, keep_turns: int, summarized_until: int = 0) -> tuple[list, list]:
+    """
+    划分上下文窗口
+
+    Args:
+        messages: 按时间排序的消息（最后一条为最新买家消息）
+        keep_turns: 原文保留的最近消息条数（至少保留最新一条）
+        summarized_until: 已折叠进滚动摘要的最后一条消息 ID
+
+    Returns:
+        (需要新折叠进摘要的消息, 原文保留的消息)
+    """
+    keep_turns = max(keep_turns, 1)
+    cut = max(0, len(messages) - keep_turns)
+
+    to_summarize = [msg for msg in messages[:cut] if msg.id > summarized_until]
+    recent = [msg for msg in messages[cut:] if msg.id > summarized_until]
+    return to_summarize, recent
+
+
+def keep_turns_candidates() -> list[int]:
+    """依次尝试的原文保留条数：从配置值开始逐步减少，直到最小值"""
+    keep = app_config.CONTEXT_KEEP_TURNS
+    minimum = min(app_config.CONTEXT_MIN_KEEP_TURNS, keep)
+    candidates = []
+    while keep > minimum:
+        candidates.append(keep)
+        keep -= 2
+    candidates.append(minimum)
+    return candidates
+
+
+def local_summary(previous_summary: str | None, messages: list, max_chars: int) -> str:
+    """无法调用 LLM 生成摘要时的降级方案：逐条截断拼接，超出长度时保留最近的部分"""
+    lines = [previous_summary] if previous_summary else []
+    for msg in messages:
+        role_name = "买家" if msg.role == "buyer" else "卖家"
+        content = msg.content if len(msg.content) <= 60 else msg.content[:60] + "…"
+        lines.append(f"{role_name}: {content}")
+    text = "\n".join(lines)
+    return text[-max_chars:]
@@ -0,0 +1,146 @@
+"""
+多供应商故障转移与对冲请求
+按顺序尝试供应商：前一个失败时立即切换；前一个超过对冲等待时间仍无响应时，
+并行向下一个供应商发起对冲请求，最先返回有效结果者胜出，其余请求取消
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .. import config as app_config
+
+logger = logging.getLogger(__name__)
+
+
+def provider_label(provider) -> str:
+    """供应商标识：modelId@baseUrl"""
+    return f"{provider.modelId}@{provider.baseUrl.rstrip('/')}"
+
+
+class LatencyTracker:
+    """记录每个供应商最近的成功响应耗时（由实际发出的 HTTP 请求记录），用于计算对冲等待时间"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self._wins: dict[str, int] = {}
+        self._fallback_wins = 0
+
+    def record(self, label: str, seconds: float) -> None:
+        samples = self._samples.get(label)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[label] = samples
+        samples.append(seconds)
+
+    def record_win(self, label: str, fallback: bool) -> None:
+        self._wins[label] = self._wins.get(label, 0) + 1
+        if fallback:
+            self._fallback_wins += 1
+
+    def percentile(self, label: str, pct: float) -> Optional[float]:
+        samples = self._samples.get(label)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def hedge_delay(self, label: str) -> float:
+        """对冲等待时间：固定配置优先，否则取该供应商的 p95（样本不足时用默认值）"""
+        if app_config.LLM_HEDGE_DELAY > 0:
+            return app_config.LLM_HEDGE_DELAY
+        samples = self._samples.get(label)
+        if samples is not None and len(samples) >= app_config.LLM_HEDGE_MIN_SAMPLES:
+            return self.percentile(label, 95)
+        return app_config.LLM_HEDGE_DEFAULT_DELAY
+
+    def stats(self) -> dict:
+        providers = []
+        for label, samples in self._samples.items():
+            providers.append({
+                "provider": label,
+                "samples": len(samples),
+                "p50": _round(self.percentile(label, 50)),
+                "p95": _round(self.percentile(label, 95)),
+                "hedgeDelay": _round(self.hedge_delay(label)),
+                "wins": self._wins.get(label, 0),
+            })
+        return {
+            "enabled": app_config.LLM_HEDGE_ENABLED,
+            "fallbackWins": self._fallback_wins,
+            "providers": providers,
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+latency_tracker = LatencyTracker()
+
+
+async def call_with_failover(
+    providers: list,
+    attempt: Callable[[Any], Awaitable[Any]],
+    hedge: bool = True,
+) -> tuple[Any, Any]:
+    """
+    依次向供应商发起 attempt(provider)，返回 (结果, 胜出的供应商)
+
+    Args:
+        providers: 按优先级排列的供应商配置
+        attempt: 对单个供应商发起请求并返回有效结果（无效结果应抛出异常）
+        hedge: 是否启用对冲请求（否则只在失败时故障转移）
+    """
+    if not providers:
+        raise ValueError("缺少LLM配置")
+
+    hedge = hedge and app_config.LLM_HEDGE_ENABLED and len(providers) > 1
+    pending: dict[asyncio.Task, Any] = {}
+    next_index = 0
+    last_error: Optional[Exception] = None
+
+    def launch() -> Any:
+        nonlocal next_index
+        provider = providers[next_index]
+        next_index += 1
+        pending[asyncio.ensure_future(attempt(provider))] = provider
+        return provider
+
+    latest = launch()
+    try:
+        while pending:
+            timeout = None
+            if hedge and next_index < len(providers):
+                timeout = latency_tracker.hedge_delay(provider_label(latest))
+
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # 超过对冲等待时间仍无响应，向下一个供应商发起对冲请求
+                logger.info(
+                    f"Hedging LLM request: {provider_label(latest)} exceeded {timeout:.1f}s, "
+                    f"trying {provider_label(providers[next_index])}"
+                )
+                latest = launch()
+                continue
+
+            for task in done:
+                provider = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    latency_tracker.record_win(provider_label(provider), fallback=provider is not providers[0])
+                    return task.result(), provider
+                logger.warning(f"LLM provider {provider_label(provider)} failed: {type(error).__name__} - {error}")
+                last_error = error
+
+            # 全部失败且还有备用供应商时立即故障转移
+            if not pending and next_index < len(providers):
+                latest = launch()
+
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
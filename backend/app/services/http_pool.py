@@ -0,0 +1,85 @@
+"""
+LLM HTTP 客户端连接池
+按 baseUrl 复用长连接的 httpx.AsyncClient，避免每次请求都重新进行 TCP/TLS 握手
+"""
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from .. import config as app_config
+
+logger = logging.getLogger(__name__)
+
+# 默认超时：连接 30 秒，读取 120 秒（单次请求可覆盖）
+DEFAULT_TIMEOUT = httpx.Timeout(connect=30.0, read=120.0, write=30.0, pool=30.0)
+
+# baseUrl -> 客户端
+_clients: dict[str, httpx.AsyncClient] = {}
+_lock: Optional[asyncio.Lock] = None
+
+
+def _http2_available() -> bool:
+    """检查是否安装了 HTTP/2 依赖"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _normalize_base_url(base_url: str) -> str:
+    return base_url.rstrip("/")
+
+
+def _build_client(base_url: str) -> httpx.AsyncClient:
+    """创建一个新的长连接客户端"""
+    limits = httpx.Limits(
+        max_connections=app_config.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=app_config.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=app_config.LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+    http2 = app_config.LLM_HTTP2 and _http2_available()
+
+    logger.info(f"Creating pooled HTTP client for {base_url} (http2={http2})")
+    return httpx.AsyncClient(
+        timeout=DEFAULT_TIMEOUT,
+        limits=limits,
+        http2=http2,
+    )
+
+
+async def get_client(base_url: str) -> httpx.AsyncClient:
+    """获取指定 baseUrl 的共享客户端（不存在则创建）"""
+    global _lock
+    key = _normalize_base_url(base_url)
+
+    client = _clients.get(key)
+    if client is not None and not client.is_closed:
+        return client
+
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        client = _clients.get(key)
+        if client is None or client.is_closed:
+            client = _build_client(key)
+            _clients[key] = client
+        return client
+
+
+async def close_all() -> None:
+    """关闭所有客户端（应用关闭时调用）"""
+    clients = list(_clients.values())
+    _clients.clear()
+
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client: {type(e).__name__} - {str(e)}")
+
+    if clients:
+        logger.info(f"Closed {len(clients)} pooled HTTP client(s)")
@@ -0,0 +1,348 @@
+"""
+异步分析任务
+分析请求先入队并立即返回任务 ID，由固定数量的后台 worker 执行；
+任务状态保存在 SQLite 中，排队中（或执行到一半）的任务在重启后重新入队。
+多进程部署时每个进程以 worker_id 领取任务并定期续约，只有租约过期（执行它的进程已退出）的任务才会被重新排队
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .. import config as app_config
+from ..database import get_db, run_in_db
+from ..models.schemas import AnalysisJob, LLMConfig
+from . import session_service
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# 长轮询时（任务由其他进程执行、本进程没有完成事件）查询任务行的初始/最大间隔（秒）
+WAIT_POLL_INITIAL = 0.2
+WAIT_POLL_MAX = 2.0
+
+# 本进程的标识（写入领取的任务行）
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_queue: Optional[asyncio.Queue] = None
+_workers: list[asyncio.Task] = []
+_heartbeat: Optional[asyncio.Task] = None
+# 任务 ID -> 完成事件（供长轮询等待）
+_done_events: dict[str, asyncio.Event] = {}
+# 本进程正在执行的任务 ID
+_running: set[str] = set()
+
+
+async def submit_analysis_job(
+    session_id: int,
+    message_id: int,
+    config: LLMConfig,
+    use_cache: bool = True,
+) -> AnalysisJob:
+    """创建分析任务并入队"""
+    job_id = uuid.uuid4().hex
+    await run_in_db(_insert_job, job_id, session_id, message_id, config, use_cache)
+    _enqueue(job_id)
+    return await run_in_db(get_job, job_id)
+
+
+def _insert_job(job_id: str, session_id: int, message_id: int, config: LLMConfig, use_cache: bool) -> None:
+    with get_db("_insert_job") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO analysis_jobs (id, session_id, message_id, status, llm_config, use_cache, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                job_id,
+                session_id,
+                message_id,
+                QUEUED,
+                config.model_dump_json(),
+                1 if use_cache else 0,
+                datetime.now().isoformat(),
+            )
+        )
+
+
+def get_job(job_id: str) -> Optional[AnalysisJob]:
+    """获取任务状态（已完成的任务附带分析结果）"""
+    with get_db("get_job") as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    return _row_to_job(row)
+
+
+async def wait_for_job(job_id: str, timeout: float) -> Optional[AnalysisJob]:
+    """
+    长轮询：任务未完成时最多等待 timeout 秒
+
+    本进程有该任务的完成事件时等待事件；否则（如任务由其他进程执行）按退避间隔查询任务行。
+    """
+    job = await run_in_db(get_job, job_id)
+    if job is None or job.status in (SUCCEEDED, FAILED) or timeout <= 0:
+        return job
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(timeout, app_config.JOB_WAIT_MAX)
+    interval = WAIT_POLL_INITIAL
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return job
+
+        event = _done_events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            return await run_in_db(get_job, job_id)
+
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 2, WAIT_POLL_MAX)
+
+        job = await run_in_db(get_job, job_id)
+        if job is None or job.status in (SUCCEEDED, FAILED):
+            return job
+
+
+async def start_workers() -> None:
+    """启动后台 worker 与续约任务，并把未完成的任务重新入队"""
+    global _queue, _heartbeat
+    _queue = asyncio.Queue()
+
+    await _requeue_expired()
+
+    for index in range(max(app_config.ANALYSIS_WORKERS, 1)):
+        _workers.append(asyncio.ensure_future(_worker(index)))
+    _heartbeat = asyncio.ensure_future(_heartbeat_loop())
+
+
+async def _requeue_expired(include_queued: bool = True) -> None:
+    pending = await run_in_db(_requeue_unfinished, include_queued)
+    for job_id in pending:
+        _enqueue(job_id)
+    if pending:
+        logger.info(f"Re-enqueued {len(pending)} analysis job(s)")
+
+
+def _requeue_unfinished(include_queued: bool = True) -> list[str]:
+    """
+    租约过期（执行它的进程已退出）的任务重新排队，返回需要在本进程入队的任务 ID
+    其他进程仍在执行的任务保持不变；同一任务在多个进程中重复入队也只会被领取一次。
+    include_queued 为 False 时（定期检查）只返回刚接管的任务与排队超过租约时间的任务，
+    避免反复入队其他进程正常排队中的任务
+    """
+    cutoff = (datetime.now() - timedelta(seconds=app_config.JOB_LEASE_TIMEOUT)).isoformat()
+    with get_db("_requeue_unfinished") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id FROM analysis_jobs WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (RUNNING, cutoff)
+        )
+        expired = [row["id"] for row in cursor.fetchall()]
+        cursor.executemany(
+            """
+            UPDATE analysis_jobs
+            SET status = ?, started_at = NULL, worker_id = NULL, heartbeat_at = NULL
+            WHERE id = ? AND status = ?
+            """,
+            [(QUEUED, job_id, RUNNING) for job_id in expired]
+        )
+
+        if include_queued:
+            cursor.execute(
+                "SELECT id FROM analysis_jobs WHERE status = ? ORDER BY created_at ASC",
+                (QUEUED,)
+            )
+        else:
+            cursor.execute(
+                "SELECT id FROM analysis_jobs WHERE status = ? AND created_at < ? ORDER BY created_at ASC",
+                (QUEUED, cutoff)
+            )
+        queued = [row["id"] for row in cursor.fetchall()]
+        return list(dict.fromkeys(expired + queued))
+
+
+async def _heartbeat_loop() -> None:
+    """定期为本进程执行中的任务续约，并接管其他进程遗留的过期任务"""
+    while True:
+        await asyncio.sleep(app_config.JOB_HEARTBEAT_INTERVAL)
+        try:
+            await run_in_db(_renew_leases)
+            await _requeue_expired(include_queued=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Analysis job heartbeat failed: {e}")
+
+
+def _renew_leases() -> None:
+    with get_db("_renew_leases") as conn:
+        conn.execute(
+            "UPDATE analysis_jobs SET heartbeat_at = ? WHERE worker_id = ? AND status = ?",
+            (datetime.now().isoformat(), WORKER_ID, RUNNING)
+        )
+
+
+def _release_leases() -> None:
+    """本进程执行到一半的任务放回队列，由其他进程或下次启动时立即接手"""
+    with get_db("_release_leases") as conn:
+        conn.execute(
+            """
+            UPDATE analysis_jobs
+            SET status = ?, started_at = NULL, worker_id = NULL, heartbeat_at = NULL
+            WHERE worker_id = ? AND status = ?
+            """,
+            (QUEUED, WORKER_ID, RUNNING)
+        )
+
+
+async def stop_workers() -> None:
+    """停止后台 worker，本进程执行到一半的任务重新排队"""
+    global _queue, _heartbeat
+    tasks = list(_workers)
+    if _heartbeat is not None:
+        tasks.append(_heartbeat)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _heartbeat = None
+    _queue = None
+
+    try:
+        await run_in_db(_release_leases)
+    except Exception as e:
+        logger.warning(f"Failed to release analysis job leases: {e}")
+
+
+def _enqueue(job_id: str) -> None:
+    _done_events.setdefault(job_id, asyncio.Event())
+    if _queue is None:
+        # worker 尚未启动，启动时会从数据库重新入队
+        return
+    _queue.put_nowait(job_id)
+
+
+async def _worker(index: int) -> None:
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Analysis worker {index} failed on job {job_id}: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def _run_job(job_id: str) -> None:
+    row = await run_in_db(_claim_job, job_id)
+    if row is None:
+        # 已被其他 worker 领取或已结束；同一任务在本进程重复入队时由正在执行它的 worker 负责唤醒等待者
+        if job_id not in _running:
+            _notify_done(job_id)
+        return
+
+    _running.add(job_id)
+    try:
+        analysis_id = None
+        error = None
+        try:
+            result = await session_service.analyze_message(
+                session_id=row["session_id"],
+                message_id=row["message_id"],
+                config=LLMConfig.model_validate_json(row["llm_config"]),
+                use_cache=bool(row["use_cache"]),
+            )
+            if result.get("analysis") is not None:
+                analysis_id = result["analysis"].id
+            else:
+                error = result.get("error") or "分析失败"
+        except Exception as e:
+            error = str(e)
+
+        await run_in_db(_save_result, job_id, analysis_id, error)
+    finally:
+        # 结果保存失败或被取消时也唤醒长轮询的等待者（它们会重新读取任务状态）
+        _running.discard(job_id)
+        _notify_done(job_id)
+
+
+def _notify_done(job_id: str) -> None:
+    event = _done_events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def _claim_job(job_id: str):
+    """把排队中的任务标记为由本进程执行并返回任务行；已被其他 worker 领取时返回 None"""
+    now = datetime.now().isoformat()
+    with get_db("_claim_job") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE analysis_jobs SET status = ?, started_at = ?, worker_id = ?, heartbeat_at = ?
+            WHERE id = ? AND status = ?
+            """,
+            (RUNNING, now, WORKER_ID, now, job_id, QUEUED)
+        )
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,))
+        return cursor.fetchone()
+
+
+def _save_result(job_id: str, analysis_id: Optional[int], error: Optional[str]) -> None:
+    """记录任务结果，并清除保存的 LLM 配置（含 API Key）"""
+    with get_db("_save_result") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE analysis_jobs
+            SET status = ?, analysis_id = ?, error = ?, llm_config = NULL, finished_at = ?
+            WHERE id = ?
+            """,
+            (
+                FAILED if error else SUCCEEDED,
+                analysis_id,
+                error,
+                datetime.now().isoformat(),
+                job_id,
+            )
+        )
+
+
+def _row_to_job(row) -> AnalysisJob:
+    """将数据库行转换为 AnalysisJob 对象"""
+    analysis = None
+    if row["analysis_id"] is not None:
+        analysis = session_service.get_analysis(row["analysis_id"])
+
+    return AnalysisJob(
+        id=row["id"],
+        sessionId=row["session_id"],
+        messageId=row["message_id"],
+        status=row["status"],
+        message=session_service.get_message(row["session_id"], row["message_id"]),
+        analysis=analysis,
+        error=row["error"],
+        createdAt=datetime.fromisoformat(row["created_at"]),
+        startedAt=datetime.fromisoformat(row["started_at"]) if row["started_at"] else None,
+        finishedAt=datetime.fromisoformat(row["finished_at"]) if row["finished_at"] else None,
+    )
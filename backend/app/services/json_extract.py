@@ -0,0 +1,250 @@
+"""
+LLM 响应 JSON 提取
+单次扫描定位平衡的花括号片段（识别字符串与转义），必要时修复尾逗号和被截断的输出。
+安装了 orjson 时使用 orjson 解析。
+"""
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+try:
+    import orjson
+
+    def _loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    _DECODE_ERRORS: tuple = (orjson.JSONDecodeError, ValueError)
+except ImportError:  # pragma: no cover - 取决于运行环境
+    import json
+
+    def _loads(text: str) -> Any:
+        return json.loads(text)
+
+    _DECODE_ERRORS = (ValueError,)
+
+
+class LLMParseError(ValueError):
+    """
+    LLM 响应解析失败
+
+    kind:
+    - empty：响应为空
+    - no_json：响应中没有 JSON 对象
+    - invalid_json：找到了 JSON 片段但无法解析（修复后仍失败）
+    - truncated：输出被截断且无法修复
+    - not_object：JSON 顶层不是对象
+    """
+
+    def __init__(self, kind: str, detail: str, position: Optional[int] = None, snippet: str = ""):
+        self.kind = kind
+        self.detail = detail
+        self.position = position
+        self.snippet = snippet
+        super().__init__(f"无法解析 LLM 响应（{kind}）: {detail}")
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "detail": self.detail,
+            "position": self.position,
+            "snippet": self.snippet,
+        }
+
+
+# 完整字符串 | 结构字符 | 未闭合字符串的起始引号
+_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],]|"')
+
+# 字符串（原样保留） | 紧跟 } 或 ] 的多余逗号
+_TRAILING_COMMA_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[}\]])')
+
+
+class _Span:
+    """扫描得到的候选 JSON 片段"""
+
+    __slots__ = ("start", "end", "complete", "stack", "in_string", "cuts", "has_trailing_comma")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end = start
+        self.complete = False
+        # 截断时未闭合的括号
+        self.stack: list[str] = []
+        self.in_string = False
+        # 可安全截断的位置：(位置, 括号深度)，保证 stack[:深度] 即该位置需要补全的括号
+        self.cuts: list[tuple[int, int]] = []
+        self.has_trailing_comma = False
+
+
+def _scan(text: str) -> Iterator[_Span]:
+    """
+    单次扫描，依次产出顶层 {...} 片段
+
+    只在括号内部识别字符串，因此 JSON 之前的说明文字中的引号不会干扰扫描；
+    字符串整体由正则匹配跳过，Python 层只处理结构字符。
+    """
+    i = text.find("{")
+    while i >= 0:
+        span = _Span(i)
+        stack = ["{"]
+        cuts = span.cuts
+        prev = "{"
+
+        for match in _TOKEN_RE.finditer(text, i + 1):
+            token = match.group()
+            if token == "{" or token == "[":
+                stack.append(token)
+            elif token == "}" or token == "]":
+                if prev == ",":
+                    span.has_trailing_comma = True
+                stack.pop()
+                depth = len(stack)
+                if not depth:
+                    span.end = match.end()
+                    span.complete = True
+                    break
+                # 内层的截断点已被本次闭合覆盖
+                while cuts and cuts[-1][1] > depth:
+                    cuts.pop()
+                cuts.append((match.end(), depth))
+            elif token == ",":
+                cuts.append((match.start(), len(stack)))
+            elif token == '"':
+                # 字符串直到结尾都未闭合
+                span.in_string = True
+                break
+            prev = token[0]
+
+        if span.complete:
+            yield span
+            i = text.find("{", span.end)
+        else:
+            # 扫描到结尾仍未闭合：输出被截断
+            span.end = len(text)
+            span.stack = stack
+            yield span
+            return
+
+
+def _strip_trailing_commas(fragment: str) -> str:
+    """去掉 } 或 ] 之前多余的逗号（忽略字符串内部）"""
+    return _TRAILING_COMMA_RE.sub(lambda m: m.group(1) or m.group(2), fragment)
+
+
+def _close(stack: Iterable[str]) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(tuple(stack)))
+
+
+def _repair_truncated(text: str, span: _Span) -> Iterable[str]:
+    """为被截断的片段生成修复候选：优先在最后一个完整值处截断，其次直接补全"""
+    fragment = text[span.start:span.end]
+
+    for cut, depth in reversed(span.cuts[-3:]):
+        yield _strip_trailing_commas(text[span.start:cut].rstrip().rstrip(",")) + _close(span.stack[:depth])
+
+    closed = fragment + ('"' if span.in_string else "")
+    closed = closed.rstrip()
+    if closed.endswith(":"):
+        closed += " null"
+    yield _strip_trailing_commas(closed.rstrip(",")) + _close(span.stack)
+
+
+def _fast_candidates(text: str) -> Iterator[str]:
+    """常见格式的候选片段，只用 str.find 定位，不做回溯"""
+    if text[0] == "{" and text[-1] == "}":
+        yield text
+        return
+
+    fence = text.find("```json")
+    if fence >= 0:
+        body_start = fence + len("```json")
+        body_end = text.find("```", body_start)
+        if body_end >= 0:
+            yield text[body_start:body_end].strip()
+            return
+
+    first = text.find("{")
+    last = text.rfind("}")
+    if 0 <= first < last:
+        yield text[first:last + 1]
+
+
+def _try_loads(candidate: str) -> tuple[Any, Optional[Exception]]:
+    try:
+        return _loads(candidate), None
+    except _DECODE_ERRORS as e:
+        return None, e
+
+
+def _matches(value: Any, expected_keys: Optional[Iterable[str]]) -> bool:
+    if not isinstance(value, dict):
+        return False
+    if not expected_keys:
+        return True
+    return any(key in value for key in expected_keys)
+
+
+def extract_json_object(text: str, expected_keys: Optional[Iterable[str]] = None) -> dict:
+    """
+    从 LLM 输出中提取 JSON 对象
+
+    Args:
+        text: LLM 原始输出（可能包含说明文字、```json 代码块、多个对象或被截断）
+        expected_keys: 期望出现的字段；有多个候选对象时优先返回包含这些字段的对象
+
+    Raises:
+        LLMParseError: 无法提取时，kind 标明失败类型
+    """
+    if text is None or not text.strip():
+        raise LLMParseError("empty", "响应为空")
+
+    expected_keys = tuple(expected_keys) if expected_keys else None
+
+    # 快速路径：整段就是 JSON，或 ```json 代码块 / 首尾花括号之间就是 JSON（各至多解析一次）
+    stripped = text.strip()
+    for candidate in _fast_candidates(stripped):
+        value, _ = _try_loads(candidate)
+        if _matches(value, expected_keys):
+            return value
+
+    fallback: Optional[dict] = None
+    first_error: Optional[LLMParseError] = None
+
+    for span in _scan(text):
+        if span.complete:
+            fragment = text[span.start:span.end]
+            value, error = _try_loads(fragment)
+            if error is not None and span.has_trailing_comma:
+                value, error = _try_loads(_strip_trailing_commas(fragment))
+            if error is not None:
+                if first_error is None:
+                    first_error = LLMParseError(
+                        "invalid_json", str(error), span.start, fragment[:80]
+                    )
+                continue
+        else:
+            value = None
+            for candidate in _repair_truncated(text, span):
+                value, error = _try_loads(candidate)
+                if error is None:
+                    break
+            if value is None:
+                if first_error is None:
+                    first_error = LLMParseError(
+                        "truncated", "输出被截断且无法修复", span.start, text[span.start:span.start + 80]
+                    )
+                continue
+
+        if _matches(value, expected_keys):
+            return value
+        if fallback is None and isinstance(value, dict):
+            fallback = value
+
+    if fallback is not None:
+        return fallback
+    if first_error is not None:
+        raise first_error
+
+    # 没有找到对象，可能顶层是数组或其他值
+    value, error = _try_loads(stripped)
+    if error is None:
+        raise LLMParseError("not_object", f"JSON 顶层为 {type(value).__name__}", 0, stripped[:80])
+    raise LLMParseError("no_json", "响应中没有 JSON 对象", None, stripped[:80])
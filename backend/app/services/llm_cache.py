@@ -0,0 +1,242 @@
+"""
+LLM 响应缓存
+以 (modelId, baseUrl, 系统提示词, 提示词, temperature) 的哈希为键，
+内存 LRU + SQLite 两级缓存，带 TTL 与容量上限
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .. import config as app_config
+from ..database import get_db, run_in_db
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(
+    model_id: str,
+    base_url: str,
+    system_prompt: str,
+    prompt: str,
+    temperature: float,
+) -> str:
+    """计算提示词指纹"""
+    raw = json.dumps(
+        [model_id, base_url.rstrip("/"), system_prompt, prompt, temperature],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """两级 LLM 响应缓存"""
+
+    def __init__(
+        self,
+        memory_size: int,
+        max_entries: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+    ):
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        # key -> (response, expires_at)
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._stats = {
+            "memoryHits": 0,
+            "dbHits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中返回 None"""
+        if not self.enabled:
+            return None
+        response = self._get_memory(key)
+        if response is None:
+            response = self._on_db_lookup(key, self._get_db(key))
+        return response
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """查询缓存（内存未命中时在数据库线程中查询 SQLite）"""
+        if not self.enabled:
+            return None
+        response = self._get_memory(key)
+        if response is None:
+            response = self._on_db_lookup(key, await run_in_db(self._get_db, key))
+        return response
+
+    def set(self, key: str, response: str, model_id: str = "") -> None:
+        """写入缓存"""
+        if not self.enabled:
+            return
+        now = time.time()
+        self._remember(key, response, now + self.ttl_seconds)
+        self._set_db(key, response, model_id, now)
+
+    async def set_async(self, key: str, response: str, model_id: str = "") -> None:
+        """写入缓存（SQLite 写入在数据库线程中执行）"""
+        if not self.enabled:
+            return
+        now = time.time()
+        self._remember(key, response, now + self.ttl_seconds)
+        await run_in_db(self._set_db, key, response, model_id, now)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        """1. 内存 LRU"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self._stats["memoryHits"] += 1
+        return response
+
+    def _get_db(self, key: str) -> Optional[tuple[str, float]]:
+        """2. SQLite，命中时返回 (response, expires_at)"""
+        now = time.time()
+        try:
+            with get_db("llm_cache_get") as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?",
+                    (key,)
+                )
+                row = cursor.fetchone()
+                if row is not None and row["created_at"] + self.ttl_seconds > now:
+                    cursor.execute(
+                        "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                        (now, key)
+                    )
+                    return row["response"], row["created_at"] + self.ttl_seconds
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {type(e).__name__} - {str(e)}")
+        return None
+
+    def _on_db_lookup(self, key: str, entry: Optional[tuple[str, float]]) -> Optional[str]:
+        """记录 SQLite 查询结果，命中时回填内存 LRU"""
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._remember(key, *entry)
+        self._stats["dbHits"] += 1
+        return entry[0]
+
+    def _set_db(self, key: str, response: str, model_id: str, now: float) -> None:
+        try:
+            with get_db("llm_cache_set") as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO llm_cache (key, response, model_id, created_at, last_access, hits)
+                    VALUES (?, ?, ?, ?, ?, 0)
+                    """,
+                    (key, response, model_id, now, now)
+                )
+                self._stats["stores"] += 1
+                self._evict(cursor, now)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {type(e).__name__} - {str(e)}")
+
+    def discard(self, key: str) -> None:
+        """删除单个缓存条目（如响应无法解析时）"""
+        self._memory.pop(key, None)
+        self._discard_db(key)
+
+    async def discard_async(self, key: str) -> None:
+        """删除单个缓存条目（SQLite 删除在数据库线程中执行）"""
+        self._memory.pop(key, None)
+        await run_in_db(self._discard_db, key)
+
+    def _discard_db(self, key: str) -> None:
+        try:
+            with get_db("llm_cache_discard") as conn:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        except Exception as e:
+            logger.warning(f"LLM cache discard failed: {type(e).__name__} - {str(e)}")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._memory.clear()
+        self._clear_db()
+
+    async def clear_async(self) -> None:
+        """清空缓存（SQLite 删除在数据库线程中执行）"""
+        self._memory.clear()
+        await run_in_db(self._clear_db)
+
+    def _clear_db(self) -> None:
+        with get_db("llm_cache_clear") as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        """命中统计"""
+        lookups = self._stats["memoryHits"] + self._stats["dbHits"] + self._stats["misses"]
+        hits = self._stats["memoryHits"] + self._stats["dbHits"]
+
+        db_entries = 0
+        try:
+            with get_db("llm_cache_stats") as conn:
+                db_entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        except Exception:
+            pass
+
+        return {
+            "enabled": self.enabled,
+            **self._stats,
+            "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+            "memoryEntries": len(self._memory),
+            "dbEntries": db_entries,
+            "ttlSeconds": self.ttl_seconds,
+            "maxEntries": self.max_entries,
+        }
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        """写入内存 LRU，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self, cursor, now: float) -> None:
+        """清理过期条目，并按最近访问时间淘汰超出容量的条目"""
+        cursor.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        evicted = cursor.rowcount
+
+        cursor.execute("SELECT COUNT(*) FROM llm_cache")
+        overflow = cursor.fetchone()[0] - self.max_entries
+        if overflow > 0:
+            cursor.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+            evicted += cursor.rowcount
+
+        self._stats["evictions"] += max(evicted, 0)
+
+
+response_cache = LLMResponseCache(
+    memory_size=app_config.LLM_CACHE_MEMORY_SIZE,
+    max_entries=app_config.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=app_config.LLM_CACHE_TTL,
+    enabled=app_config.LLM_CACHE_ENABLED,
+)
@@ -1,20 +1,43 @@
+import asyncio
 import httpx
 import json
-import re
 import logging
-from pathlib import Path
-from typing import Optional
+from time import perf_counter
+from typing import Any, AsyncIterator, Optional
 from ..models.schemas import (
-    LLMConfig, ExtractedInfoV3, RequirementSummary
+    LLMConfig, LLMProvider, ExtractedInfoV3, RequirementSummary
 )
-from ..data.services_loader import get_services
+from ..data.services_loader import get_services, get_services_version
+from ..prompts.analyze_prompt import template_registry
+from ..prompts.prefix_cache import get_compiled_prompt
+from . import http_pool, metrics, usage_service
+from .llm_cache import fingerprint, response_cache
+from .. import config as app_config
+from . import pre_extractor, pricing
+from .context_window import estimate_tokens
+from .hedging import call_with_failover, latency_tracker, provider_label
+from .json_extract import LLMParseError, extract_json_object
+from .rate_limiter import ProviderUnavailableError, get_limiter
+from .stream_parser import AnalysisStreamParser
 
 logger = logging.getLogger(__name__)
 
 
-async def call_llm(config: LLMConfig, prompt: str) -> str:
-    """调用大模型 API"""
-    # 构建请求
+# 简洁的系统提示词
+SYSTEM_PROMPT = "你是一个专业的闲鱼代写服务助手，帮助卖家专业地回复买家咨询。请严格按照要求的JSON格式返回结果。"
+
+TEMPERATURE = 0.7
+
+# 本地模板回复的供应商标识
+LOCAL_PROVIDER = "local-rules"
+
+# 响应中有多个 JSON 对象时，优先选择包含这些字段的对象
+ANALYSIS_KEYS = ("suggestedReplies", "extractedInfo")
+SUMMARY_KEYS = ("articleType", "requirements")
+
+
+def _build_chat_request(config: LLMProvider, prompt: str, stream: bool = False) -> tuple[str, dict, dict]:
+    """构建 chat/completions 请求的 url、headers 和 payload"""
     url = f"{config.baseUrl.rstrip('/')}/chat/completions"
 
     headers = {
@@ -22,70 +45,252 @@ async def call_llm(config: LLMConfig, prompt: str) -> str:
         "Content-Type": "application/json",
     }
 
-    # 简洁的系统提示词
-    system_prompt = "你是一个专业的闲鱼代写服务助手，帮助卖家专业地回复买家咨询。请严格按照要求的JSON格式返回结果。"
-
     payload = {
         "model": config.modelId,
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        "temperature": 0.7,
+        "temperature": TEMPERATURE,
     }
+    if stream:
+        payload["stream"] = True
+
+    return url, headers, payload
+
+
+def _cache_key(config: LLMProvider, prompt: str) -> str:
+    """响应缓存键"""
+    return fingerprint(config.modelId, config.baseUrl, SYSTEM_PROMPT, prompt, TEMPERATURE)
+
+
+async def call_llm(config: LLMProvider, prompt: str, use_cache: bool = True) -> str:
+    """调用大模型 API（命中缓存时直接返回）"""
+    if use_cache:
+        key = _cache_key(config, prompt)
+        cached = await response_cache.get_async(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit, length: {len(cached)}")
+            usage_service.record(config.modelId, config.baseUrl, None, 0.0, cached=True)
+            return cached
+
+    content = await _request_completion(config, prompt)
+
+    if use_cache:
+        await response_cache.set_async(key, content, config.modelId)
+    return content
+
+
+async def _parse_cached_response(
+    config: LLMProvider,
+    prompt: str,
+    response_text: str,
+    expected_keys: Optional[tuple] = None,
+    parse_times: Optional[list[float]] = None,
+) -> dict:
+    """
+    解析 LLM 响应；解析失败时同时丢弃该响应的缓存，避免重试时再次命中
+    传入 parse_times 时追加本次解析耗时（秒），由调用方记入分析阶段指标
+    """
+    started = perf_counter()
+    try:
+        return parse_llm_response(response_text, expected_keys)
+    except LLMParseError as e:
+        logger.warning(f"LLM response parse failed: kind={e.kind}, position={e.position}, detail={e.detail}")
+        error = e
+    finally:
+        if parse_times is not None:
+            parse_times.append(perf_counter() - started)
+
+    await response_cache.discard_async(_cache_key(config, prompt))
+    raise error
+
+
+async def _request_completion(config: LLMProvider, prompt: str) -> str:
+    """请求 chat/completions 并返回生成内容"""
+    url, headers, payload = _build_chat_request(config, prompt)
 
     logger.info(f"Calling LLM API: {url}")
     logger.info(f"Model: {config.modelId}")
 
-    # 设置更长的超时时间：连接 30 秒，读取 120 秒
-    timeout = httpx.Timeout(connect=30.0, read=120.0, write=30.0, pool=30.0)
+    # 复用按 baseUrl 共享的长连接客户端（超时：连接 30 秒，读取 120 秒）
+    client = await http_pool.get_client(config.baseUrl)
+    limiter = get_limiter(config.baseUrl, config.modelId)
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
+    async def post() -> httpx.Response:
+        trace = metrics.HttpTrace()
+        request_started = perf_counter()
         try:
-            response = await client.post(url, json=payload, headers=headers)
-            logger.info(f"Response status: {response.status_code}")
-            response.raise_for_status()
-
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            logger.info(f"LLM response received, length: {len(content)}")
-            return content
-        except httpx.TimeoutException as e:
-            logger.error(f"Timeout error: {type(e).__name__}")
-            raise TimeoutError("API 响应超时，请检查网络连接或稍后重试")
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Request error: {type(e).__name__} - {str(e)}")
-            raise
-
+            response = await client.post(url, json=payload, headers=headers, extensions={"trace": trace})
+        finally:
+            trace.observe()
+        logger.info(f"Response status: {response.status_code}")
+        response.raise_for_status()
+        # 对冲等待时间只参考供应商实际完成请求的耗时（不含缓存命中与限流等待）
+        latency_tracker.record(provider_label(config), perf_counter() - request_started)
+        return response
 
-def parse_llm_response(response_text: str) -> dict:
-    """解析 LLM 响应"""
-    # 尝试直接解析 JSON
+    started = perf_counter()
+    outcome = "error"
     try:
-        return json.loads(response_text)
-    except json.JSONDecodeError:
-        pass
+        # 限流、429/5xx 退避重试与熔断
+        response = await limiter.run(post)
+
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
+        logger.info(f"LLM response received, length: {len(content)}")
+        usage_service.record(
+            config.modelId,
+            config.baseUrl,
+            data.get("usage"),
+            (perf_counter() - started) * 1000,
+            prompt=SYSTEM_PROMPT + prompt,
+            completion=content,
+        )
+        outcome = "success"
+        return content
+    except httpx.TimeoutException as e:
+        outcome = "timeout"
+        logger.error(f"Timeout error: {type(e).__name__}")
+        raise TimeoutError("API 响应超时，请检查网络连接或稍后重试")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Request error: {type(e).__name__} - {str(e)}")
+        raise
+    finally:
+        metrics.LLM_PHASE_DURATION.observe(perf_counter() - started, "total")
+        metrics.LLM_REQUESTS.inc("complete", outcome)
+
+
+async def call_llm_stream(config: LLMProvider, prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
+    """以流式方式调用大模型 API，逐段返回生成的文本（命中缓存时一次性返回）"""
+    key = _cache_key(config, prompt) if use_cache else None
+    if key is not None:
+        cached = await response_cache.get_async(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit, length: {len(cached)}")
+            usage_service.record(config.modelId, config.baseUrl, None, 0.0, cached=True)
+            yield cached
+            return
 
-    # 尝试提取 JSON 代码块
-    json_match = re.search(r"```json\s*(.*?)\s*```", response_text, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group(1))
-        except json.JSONDecodeError:
-            pass
+    parts = []
+    async for content in _request_completion_stream(config, prompt):
+        parts.append(content)
+        yield content
+
+    if key is not None:
+        await response_cache.set_async(key, "".join(parts), config.modelId)
 
-    # 尝试提取花括号内容
-    brace_match = re.search(r"\{.*\}", response_text, re.DOTALL)
-    if brace_match:
-        try:
-            return json.loads(brace_match.group())
-        except json.JSONDecodeError:
-            pass
 
-    raise ValueError("无法解析 LLM 响应")
+async def _request_completion_stream(config: LLMProvider, prompt: str) -> AsyncIterator[str]:
+    """以流式方式请求 chat/completions"""
+    url, headers, payload = _build_chat_request(config, prompt, stream=True)
+
+    logger.info(f"Calling LLM API (stream): {url}")
+    logger.info(f"Model: {config.modelId}")
+
+    client = await http_pool.get_client(config.baseUrl)
+    limiter = get_limiter(config.baseUrl, config.modelId)
+
+    attempt = 0
+    started = False
+    request_started = perf_counter()
+    while True:
+        trace = metrics.HttpTrace()
+        try:
+            # 整个流式响应期间占用一个并发名额
+            async with limiter.slot():
+                sent_at = perf_counter()
+                async with client.stream(
+                    "POST", url, json=payload, headers=headers, extensions={"trace": trace}
+                ) as response:
+                    logger.info(f"Response status: {response.status_code}")
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+
+                    total = 0
+                    first_token_at = None
+                    usage: dict = {}
+                    parts = []
+                    async for content in _iter_stream_content(response, usage):
+                        parts.append(content)
+                        if first_token_at is None:
+                            first_token_at = perf_counter()
+                            metrics.LLM_PHASE_DURATION.observe(first_token_at - sent_at, "first_token")
+                        started = True
+                        total += len(content)
+                        yield content
+
+                    logger.info(f"LLM stream finished, length: {total}")
+                    if first_token_at is not None:
+                        metrics.LLM_PHASE_DURATION.observe(perf_counter() - first_token_at, "generation")
+                    usage_service.record(
+                        config.modelId,
+                        config.baseUrl,
+                        usage,
+                        (perf_counter() - request_started) * 1000,
+                        prompt=SYSTEM_PROMPT + prompt,
+                        completion="".join(parts),
+                    )
+            limiter.record_success()
+            metrics.LLM_PHASE_DURATION.observe(perf_counter() - request_started, "total")
+            metrics.LLM_REQUESTS.inc("stream", "success")
+            return
+        except ProviderUnavailableError:
+            metrics.LLM_REQUESTS.inc("stream", "rejected")
+            raise
+        except Exception as e:
+            # 已输出部分内容后不再重试，只记录失败
+            delay = limiter.on_error(e, attempt, allow_retry=not started)
+            if delay is not None:
+                logger.warning(f"LLM stream failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            metrics.LLM_REQUESTS.inc("stream", "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+            if isinstance(e, httpx.TimeoutException):
+                logger.error(f"Timeout error: {type(e).__name__}")
+                raise TimeoutError("API 响应超时，请检查网络连接或稍后重试")
+            if isinstance(e, httpx.HTTPStatusError):
+                logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+            else:
+                logger.error(f"Request error: {type(e).__name__} - {str(e)}")
+            raise
+        finally:
+            trace.observe()
+
+
+async def _iter_stream_content(response: httpx.Response, usage: Optional[dict] = None) -> AsyncIterator[str]:
+    """解析 SSE 流中的增量文本（供应商在流中返回 usage 时写入 usage）"""
+    async for line in response.aiter_lines():
+        # SSE 格式：data: {...}，以 data: [DONE] 结束
+        if not line.startswith("data:"):
+            continue
+        data_str = line[5:].strip()
+        if data_str == "[DONE]":
+            break
+        if not data_str:
+            continue
+
+        chunk = json.loads(data_str)
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = choices[0].get("delta") or {}
+        content = delta.get("content")
+        if content:
+            yield content
+
+
+def parse_llm_response(response_text: str, expected_keys: Optional[tuple] = None) -> dict:
+    """解析 LLM 响应，失败时抛出 LLMParseError"""
+    return extract_json_object(response_text, expected_keys)
 
 
 async def test_connection(config: LLMConfig) -> bool:
@@ -96,21 +301,14 @@ async def test_connection(config: LLMConfig) -> bool:
         "Authorization": f"Bearer {config.apiKey}",
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return True
+    client = await http_pool.get_client(config.baseUrl)
+    response = await client.get(url, headers=headers, timeout=10.0)
+    response.raise_for_status()
+    return True
 
 
 # ========== V3 多轮对话分析 ==========
 
-def _load_template_v3() -> str:
-    """加载 V3 分析提示词模板"""
-    template_path = Path(__file__).parent.parent / "prompts" / "templates" / "analyze_v3.txt"
-    with open(template_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-
 def _format_conversation_history(messages: list) -> str:
     """格式化对话历史"""
     if not messages:
@@ -124,6 +322,17 @@ def _format_conversation_history(messages: list) -> str:
     return "\n".join(lines)
 
 
+def _format_windowed_history(messages: list, history_summary: Optional[str]) -> str:
+    """格式化对话历史：更早对话的滚动摘要 + 近期对话原文"""
+    if not history_summary:
+        return _format_conversation_history(messages)
+
+    recent = "\n".join(
+        f"{'买家' if msg.role == 'buyer' else '卖家'}: {msg.content}" for msg in messages
+    ) or "（无）"
+    return f"【更早对话摘要】\n{history_summary}\n\n【近期对话】\n{recent}"
+
+
 def _format_accumulated_info(info: Optional[ExtractedInfoV3]) -> str:
     """格式化已累积的信息"""
     if not info:
@@ -146,15 +355,10 @@ def _format_accumulated_info(info: Optional[ExtractedInfoV3]) -> str:
     return "\n".join(parts) if parts else "（暂无已提取信息）"
 
 
-def build_analyze_prompt_v3(
-    messages: list,
-    latest_message: str,
-    accumulated_info: Optional[ExtractedInfoV3] = None
-) -> str:
-    """构建 V3 分析提示词"""
+def _format_service_list() -> dict:
+    """格式化服务列表（静态前缀的填充值）"""
     services = get_services()
 
-    # 格式化服务列表
     service_lines = []
     for svc in services:
         price_info = []
@@ -172,22 +376,45 @@ def build_analyze_prompt_v3(
             line += f" ({svc.note})"
         service_lines.append(line)
 
-    # 加载模板并填充
-    template = _load_template_v3()
+    return {
+        "service_count": len(services),
+        "service_list": "\n".join(service_lines),
+    }
+
+
+def build_analyze_prompt_v3(
+    messages: list,
+    latest_message: str,
+    accumulated_info: Optional[ExtractedInfoV3] = None,
+    history_summary: Optional[str] = None,
+) -> str:
+    """构建 V3 分析提示词（history_summary 为更早对话的滚动摘要）"""
+    # 静态前缀（说明、服务列表、报价规则）按模板/服务列表版本预渲染并缓存，
+    # 只有按会话变化的部分追加在后面，便于供应商复用前缀缓存
+    template = template_registry.get("analyze_v3")
+    usage_service.set_prompt_version(f"analyze_v3@{template.hash[:12]}")
+    compiled = get_compiled_prompt(
+        "analyze_v3",
+        template.text,
+        (template.hash, get_services_version()),
+        _format_service_list,
+    )
 
     # 排除最后一条消息（因为它是 latest_message）
     history_messages = messages[:-1] if messages else []
 
-    prompt = template.format(
-        service_count=len(services),
-        service_list="\n".join(service_lines),
-        conversation_history=_format_conversation_history(history_messages),
+    accumulated_text = _format_accumulated_info(accumulated_info)
+    # 附上本地规则从最新消息中识别出的信息
+    pre_lines = pre_extractor.extract(latest_message).prompt_lines()
+    if pre_lines:
+        accumulated_text += "\n\n本地规则从最新消息中识别到（供参考，以对话内容为准）：\n" + "\n".join(pre_lines)
+
+    return compiled.render(
+        conversation_history=_format_windowed_history(history_messages, history_summary),
         latest_message=latest_message,
-        accumulated_info=_format_accumulated_info(accumulated_info),
+        accumulated_info=accumulated_text,
     )
 
-    return prompt
-
 
 class AnalysisResultV3:
     """V3 分析结果"""
@@ -201,6 +428,7 @@ class AnalysisResultV3:
         price_max: Optional[int],
         price_basis: Optional[str],
         quick_tags: list[str],
+        provider: Optional[str] = None,
     ):
         self.suggested_replies = suggested_replies
         self.extracted_info = extracted_info
@@ -210,12 +438,15 @@ class AnalysisResultV3:
         self.price_max = price_max
         self.price_basis = price_basis
         self.quick_tags = quick_tags
+        self.provider = provider
 
 
 async def analyze_conversation(
     messages: list,
     config: LLMConfig,
-    accumulated_info: Optional[ExtractedInfoV3] = None
+    accumulated_info: Optional[ExtractedInfoV3] = None,
+    use_cache: bool = True,
+    history_summary: Optional[str] = None,
 ) -> AnalysisResultV3:
     """
     分析多轮对话，返回 V3 格式的分析结果
@@ -224,6 +455,8 @@ async def analyze_conversation(
         messages: 对话消息列表（Message 对象或 dict）
         config: LLM 配置
         accumulated_info: 已累积提取的信息
+        use_cache: 是否使用 LLM 响应缓存
+        history_summary: messages 之前更早对话的滚动摘要
 
     Returns:
         AnalysisResultV3: 包含多个回复选项的分析结果
@@ -231,18 +464,196 @@ async def analyze_conversation(
     if not messages:
         raise ValueError("消息列表不能为空")
 
-    # 获取最新的买家消息
-    latest_message = messages[-1].content if hasattr(messages[-1], 'content') else messages[-1]['content']
+    with metrics.ANALYZE_STAGE_DURATION.time("pre_extract"):
+        pre = pre_extractor.extract(_message_content(messages[-1]))
+    if _should_reply_locally(pre, messages, accumulated_info, history_summary):
+        # 简单消息直接使用模板回复
+        return _build_local_result(pre, accumulated_info)
+
+    with metrics.ANALYZE_STAGE_DURATION.time("prompt"):
+        prompt = _build_prompt_for_messages(messages, accumulated_info, history_summary)
 
-    # 构建 prompt
-    prompt = build_analyze_prompt_v3(messages, latest_message, accumulated_info)
+    # 调用 LLM（主供应商失败或超过对冲等待时间时切换到备用供应商）
+    data, provider = await _call_and_parse(config, prompt, use_cache, ANALYSIS_KEYS, stage_metrics=True)
 
-    # 调用 LLM
-    response_text = await call_llm(config, prompt)
+    result = _build_analysis_result(data)
+    result.extracted_info = pre.merge_into(result.extracted_info)
+    _apply_local_pricing(result)
+    result.provider = provider_label(provider)
+    return result
 
-    # 解析响应
-    data = parse_llm_response(response_text)
 
+async def analyze_conversation_stream(
+    messages: list,
+    config: LLMConfig,
+    accumulated_info: Optional[ExtractedInfoV3] = None,
+    use_cache: bool = True,
+    history_summary: Optional[str] = None,
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    流式分析多轮对话
+
+    生成 (事件名, 数据)：
+    - "reply" / "extractedInfo" / "priceEstimate"：生成过程中增量解析出的部分结果
+    - "result"：完整响应解析后的 AnalysisResultV3（最后一个事件）
+    """
+    if not messages:
+        raise ValueError("消息列表不能为空")
+
+    pre = pre_extractor.extract(_message_content(messages[-1]))
+    if _should_reply_locally(pre, messages, accumulated_info, history_summary):
+        result = _build_local_result(pre, accumulated_info)
+        for index, text in enumerate(result.suggested_replies):
+            yield "reply", {"index": index, "text": text}
+        yield "result", result
+        return
+
+    prompt = _build_prompt_for_messages(messages, accumulated_info, history_summary)
+
+    # 流式请求只做故障转移：在收到首段内容前失败时切换到下一个供应商
+    providers = _provider_chain(config)
+    for index, provider in enumerate(providers):
+        parser = AnalysisStreamParser()
+        try:
+            async for delta in call_llm_stream(provider, prompt, use_cache=use_cache):
+                for event in parser.feed(delta):
+                    yield event
+        except Exception as e:
+            if parser.text or index == len(providers) - 1:
+                raise
+            logger.warning(f"LLM provider {provider_label(provider)} failed: {type(e).__name__} - {e}")
+            continue
+
+        parse_times: list[float] = []
+        try:
+            data = await _parse_cached_response(provider, prompt, parser.text, ANALYSIS_KEYS, parse_times)
+        finally:
+            metrics.ANALYZE_STAGE_DURATION.observe(sum(parse_times), "parse")
+        result = _build_analysis_result(data)
+        result.extracted_info = pre.merge_into(result.extracted_info)
+        _apply_local_pricing(result)
+        result.provider = provider_label(provider)
+        yield "result", result
+        return
+
+
+def _provider_chain(config: LLMConfig) -> list[LLMProvider]:
+    """主供应商 + 备用供应商（按顺序）"""
+    return [config, *config.fallbacks]
+
+
+async def _call_and_parse(
+    config: LLMConfig,
+    prompt: str,
+    use_cache: bool,
+    expected_keys: Optional[tuple] = None,
+    stage_metrics: bool = False,
+) -> tuple[dict, LLMProvider]:
+    """
+    调用 LLM 并解析 JSON，只有解析成功的结果才算有效响应
+    stage_metrics 为 True 时（消息分析）把解析耗时记为 parse 阶段，其余时间（含故障转移）记为 llm 阶段，两者不重叠
+    """
+    parse_times: Optional[list[float]] = [] if stage_metrics else None
+
+    async def attempt(provider: LLMProvider) -> dict:
+        response_text = await call_llm(provider, prompt, use_cache=use_cache)
+        return await _parse_cached_response(provider, prompt, response_text, expected_keys, parse_times)
+
+    started = perf_counter()
+    try:
+        return await call_with_failover(_provider_chain(config), attempt)
+    finally:
+        if parse_times is not None:
+            parse_seconds = sum(parse_times)
+            metrics.ANALYZE_STAGE_DURATION.observe(max(perf_counter() - started - parse_seconds, 0.0), "llm")
+            if parse_times:
+                metrics.ANALYZE_STAGE_DURATION.observe(parse_seconds, "parse")
+
+
+def _build_prompt_for_messages(
+    messages: list,
+    accumulated_info: Optional[ExtractedInfoV3] = None,
+    history_summary: Optional[str] = None,
+) -> str:
+    """根据消息列表构建分析提示词（最后一条为最新买家消息）"""
+    latest_message = _message_content(messages[-1])
+    return build_analyze_prompt_v3(messages, latest_message, accumulated_info, history_summary)
+
+
+def _message_content(message) -> str:
+    """消息内容（Message 对象或 dict）"""
+    return message.content if hasattr(message, 'content') else message['content']
+
+
+def _should_reply_locally(
+    pre: pre_extractor.PreExtraction,
+    messages: list,
+    accumulated_info: Optional[ExtractedInfoV3],
+    history_summary: Optional[str] = None,
+) -> bool:
+    """
+    是否对最新消息直接使用模板回复
+
+    只用于对话开头（没有之前的消息、滚动摘要和累积信息）的问候、感谢；确认类消息还需开启 LOCAL_REPLY_ACK_ENABLED。
+    """
+    if not pre.intent or not app_config.LOCAL_REPLY_ENABLED:
+        return False
+    if pre.intent == "ack" and not app_config.LOCAL_REPLY_ACK_ENABLED:
+        return False
+    history = [_message_content(message) for message in messages[:-1]]
+    return not pre_extractor.has_context(history, accumulated_info, history_summary)
+
+
+def _build_local_result(
+    pre: pre_extractor.PreExtraction,
+    accumulated_info: Optional[ExtractedInfoV3],
+) -> AnalysisResultV3:
+    """简单消息的模板回复（不调用 LLM，沿用已累积的提取信息）"""
+    extracted_info = pre.merge_into(accumulated_info)
+    missing_info = pre_extractor.missing_info(extracted_info)
+    result = AnalysisResultV3(
+        suggested_replies=list(pre_extractor.TEMPLATE_REPLIES[pre.intent]),
+        extracted_info=extracted_info,
+        missing_info=missing_info,
+        can_quote=False,
+        price_min=None,
+        price_max=None,
+        price_basis=None,
+        quick_tags=pre_extractor.quick_tags(missing_info),
+        provider=LOCAL_PROVIDER,
+    )
+    _apply_local_pricing(result)
+    return result
+
+
+def _apply_local_pricing(result: AnalysisResultV3) -> None:
+    """用本地报价引擎补全或校正报价（LLM 的报价超出规则区间时以本地计算为准）"""
+    (
+        result.can_quote,
+        result.price_min,
+        result.price_max,
+        result.price_basis,
+    ) = pricing.reconcile_price(
+        result.extracted_info,
+        result.can_quote,
+        result.price_min,
+        result.price_max,
+        result.price_basis,
+    )
+
+
+def estimate_analyze_prompt_tokens(
+    messages: list,
+    accumulated_info: Optional[ExtractedInfoV3] = None,
+    history_summary: Optional[str] = None,
+) -> int:
+    """估算分析提示词的 token 数（含系统提示词）"""
+    prompt = _build_prompt_for_messages(messages, accumulated_info, history_summary)
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+
+
+def _build_analysis_result(data: dict) -> AnalysisResultV3:
+    """将解析后的 LLM 响应转换为 AnalysisResultV3"""
     # 提取信息
     extracted_data = data.get("extractedInfo", {})
     extracted_info = ExtractedInfoV3(
@@ -270,16 +681,63 @@ async def analyze_conversation(
     )
 
 
+async def summarize_history(
+    previous_summary: Optional[str],
+    messages: list,
+    config: LLMConfig,
+    use_cache: bool = True,
+) -> str:
+    """
+    将移出上下文窗口的对话增量合并进滚动摘要
+
+    Args:
+        previous_summary: 已有摘要（首次为 None）
+        messages: 新移出窗口、尚未进入摘要的消息
+        config: LLM 配置
+        use_cache: 是否使用 LLM 响应缓存
+
+    Returns:
+        str: 更新后的摘要
+    """
+    max_chars = app_config.CONTEXT_SUMMARY_MAX_CHARS
+    usage_service.set_prompt_version("history_summary")
+    prompt = f"""请将以下闲鱼代写咨询对话合并进已有摘要，生成新的对话摘要。
+
+## 已有摘要：
+{previous_summary or "（无）"}
+
+## 新增对话：
+{_format_conversation_history(messages)}
+
+## 要求：
+1. 保留买家需求（文章类型、主题、字数、截止时间、参考资料、特殊要求）以及价格、砍价和成交意向等关键信息
+2. 后出现的信息覆盖先前的信息
+3. 不超过{max_chars}字，直接输出摘要正文，不要输出其他内容"""
+
+    async def attempt(provider: LLMProvider) -> str:
+        text = (await call_llm(provider, prompt, use_cache=use_cache)).strip()
+        if not text:
+            raise ValueError("摘要为空")
+        return text
+
+    summary, _provider = await call_with_failover(_provider_chain(config), attempt)
+    return summary[:max_chars]
+
+
 async def summarize_requirements(
     messages: list,
-    config: LLMConfig
+    config: LLMConfig,
+    use_cache: bool = True,
+    previous: Optional[RequirementSummary] = None,
 ) -> RequirementSummary:
     """
-    根据完整对话历史，提炼需求要点
+    提炼需求要点
 
     Args:
-        messages: 对话消息列表
+        messages: 对话消息列表（传入 previous 时只需传新增的对话）
         config: LLM 配置
+        use_cache: 是否使用 LLM 响应缓存
+        previous: 已整理的需求要点，在此基础上合并新增对话
 
     Returns:
         RequirementSummary: 需求要点摘要
@@ -287,11 +745,28 @@ async def summarize_requirements(
     # 构建对话历史
     conversation = _format_conversation_history(messages)
 
-    prompt = f"""根据以下买家与卖家的对话，提炼买家的需求要点。
+    usage_service.set_prompt_version("requirement_summary" if previous is None else "requirement_summary:merge")
+    if previous is not None:
+        known = json.dumps(previous.model_dump(), ensure_ascii=False, indent=2)
+        source = f"""根据已整理的需求要点和之后新增的对话，更新买家的需求要点。
 
-## 对话记录：
+## 已整理的需求要点：
+```json
+{known}
+```
+
+## 新增对话记录：
 {conversation}
 
+新增对话中的信息与已整理的要点冲突时，以新增对话为准；未提及的字段保持不变。"""
+    else:
+        source = f"""根据以下买家与卖家的对话，提炼买家的需求要点。
+
+## 对话记录：
+{conversation}"""
+
+    prompt = f"""{source}
+
 ## 请按以下JSON格式返回需求要点：
 ```json
 {{
@@ -306,11 +781,8 @@ async def summarize_requirements(
 
 请严格按照JSON格式返回，确保提取所有对话中提到的需求信息。"""
 
-    # 调用 LLM
-    response_text = await call_llm(config, prompt)
-
-    # 解析响应
-    data = parse_llm_response(response_text)
+    # 调用 LLM 并解析响应
+    data, _provider = await _call_and_parse(config, prompt, use_cache, SUMMARY_KEYS)
 
     return RequirementSummary(
         articleType=data.get("articleType", "未知类型"),
@@ -0,0 +1,280 @@
+"""
+运行指标
+手写的 Prometheus 文本格式指标（直方图 / 计数器 / 仪表），由 /metrics 导出。
+热路径上的记录只有一次 perf_counter、一次二分查找和几次加法，开销可以忽略
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Optional
+
+from .. import config as app_config
+
+# 网络请求与 LLM 调用的耗时分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# 数据库操作的耗时分桶（秒）
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+_registry: list = []
+
+
+class _Metric:
+    """指标基类：按标签值分组保存数据"""
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _format_labels(self, labels: tuple, extra: Optional[tuple] = None) -> str:
+        pairs = list(zip(self.labelnames, labels))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_values(items))
+        return lines
+
+    def _render_values(self, items: list) -> list[str]:
+        return [f"{self.name}{self._format_labels(labels)} {_format_number(value)}" for labels, value in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    type_name = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        if not app_config.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    type_name = "gauge"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class _HistogramData:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """直方图（各分桶非累积存放，导出时再累加）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        """记录一次观测值（秒）"""
+        if not app_config.METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                data = self._values[labels] = _HistogramData(len(self.buckets) + 1)
+            data.buckets[index] += 1
+            data.sum += value
+            data.count += 1
+
+    def time(self, *labels) -> "Timer":
+        """计时上下文：with HISTOGRAM.time("stage"): ..."""
+        return Timer(self, labels)
+
+    def _render_values(self, items: list) -> list[str]:
+        lines = []
+        for labels, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data.buckets):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{self._format_labels(labels, ('le', _format_number(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_bucket{self._format_labels(labels, ('le', '+Inf'))} {data.count}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {_format_number(data.sum)}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {data.count}")
+        return lines
+
+
+class Timer:
+    """直方图计时器（上下文管理器）"""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(perf_counter() - self.started, *self.labels)
+
+
+class HttpTrace:
+    """
+    httpx 请求追踪回调（extensions={"trace": ...}），记录连接建立、首字节与响应体读取耗时
+    """
+
+    __slots__ = ("marks",)
+
+    def __init__(self):
+        self.marks: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        # 事件名形如 connection.connect_tcp.started / http11.receive_response_headers.complete
+        _, _, name = event_name.partition(".")
+        self.marks[name] = perf_counter()
+
+    def _span(self, start: str, end: str) -> Optional[float]:
+        started = self.marks.get(start)
+        finished = self.marks.get(end)
+        if started is None or finished is None:
+            return None
+        return finished - started
+
+    def observe(self) -> None:
+        """把本次请求的各阶段耗时记入 LLM_PHASE_DURATION"""
+        connect = self._span("connect_tcp.started", "connect_tcp.complete")
+        if connect is not None:
+            tls = self._span("start_tls.started", "start_tls.complete") or 0.0
+            LLM_PHASE_DURATION.observe(connect + tls, "connect")
+
+        ttfb = self._span("send_request_headers.started", "receive_response_headers.complete")
+        if ttfb is not None:
+            LLM_PHASE_DURATION.observe(ttfb, "ttfb")
+
+        body = self._span("receive_response_headers.complete", "receive_response_body.complete")
+        if body is not None:
+            LLM_PHASE_DURATION.observe(body, "body")
+
+
+def render() -> str:
+    """导出全部指标（Prometheus 文本格式 0.0.4）"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：按路由模板记录请求耗时（流式响应计到响应结束）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+
+
+# ========== 指标定义 ==========
+
+HTTP_REQUEST_DURATION = Histogram(
+    "xianyu_http_request_duration_seconds",
+    "HTTP 请求耗时（按路由模板）",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "xianyu_http_requests_in_flight",
+    "正在处理的 HTTP 请求数",
+)
+ANALYZE_STAGE_DURATION = Histogram(
+    "xianyu_analyze_stage_duration_seconds",
+    "消息分析各阶段耗时（lock_wait/load_history/context/pre_extract/prompt/llm/parse/save/total；llm 不含 parse）",
+    ("stage",),
+)
+LLM_PHASE_DURATION = Histogram(
+    "xianyu_llm_phase_duration_seconds",
+    "LLM 请求各阶段耗时（limiter_wait/connect/ttfb/body/first_token/generation/total）",
+    ("phase",),
+)
+LLM_REQUESTS = Counter(
+    "xianyu_llm_requests_total",
+    "LLM 请求次数（按结果）",
+    ("mode", "outcome"),
+)
+DB_DURATION = Histogram(
+    "xianyu_db_duration_seconds",
+    "get_db 事务耗时（连接、查询与提交，按 get_db 传入的操作名）",
+    ("operation",),
+    buckets=DB_BUCKETS,
+)
+DB_QUEUE_WAIT = Histogram(
+    "xianyu_db_queue_wait_seconds",
+    "数据库操作在执行器有界队列中的等待时间",
+    buckets=DB_BUCKETS,
+)
@@ -0,0 +1,284 @@
+"""
+本地规则预提取
+在调用 LLM 之前用预编译的正则与关键词表识别字数、截止时间、紧急程度、参考资料和文章类型；
+对话开头的“在吗”“谢谢”这类简单消息直接给出模板回复，不调用 LLM（已有上文时交给 LLM，见 has_context）
+"""
+import re
+from typing import Optional
+
+from ..data.services_loader import get_services, get_services_version
+from ..models.schemas import ExtractedInfoV3
+
+# ========== 字数 ==========
+
+# 5000字、5千字、1.5万字、3k字、3000字左右
+_WORD_COUNT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(千|k|K|w|W|万)?\s*(?:个)?字")
+# 五千字、两万字
+_CN_WORD_COUNT_RE = re.compile(r"([一二两三四五六七八九十]{1,3})\s*(千|万)\s*(?:个)?字")
+
+_CN_DIGITS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNIT_MULTIPLIER = {None: 1, "千": 1000, "k": 1000, "K": 1000, "w": 10000, "W": 10000, "万": 10000}
+
+# ========== 截止时间 ==========
+
+_DEADLINE_RE = re.compile(
+    r"(今天|今晚|今早|明天|明早|明晚|后天|大后天"
+    r"|(?:这|本|下)?(?:周|星期|礼拜)[一二三四五六日天末]"
+    r"|\d{1,2}\s*月\s*\d{1,2}\s*[日号]|\d{1,2}\s*[日号]"
+    r"|\d{1,2}\s*(?:个)?小时(?:内|之内)?|[\d一二两三四五六七八九十]{1,2}\s*天(?:内|之内)?"
+    r"|月底|周末|下周|这周|本周)"
+)
+# 截止时间关键词 -> 紧急程度
+_URGENCY_BY_DEADLINE = (
+    (re.compile(r"今天|今晚|今早|小时"), "特急"),
+    (re.compile(r"明天|明早|明晚|后天|^[1-3一二两三]\s*天"), "加急"),
+)
+_URGENT_WORDS_RE = re.compile(r"急|加急|尽快|赶时间|越快越好|马上要")
+
+# ========== 参考资料 ==========
+
+_NO_REFERENCE_RE = re.compile(r"(没有|没|无|不用|不需要)(?:什么)?(参考|资料|材料|模板|范文)")
+_HAS_REFERENCE_RE = re.compile(r"(有|发你|给你|附上|提供)(?:一些|一份|个)?(参考|资料|材料|模板|范文|要求文档)")
+
+# ========== 文章类型 ==========
+
+# 服务名称中不直接出现的常见说法 -> 文章类型（同时用于在服务名称中查找对应服务）
+_ARTICLE_ALIASES = {
+    "ppt": "PPT",
+    "幻灯片": "PPT",
+    "简历": "润色简历",
+    "周报": "工作周报月报",
+    "月报": "工作周报月报",
+    "申报书": "课题申报书",
+    "计划书": "商业计划书",
+    "综述": "文献综述",
+    "教案": "教案和课题设计",
+    "文书": "留学文书",
+    "演讲": "演讲稿",
+    "检讨书": "检讨",
+    "直播": "直播稿",
+}
+_NAME_SPLIT_RE = re.compile(r"[、，,\s（）()]+")
+_NAME_NOISE_RE = re.compile(r"^(一篇|一页|一分钟|商用|作业|需要.*|不需要.*|按.*)$")
+
+# ========== 简单消息 ==========
+
+_TRAILING = r"[\s?？!！。.,，~～…]*$"
+_INTENT_PATTERNS = (
+    ("greeting", re.compile(r"^(在吗|在不在|在么|在嘛|有人吗|你好|您好|老板在吗|亲在吗|hi|hello|哈喽|嗨)" + _TRAILING, re.I)),
+    ("thanks", re.compile(r"^(谢谢|谢啦|多谢|感谢|辛苦了|谢谢老板|thx|thanks)" + _TRAILING, re.I)),
+    ("ack", re.compile(r"^(好的|好|好滴|好嘞|嗯|嗯嗯|ok|okk|行|可以|收到|知道了|明白)" + _TRAILING, re.I)),
+)
+
+TEMPLATE_REPLIES = {
+    "greeting": [
+        "在的亲～请问需要写什么类型的文章呢？大概多少字、什么时候要呀？😊",
+        "您好，在的。请问需要代写什么内容？麻烦说一下字数和交付时间。",
+        "在呢在呢！✨ 有什么可以帮您的，把要求发我看看哦～",
+    ],
+    "thanks": [
+        "不客气亲～有需要随时找我哦 😊",
+        "不客气，后续有问题随时联系。",
+        "应该的！期待下次合作 🎉",
+    ],
+    "ack": [
+        "好嘞亲～有其他要求随时跟我说哦 😊",
+        "好的，收到。还有需要补充的地方请告诉我。",
+        "收到！👍 我这边随时待命～",
+    ],
+}
+
+
+class PreExtraction:
+    """规则预提取结果"""
+
+    def __init__(self):
+        self.word_count: Optional[int] = None
+        self.deadline: Optional[str] = None
+        self.urgency: Optional[str] = None  # 加急 / 特急
+        self.has_reference: Optional[bool] = None
+        self.article_type: Optional[str] = None
+        self.service_id: Optional[int] = None
+        self.intent: Optional[str] = None  # greeting / thanks / ack
+
+    @property
+    def found(self) -> bool:
+        """是否识别出任何需求信息"""
+        return any(
+            value is not None
+            for value in (self.word_count, self.deadline, self.urgency, self.has_reference, self.article_type)
+        )
+
+    def merge_into(self, info: Optional[ExtractedInfoV3]) -> ExtractedInfoV3:
+        """把识别结果补充到累积信息中（只填充空字段）"""
+        merged = info.model_copy(deep=True) if info else ExtractedInfoV3()
+        if merged.articleType is None:
+            merged.articleType = self.article_type
+        if merged.wordCount is None:
+            merged.wordCount = self.word_count
+        if merged.deadline is None:
+            merged.deadline = self.deadline
+        if merged.hasReference is None:
+            merged.hasReference = self.has_reference
+        return merged
+
+    def prompt_lines(self) -> list[str]:
+        """写入提示词的识别结果"""
+        lines = []
+        if self.article_type:
+            lines.append(f"- 文章类型: {self.article_type}")
+        if self.word_count:
+            lines.append(f"- 字数: {self.word_count}")
+        if self.deadline:
+            lines.append(f"- 截止时间: {self.deadline}")
+        if self.urgency:
+            lines.append(f"- 紧急程度: {self.urgency}")
+        if self.has_reference is not None:
+            lines.append(f"- 有参考资料: {'是' if self.has_reference else '否'}")
+        return lines
+
+
+def extract(text: str) -> PreExtraction:
+    """对单条买家消息做规则预提取"""
+    result = PreExtraction()
+    text = (text or "").strip()
+    if not text:
+        return result
+
+    for intent, pattern in _INTENT_PATTERNS:
+        if pattern.match(text):
+            result.intent = intent
+            return result
+
+    result.word_count = _extract_word_count(text)
+
+    deadline = _DEADLINE_RE.search(text)
+    if deadline:
+        result.deadline = deadline.group(1).replace(" ", "")
+        result.urgency = urgency_of(result.deadline)
+    if result.urgency is None and _URGENT_WORDS_RE.search(text):
+        result.urgency = "加急"
+
+    if _NO_REFERENCE_RE.search(text):
+        result.has_reference = False
+    elif _HAS_REFERENCE_RE.search(text):
+        result.has_reference = True
+
+    result.article_type, result.service_id = match_article_type(text)
+    return result
+
+
+def urgency_of(deadline: Optional[str]) -> Optional[str]:
+    """根据截止时间判断紧急程度（加急 / 特急），无法判断时返回 None"""
+    if not deadline:
+        return None
+    for pattern, urgency in _URGENCY_BY_DEADLINE:
+        if pattern.search(deadline):
+            return urgency
+    return None
+
+
+def missing_info(info: ExtractedInfoV3) -> list[str]:
+    """根据累积信息判断仍缺失的必问信息"""
+    missing = []
+    if not info.articleType:
+        missing.append("文章类型")
+    if not info.wordCount:
+        missing.append("字数")
+    if not info.deadline:
+        missing.append("截止时间")
+    return missing
+
+
+def quick_tags(missing: list[str]) -> list[str]:
+    """根据缺失信息生成快捷标签"""
+    tags = []
+    if "字数" in missing:
+        tags.append("询问字数")
+    if "截止时间" in missing:
+        tags.append("询问截止时间")
+    tags.append("确认需求")
+    return tags
+
+
+def _extract_word_count(text: str) -> Optional[int]:
+    match = _WORD_COUNT_RE.search(text)
+    if match:
+        value = float(match.group(1)) * _UNIT_MULTIPLIER[match.group(2)]
+        return int(value) if value > 0 else None
+
+    match = _CN_WORD_COUNT_RE.search(text)
+    if match:
+        number = _parse_cn_number(match.group(1))
+        if number:
+            return number * _UNIT_MULTIPLIER[match.group(2)]
+    return None
+
+
+def _parse_cn_number(text: str) -> Optional[int]:
+    """解析一到九十九的中文数字"""
+    if text == "十":
+        return 10
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return _CN_DIGITS.get(tens, 1) * 10 + _CN_DIGITS.get(ones, 0)
+    return _CN_DIGITS.get(text)
+
+
+# (服务列表版本, [(关键词, 文章类型, 服务 ID)]，按关键词长度降序)
+_keyword_table: tuple[int, list[tuple[str, str, int]]] = (-1, [])
+
+
+def _article_keywords() -> list[tuple[str, str, int]]:
+    """由服务名称生成关键词表（服务列表更新后重建）"""
+    global _keyword_table
+    version = get_services_version()
+    if _keyword_table[0] == version:
+        return _keyword_table[1]
+
+    keywords: dict[str, tuple[str, int]] = {}
+    services = get_services()
+    for service in services:
+        for part in _NAME_SPLIT_RE.split(service.name):
+            if len(part) >= 2 and not _NAME_NOISE_RE.match(part):
+                keywords.setdefault(part.lower(), (part, service.id))
+
+    for alias, article_type in _ARTICLE_ALIASES.items():
+        service_id = next(
+            (svc.id for svc in services if article_type.lower() in svc.name.lower()),
+            None,
+        )
+        if service_id is not None:
+            keywords.setdefault(alias.lower(), (article_type, service_id))
+
+    table = sorted(
+        ((keyword, article_type, service_id) for keyword, (article_type, service_id) in keywords.items()),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+    _keyword_table = (version, table)
+    return table
+
+
+def match_article_type(text: str) -> tuple[Optional[str], Optional[int]]:
+    """在消息中匹配文章类型（最长关键词优先），返回 (文章类型, 服务 ID)"""
+    try:
+        table = _article_keywords()
+    except FileNotFoundError:
+        return None, None
+
+    lowered = text.lower()
+    for keyword, article_type, service_id in table:
+        if keyword in lowered:
+            return article_type, service_id
+    return None, None
+
+
+def has_context(history: list[str], info: Optional[ExtractedInfoV3], summary: Optional[str] = None) -> bool:
+    """
+    对话是否已有上文：之前有消息或滚动摘要，或已累积了任何需求信息
+    这时的“在吗”可能是在催进度，“好的”“可以”可能是在接受报价，模板回复会重复询问已知的需求，需要交给 LLM
+    """
+    if summary or any(text for text in history):
+        return True
+    return info is not None and bool(info.model_dump(exclude_defaults=True))
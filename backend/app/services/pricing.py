@@ -0,0 +1,227 @@
+"""
+本地报价引擎
+按分析提示词中的报价规则计算报价区间：基础单价 × 数量 × 复杂度系数 × 紧急系数，
+按千字计价的服务最低不低于千字 20 元。多个服务的报价用 NumPy 一次性向量化计算
+"""
+from typing import Optional
+
+import numpy as np
+
+from .. import config as app_config
+from ..data.services_loader import get_services, get_services_version
+from ..models.schemas import ExtractedInfoV3, QuoteItem, QuoteRequest, QuoteResponse
+from . import pre_extractor
+
+# 紧急系数区间：正常（3天以上）、加急（1-3天）、特急（24小时内）
+URGENCY_FACTORS = {
+    "正常": (1.0, 1.0),
+    "加急": (1.3, 1.3),
+    "特急": (1.5, 2.0),
+}
+# 复杂度系数区间（服务没有单独的复杂单价时，用简单单价乘以该系数）
+COMPLEX_FACTORS = (1.5, 2.0)
+COMPLEXITIES = ("simple", "complex")
+# 按千字计价时的最低单价（元/千字）
+MIN_PRICE_PER_THOUSAND = 20
+
+UNIT_LABELS = {"thousand": "千字", "page": "页", "minute": "分钟", "piece": "篇"}
+
+
+class PriceTable:
+    """服务单价表（按列存放为 NumPy 数组，缺失单价为 NaN）"""
+
+    def __init__(self, services: list):
+        self.ids = np.array([svc.id for svc in services], dtype=np.int64)
+        self.names = [svc.name for svc in services]
+        self.units = [svc.unit for svc in services]
+        self.per_thousand = np.array([svc.unit == "thousand" for svc in services], dtype=bool)
+        self.simple = np.array(
+            [svc.priceSimple if svc.priceSimple is not None else np.nan for svc in services], dtype=float
+        )
+        self.complex = np.array(
+            [svc.priceComplex if svc.priceComplex is not None else np.nan for svc in services], dtype=float
+        )
+        self._index = {int(service_id): row for row, service_id in enumerate(self.ids)}
+
+    def rows(self, service_ids: Optional[list[int]] = None) -> np.ndarray:
+        """服务 ID 对应的行号（为空时返回全部行）"""
+        if service_ids is None:
+            return np.arange(len(self.ids))
+        unknown = [service_id for service_id in service_ids if service_id not in self._index]
+        if unknown:
+            raise ValueError(f"服务不存在: {', '.join(map(str, unknown))}")
+        return np.array([self._index[service_id] for service_id in service_ids], dtype=np.int64)
+
+
+# (服务列表版本, 单价表)
+_table: tuple[int, Optional[PriceTable]] = (-1, None)
+
+
+def get_price_table() -> PriceTable:
+    """获取单价表（服务列表更新后重建）"""
+    global _table
+    version = get_services_version()
+    if _table[0] != version:
+        _table = (version, PriceTable(get_services()))
+    return _table[1]
+
+
+def compute_quotes(
+    table: PriceTable,
+    rows: np.ndarray,
+    word_count: Optional[int],
+    quantity: Optional[float],
+    urgency: str,
+    complexity: Optional[str] = None,
+) -> list[QuoteItem]:
+    """
+    向量化计算多个服务的报价区间
+
+    按千字计价的服务数量为 word_count / 1000，其余服务使用 quantity（按篇计价默认 1 篇）；
+    缺少数量或单价的服务不出现在结果中。
+    """
+    simple = table.simple[rows]
+    complex_ = table.complex[rows]
+    per_thousand = table.per_thousand[rows]
+
+    # 基础单价区间：简单单价 ~ 复杂单价，缺失的一侧由另一侧按复杂度系数推算
+    complex_low = np.where(np.isnan(complex_), simple * COMPLEX_FACTORS[0], complex_)
+    complex_high = np.where(np.isnan(complex_), simple * COMPLEX_FACTORS[1], complex_)
+    simple_price = np.where(np.isnan(simple), complex_, simple)
+    if complexity == "simple":
+        base_low, base_high = simple_price, simple_price
+    elif complexity == "complex":
+        base_low, base_high = complex_low, complex_high
+    else:
+        base_low, base_high = simple_price, complex_high
+
+    default_quantity = np.array(
+        [1.0 if table.units[row] == "piece" else np.nan for row in rows], dtype=float
+    )
+    other_quantity = np.full(len(rows), float(quantity)) if quantity else default_quantity
+    thousand_quantity = word_count / 1000 if word_count else np.nan
+    amount = np.where(per_thousand, thousand_quantity, other_quantity)
+
+    urgency_low, urgency_high = URGENCY_FACTORS[urgency]
+    low = base_low * amount * urgency_low
+    high = base_high * amount * urgency_high
+
+    # 最低不低于千字 20 元
+    floor = np.where(per_thousand, MIN_PRICE_PER_THOUSAND * amount, 0.0)
+    low = np.maximum(low, floor)
+    high = np.maximum(high, low)
+
+    valid = ~np.isnan(low) & (amount > 0)
+    low = np.rint(low)
+    high = np.rint(high)
+
+    items = []
+    for i in np.flatnonzero(valid):
+        row = int(rows[i])
+        unit_label = UNIT_LABELS.get(table.units[row], table.units[row])
+        items.append(QuoteItem(
+            serviceId=int(table.ids[row]),
+            serviceName=table.names[row],
+            unit=table.units[row],
+            quantity=round(float(amount[i]), 3),
+            min=int(low[i]),
+            max=int(high[i]),
+            basis=_format_basis(
+                base_low[i], base_high[i], unit_label, amount[i], urgency, urgency_low, urgency_high
+            ),
+        ))
+    return items
+
+
+def quote(request: QuoteRequest) -> QuoteResponse:
+    """按请求计算报价（参数不合法时抛出 ValueError）"""
+    urgency = request.urgency or pre_extractor.urgency_of(request.deadline) or "正常"
+    if urgency not in URGENCY_FACTORS:
+        raise ValueError(f"未知的紧急程度: {urgency}（可选：{'、'.join(URGENCY_FACTORS)}）")
+    if request.complexity is not None and request.complexity not in COMPLEXITIES:
+        raise ValueError(f"未知的复杂度: {request.complexity}（可选：{'、'.join(COMPLEXITIES)}）")
+
+    service_ids = request.serviceIds
+    if service_ids is None and request.articleType:
+        _, service_id = pre_extractor.match_article_type(request.articleType)
+        if service_id is None:
+            raise ValueError(f"无法匹配文章类型: {request.articleType}")
+        service_ids = [service_id]
+
+    table = get_price_table()
+    items = compute_quotes(
+        table,
+        table.rows(service_ids),
+        request.wordCount,
+        request.quantity,
+        urgency,
+        request.complexity,
+    )
+    return QuoteResponse(urgency=urgency, complexity=request.complexity, items=items)
+
+
+def estimate_for_info(info: ExtractedInfoV3) -> Optional[QuoteItem]:
+    """根据提取信息（文章类型、字数、截止时间）计算报价，信息不足时返回 None"""
+    if not info.articleType or not info.wordCount:
+        return None
+
+    _, service_id = pre_extractor.match_article_type(info.articleType)
+    if service_id is None:
+        return None
+
+    table = get_price_table()
+    urgency = pre_extractor.urgency_of(info.deadline) or "正常"
+    items = compute_quotes(table, table.rows([service_id]), info.wordCount, None, urgency)
+    return items[0] if items else None
+
+
+def reconcile_price(
+    info: ExtractedInfoV3,
+    can_quote: bool,
+    price_min: Optional[int],
+    price_max: Optional[int],
+    price_basis: Optional[str],
+) -> tuple[bool, Optional[int], Optional[int], Optional[str]]:
+    """
+    用本地报价补全或校验 LLM 给出的报价
+
+    - LLM 未给出报价但信息已足够（或 LLM 认为可以报价）时，填入本地报价
+    - LLM 的报价与本地报价相差超过 PRICE_CHECK_TOLERANCE 时，以本地报价为准
+
+    Returns:
+        (canQuote, min, max, basis)
+    """
+    try:
+        local = estimate_for_info(info)
+    except FileNotFoundError:
+        return can_quote, price_min, price_max, price_basis
+    if local is None:
+        return can_quote, price_min, price_max, price_basis
+
+    if not isinstance(price_min, (int, float)) or not isinstance(price_max, (int, float)):
+        if can_quote or info.deadline:
+            return True, local.min, local.max, local.basis
+        return can_quote, price_min, price_max, price_basis
+
+    tolerance = app_config.PRICE_CHECK_TOLERANCE
+    lower = local.min * (1 - tolerance)
+    upper = local.max * (1 + tolerance)
+    if price_min > price_max or price_max < lower or price_min > upper:
+        basis = f"{local.basis}（已按报价规则校正，模型报价 {price_min}-{price_max} 元）"
+        return True, local.min, local.max, basis
+
+    return can_quote, price_min, price_max, price_basis
+
+
+def _format_basis(
+    base_low: float,
+    base_high: float,
+    unit_label: str,
+    amount: float,
+    urgency: str,
+    urgency_low: float,
+    urgency_high: float,
+) -> str:
+    base = f"{base_low:g}" if base_low == base_high else f"{base_low:g}-{base_high:g}"
+    factor = f"{urgency_low:g}" if urgency_low == urgency_high else f"{urgency_low:g}-{urgency_high:g}"
+    return f"{base}元/{unit_label} × {amount:g}{unit_label} × {urgency}系数{factor}"
@@ -0,0 +1,303 @@
+"""
+LLM 供应商限流与容错
+按 (baseUrl, modelId) 维护：令牌桶限速、最大并发数、429/5xx 退避重试、熔断器
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+from .. import config as app_config
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# 可重试的网络错误（请求未到达或连接被重置）
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.PoolTimeout,
+)
+
+
+class ProviderUnavailableError(Exception):
+    """熔断器打开，供应商暂不可用"""
+
+
+class TokenBucket:
+    """令牌桶：平均 rate 次/秒，允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """获取一个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - closed：正常放行，连续失败达到阈值后打开
+    - open：直接拒绝，冷却时间后进入 half_open
+    - half_open：只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def before_request(self) -> bool:
+        """请求前检查，熔断中则抛出 ProviderUnavailableError；返回本次请求是否为半开状态下的探测请求"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                raise ProviderUnavailableError("LLM 服务暂时不可用（熔断中），请稍后重试")
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise ProviderUnavailableError("LLM 服务正在恢复检测中，请稍后重试")
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker opened after {self.consecutive_failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """探测请求未产生结论（如非供应商错误）时释放探测名额"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == self.OPEN and self.opened_at is not None:
+            retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.consecutive_failures,
+            "retryInSeconds": round(retry_in, 1) if retry_in is not None else None,
+        }
+
+
+class ProviderLimiter:
+    """单个供应商（baseUrl + 模型）的限流器"""
+
+    def __init__(self, base_url: str, model_id: str):
+        self.base_url = base_url
+        self.model_id = model_id
+        self.bucket = TokenBucket(app_config.LLM_RATE_LIMIT_RPS, app_config.LLM_RATE_LIMIT_BURST)
+        self.breaker = CircuitBreaker(
+            app_config.LLM_BREAKER_FAILURE_THRESHOLD,
+            app_config.LLM_BREAKER_RECOVERY_TIMEOUT,
+        )
+        self.max_concurrency = app_config.LLM_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rateLimited": 0,
+            "failures": 0,
+            "rejected": 0,
+        }
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个请求名额：熔断检查 -> 令牌桶 -> 并发上限"""
+        try:
+            is_probe = self.breaker.before_request()
+        except ProviderUnavailableError:
+            self.stats["rejected"] += 1
+            raise
+
+        waiting_since = time.perf_counter()
+        try:
+            await self.bucket.acquire()
+            await self._semaphore.acquire()
+        except BaseException:
+            # 探测请求在等待令牌或并发名额时被取消，释放探测名额，否则熔断器会一直停在半开状态
+            if is_probe:
+                self.breaker.release_probe()
+            raise
+
+        try:
+            metrics.LLM_PHASE_DURATION.observe(time.perf_counter() - waiting_since, "limiter_wait")
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            try:
+                yield
+            except (asyncio.CancelledError, GeneratorExit):
+                # 请求被取消，未得出供应商是否健康的结论
+                if is_probe:
+                    self.breaker.release_probe()
+                raise
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+    def on_error(self, error: Exception, attempt: int, allow_retry: bool = True) -> Optional[float]:
+        """
+        记录一次失败，返回重试前需要等待的秒数；不应重试时返回 None
+        """
+        status = None
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+
+        if status == 429:
+            # 限流不代表服务故障，不计入熔断
+            self.stats["rateLimited"] += 1
+            self.breaker.release_probe()
+        elif (status is not None and status >= 500) or isinstance(error, (httpx.TransportError, TimeoutError)):
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+        else:
+            # 4xx 等请求本身的问题，与供应商健康状态无关
+            self.breaker.release_probe()
+            return None
+
+        retryable = status in RETRYABLE_STATUS or isinstance(error, RETRYABLE_ERRORS)
+        if not allow_retry or not retryable or attempt >= app_config.LLM_MAX_RETRIES:
+            return None
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return None
+
+        delay = _retry_after_seconds(error) if status == 429 or status == 503 else None
+        if delay is None:
+            # 指数退避 + 全抖动
+            cap = min(app_config.LLM_RETRY_MAX_DELAY, app_config.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+            delay = random.uniform(0, cap)
+        elif delay > app_config.LLM_RETRY_MAX_DELAY:
+            return None
+
+        self.stats["retries"] += 1
+        return delay
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """在限流保护下执行请求，按策略重试"""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot():
+                    result = await fn()
+            except ProviderUnavailableError:
+                raise
+            except Exception as e:
+                delay = self.on_error(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(
+                    f"LLM request failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s"
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.record_success()
+            return result
+
+    def snapshot(self) -> dict:
+        return {
+            "baseUrl": self.base_url,
+            "modelId": self.model_id,
+            "circuit": self.breaker.snapshot(),
+            "inFlight": self.in_flight,
+            "maxConcurrency": self.max_concurrency,
+            "availableTokens": round(self.bucket.tokens, 2),
+            **self.stats,
+        }
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期）"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# (baseUrl, modelId) -> 限流器
+_limiters: dict[tuple[str, str], ProviderLimiter] = {}
+
+
+def get_limiter(base_url: str, model_id: str) -> ProviderLimiter:
+    """获取供应商限流器（不存在则创建）"""
+    key = (base_url.rstrip("/"), model_id)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = ProviderLimiter(*key)
+        _limiters[key] = limiter
+    return limiter
+
+
+def get_provider_states() -> list[dict]:
+    """所有供应商的限流与熔断状态"""
+    return [limiter.snapshot() for limiter in _limiters.values()]
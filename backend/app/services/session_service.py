@@ -2,12 +2,24 @@
 V3 会话服务层
 处理会话、消息、AI分析的 CRUD 操作
 """
+import asyncio
+import base64
+import binascii
+import hashlib
+import html
 import json
+import logging
+import re
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 from math import ceil
+from time import perf_counter
 
-from ..database import get_db
+from .. import config as app_config
+from ..database import get_db, run_in_db
+from . import context_window, metrics, usage_service
+from .batch_writer import AnalysisBatchWriter
+from .singleflight import KeyedLocks, SingleFlight
 from ..models.schemas import (
     CreateSessionRequest,
     UpdateSessionRequest,
@@ -18,18 +30,22 @@ from ..models.schemas import (
     CreateMessageRequest,
     MessageWithAnalysis,
     AIAnalysis,
+    BatchAnalyzeItem,
     ExtractedInfoV3,
     PriceEstimateV3,
+    RequirementSummary,
     RetentionTemplate,
     UpdateRetentionTemplateRequest,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # ========== 会话管理 ==========
 
 def create_session(request: CreateSessionRequest) -> dict:
     """创建新会话"""
-    with get_db() as conn:
+    with get_db("create_session") as conn:
         cursor = conn.cursor()
         now = datetime.now().isoformat()
 
@@ -52,16 +68,238 @@ def create_session(request: CreateSessionRequest) -> dict:
         }
 
 
+# 会话列表项读取的列
+SESSION_SUMMARY_COLUMNS = """
+    s.id,
+    s.status,
+    s.deal_status,
+    s.deal_price,
+    s.article_type,
+    s.created_at,
+    s.updated_at,
+    s.first_message_preview,
+    s.message_count,
+    s.last_message_at
+"""
+
+
+# trigram 分词至少需要 3 个字符才能命中全文索引
+FTS_MIN_TERM_LENGTH = 3
+SNIPPET_TOKENS = 24
+SNIPPET_CONTEXT_CHARS = 20
+# 高亮片段中的命中标记（控制字符不会出现在正常文本中，HTML 转义后再替换为 <mark>）
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+
+def _search_terms(search: Optional[str]) -> list[str]:
+    """按空白拆分搜索词（多个词之间为“且”的关系）"""
+    return search.split() if search else []
+
+
+def _fts_enabled(cursor) -> bool:
+    """全文索引是否存在（SQLite 未编译 FTS5 时迁移会跳过建表）"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'sessions_fts')"
+    )
+    return cursor.fetchone()[0] == 2
+
+
+def _fts_query(terms: list[str]) -> str:
+    """将搜索词转为 FTS5 查询：每个词按短语引用，避免被解析为查询语法"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _render_snippet(raw: Optional[str]) -> Optional[str]:
+    """转义片段中的 HTML，并将命中标记替换为 <mark>"""
+    if not raw:
+        return None
+    return html.escape(raw).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def _highlight(text: str, terms: list[str]) -> str:
+    """在 Python 中截取首个命中词附近的片段并标记所有命中（LIKE 降级路径使用）"""
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    first = min((pos for pos in positions if pos >= 0), default=0)
+    start = max(first - SNIPPET_CONTEXT_CHARS, 0)
+    end = min(first + SNIPPET_CONTEXT_CHARS * 3, len(text))
+    window = text[start:end]
+
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    marked = pattern.sub(lambda match: f"{_MARK_OPEN}{match.group(0)}{_MARK_CLOSE}", window)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + marked + suffix
+
+
+def _search_sessions_fts(
+    cursor, terms: list[str], where_clause: str, params: list, limit: int, offset: int, with_total: bool
+) -> tuple[Optional[int], list, dict[int, str]]:
+    """
+    全文索引搜索：任一消息或需求摘要包含全部搜索词的会话，按 BM25 相关度排序
+    返回 (总数（with_total 为 False 时为 None）, 当前页的行, 会话ID -> 高亮片段)
+    """
+    match = _fts_query(terms)
+    # 每个会话取相关度最高的一条命中（bm25 越小越相关；MIN 聚合时其余裸列取自同一行）
+    hits_sql = """
+        WITH hits AS (
+            SELECT m.session_id AS session_id, bm25(messages_fts) AS rank, 'message' AS source, m.id AS hit_id
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            WHERE messages_fts MATCH ?
+            UNION ALL
+            SELECT sessions_fts.rowid, bm25(sessions_fts), 'summary', sessions_fts.rowid
+            FROM sessions_fts
+            WHERE sessions_fts MATCH ?
+        ),
+        best AS (
+            SELECT session_id, MIN(rank) AS rank, source, hit_id
+            FROM hits
+            GROUP BY session_id
+        )
+    """
+    # 总数不需要相关度，单独统计命中的会话ID，省去逐行计算 bm25
+    total = None
+    if with_total:
+        count_conditions = where_clause.replace("WHERE", "AND", 1)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM sessions s
+            WHERE s.id IN (
+                SELECT m.session_id
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ?
+                UNION
+                SELECT rowid FROM sessions_fts WHERE sessions_fts MATCH ?
+            )
+            {count_conditions}
+        """, [match, match] + params)
+        total = cursor.fetchone()[0]
+
+    cursor.execute(f"""
+        {hits_sql}
+        SELECT {SESSION_SUMMARY_COLUMNS}, best.source, best.hit_id
+        FROM best
+        JOIN sessions s ON s.id = best.session_id
+        {where_clause}
+        ORDER BY best.rank, s.updated_at DESC, s.id DESC
+        LIMIT ? OFFSET ?
+    """, [match, match] + params + [limit, offset])
+    rows = cursor.fetchall()
+
+    # 只为当前页生成片段
+    snippets: dict[int, str] = {}
+    for source, table in (("message", "messages_fts"), ("summary", "sessions_fts")):
+        hit_ids = {row["hit_id"]: row["id"] for row in rows if row["source"] == source}
+        if not hit_ids:
+            continue
+        placeholders = ", ".join("?" * len(hit_ids))
+        cursor.execute(f"""
+            SELECT rowid, snippet({table}, 0, ?, ?, '…', ?)
+            FROM {table}
+            WHERE {table} MATCH ? AND rowid IN ({placeholders})
+        """, [_MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS, match] + list(hit_ids))
+        for hit_id, raw in cursor.fetchall():
+            snippets[hit_ids[hit_id]] = raw
+
+    return total, rows, snippets
+
+
+def _search_sessions_like(
+    cursor, terms: list[str], conditions: list[str], params: list, limit: int, offset: int, with_total: bool
+) -> tuple[Optional[int], list, dict[int, str]]:
+    """LIKE 降级搜索（无全文索引或搜索词少于 3 个字符），匹配规则与全文索引一致，按更新时间排序"""
+    patterns = [_like_pattern(term) for term in terms]
+    message_match = " AND ".join("m.content LIKE ? ESCAPE '\\'" for _ in terms)
+    summary_match = " AND ".join("s.requirement_summary LIKE ? ESCAPE '\\'" for _ in terms)
+    search_condition = f"""(
+        EXISTS (SELECT 1 FROM messages m WHERE m.session_id = s.id AND {message_match})
+        OR ({summary_match})
+    )"""
+    where_clause = "WHERE " + " AND ".join(conditions + [search_condition])
+    where_params = params + patterns + patterns
+
+    total = None
+    if with_total:
+        cursor.execute(f"SELECT COUNT(*) FROM sessions s {where_clause}", where_params)
+        total = cursor.fetchone()[0]
+
+    cursor.execute(f"""
+        SELECT {SESSION_SUMMARY_COLUMNS}, s.requirement_summary
+        FROM sessions s
+        {where_clause}
+        ORDER BY s.updated_at DESC, s.id DESC
+        LIMIT ? OFFSET ?
+    """, where_params + [limit, offset])
+    rows = cursor.fetchall()
+
+    snippets: dict[int, str] = {}
+    for row in rows:
+        cursor.execute(f"""
+            SELECT m.content FROM messages m
+            WHERE m.session_id = ? AND {message_match}
+            ORDER BY m.id
+            LIMIT 1
+        """, [row["id"]] + patterns)
+        hit = cursor.fetchone()
+        text = hit["content"] if hit else row["requirement_summary"]
+        if text:
+            snippets[row["id"]] = _highlight(text, terms)
+
+    return total, rows, snippets
+
+
+def _encode_cursor(payload: dict) -> str:
+    """将分页位置编码为不透明游标（URL 安全的 base64）"""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """
+    解析游标，格式错误时抛出 ValueError
+    列表游标 {"u": updated_at, "i": id}：从该会话之后继续（键集分页）；
+    搜索游标 {"o": offset}：搜索结果按相关度排序，只能按偏移量继续
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("无效的分页游标")
+
+    if isinstance(payload, dict):
+        if isinstance(payload.get("u"), str) and isinstance(payload.get("i"), int):
+            return payload
+        if isinstance(payload.get("o"), int) and payload["o"] >= 0:
+            return payload
+    raise ValueError("无效的分页游标")
+
+
 def get_session_list(
     page: int = 1,
     page_size: int = 20,
     status: Optional[str] = None,
     deal_status: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
 ) -> SessionListResponse:
-    """获取会话列表"""
-    with get_db() as conn:
-        cursor = conn.cursor()
+    """
+    获取会话列表（有搜索词时在数据库中全文检索，结果按相关度排序并附带高亮片段）
+    传入上一页返回的 nextCursor 时按游标继续：列表沿 (updated_at, id) 索引定位，耗时与翻到第几页无关，
+    且不再统计总数（total / page / totalPages 为 None，由首页请求获得）
+    """
+    position = _decode_cursor(cursor) if cursor else None
+    terms = _search_terms(search)
+    if position is not None and ("o" in position) != bool(terms):
+        raise ValueError("分页游标与查询条件不匹配")
+
+    with get_db("get_session_list") as conn:
+        db_cursor = conn.cursor()
 
         # 构建查询条件
         conditions = []
@@ -79,69 +317,87 @@ def get_session_list(
         if conditions:
             where_clause = "WHERE " + " AND ".join(conditions)
 
-        # 获取总数
-        count_sql = f"""
-            SELECT COUNT(*) FROM sessions s
-            {where_clause}
-        """
-        cursor.execute(count_sql, params)
-        total = cursor.fetchone()[0]
+        with_total = position is None
+        offset = position["o"] if terms and position is not None else (page - 1) * page_size
+        snippets: dict[int, str] = {}
 
-        # 计算分页
-        total_pages = ceil(total / page_size) if total > 0 else 1
-        offset = (page - 1) * page_size
-
-        # 获取会话列表，并关联第一条消息和消息数量
-        list_sql = f"""
-            SELECT
-                s.id,
-                s.status,
-                s.deal_status,
-                s.deal_price,
-                s.article_type,
-                s.created_at,
-                s.updated_at,
-                (SELECT content FROM messages WHERE session_id = s.id ORDER BY created_at ASC LIMIT 1) as first_message,
-                (SELECT COUNT(*) FROM messages WHERE session_id = s.id) as message_count
-            FROM sessions s
-            {where_clause}
-            ORDER BY s.updated_at DESC
-            LIMIT ? OFFSET ?
-        """
-        cursor.execute(list_sql, params + [page_size, offset])
-        rows = cursor.fetchall()
+        # 多取一行判断是否还有下一页
+        if terms and min(len(term) for term in terms) >= FTS_MIN_TERM_LENGTH and _fts_enabled(db_cursor):
+            total, rows, snippets = _search_sessions_fts(
+                db_cursor, terms, where_clause, params, page_size + 1, offset, with_total
+            )
+        elif terms:
+            total, rows, snippets = _search_sessions_like(
+                db_cursor, terms, conditions, params, page_size + 1, offset, with_total
+            )
+        else:
+            total = None
+            if with_total:
+                db_cursor.execute(f"SELECT COUNT(*) FROM sessions s {where_clause}", params)
+                total = db_cursor.fetchone()[0]
+
+            list_conditions = list(conditions)
+            list_params = list(params)
+            if position is not None:
+                list_conditions.append("(s.updated_at, s.id) < (?, ?)")
+                list_params += [position["u"], position["i"]]
+                offset = 0
+            list_where = "WHERE " + " AND ".join(list_conditions) if list_conditions else ""
+
+            # 获取会话列表（首条消息预览与消息数量由 messages 表的触发器维护）
+            db_cursor.execute(f"""
+                SELECT {SESSION_SUMMARY_COLUMNS}
+                FROM sessions s
+                {list_where}
+                ORDER BY s.updated_at DESC, s.id DESC
+                LIMIT ? OFFSET ?
+            """, list_params + [page_size + 1, offset])
+            rows = db_cursor.fetchall()
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_more:
+            if terms:
+                next_cursor = _encode_cursor({"o": offset + page_size})
+            else:
+                last = rows[-1]
+                next_cursor = _encode_cursor({"u": last["updated_at"], "i": last["id"]})
 
-        # 如果有搜索条件，过滤结果
         items = []
         for row in rows:
-            first_message = row["first_message"] or ""
-            if search and search.lower() not in first_message.lower():
-                continue
-
             items.append(SessionSummary(
                 id=row["id"],
                 status=row["status"],
                 dealStatus=row["deal_status"],
                 dealPrice=row["deal_price"],
                 articleType=row["article_type"],
-                previewMessage=first_message[:100] if first_message else "",
+                previewMessage=row["first_message_preview"] or "",
                 messageCount=row["message_count"],
+                lastMessageAt=datetime.fromisoformat(row["last_message_at"]) if row["last_message_at"] else None,
+                snippet=_render_snippet(snippets.get(row["id"])),
                 createdAt=datetime.fromisoformat(row["created_at"]),
                 updatedAt=datetime.fromisoformat(row["updated_at"]),
             ))
 
+        # 计算分页（游标请求不统计总数）
+        total_pages = None
+        if total is not None:
+            total_pages = ceil(total / page_size) if total > 0 else 1
+
         return SessionListResponse(
             items=items,
             total=total,
-            page=page,
+            page=page if position is None else None,
             pageSize=page_size,
             totalPages=total_pages,
+            nextCursor=next_cursor,
         )
 
 
 def get_session_by_id(session_id: int) -> Optional[SessionDetail]:
     """获取会话详情，包含所有消息和分析"""
-    with get_db() as conn:
+    with get_db("get_session_by_id") as conn:
         cursor = conn.cursor()
 
         # 获取会话基本信息
@@ -204,7 +460,7 @@ def get_session_by_id(session_id: int) -> Optional[SessionDetail]:
 
 def update_session(session_id: int, request: UpdateSessionRequest) -> bool:
     """更新会话"""
-    with get_db() as conn:
+    with get_db("update_session") as conn:
         cursor = conn.cursor()
 
         # 构建更新字段
@@ -230,6 +486,8 @@ def update_session(session_id: int, request: UpdateSessionRequest) -> bool:
         if request.requirementSummary is not None:
             updates.append("requirement_summary = ?")
             params.append(request.requirementSummary)
+            # 手动修改后不再直接复用缓存的摘要，下次提炼时以修改后的内容为基础
+            updates.append("summary_fingerprint = NULL")
 
         if not updates:
             return True
@@ -246,7 +504,7 @@ def update_session(session_id: int, request: UpdateSessionRequest) -> bool:
 
 def delete_session(session_id: int) -> bool:
     """删除会话（级联删除消息和分析）"""
-    with get_db() as conn:
+    with get_db("delete_session") as conn:
         cursor = conn.cursor()
 
         # 由于设置了 ON DELETE CASCADE，直接删除会话即可
@@ -257,9 +515,19 @@ def delete_session(session_id: int) -> bool:
 
 # ========== 消息管理 ==========
 
-def add_message(session_id: int, request: CreateMessageRequest) -> Message:
-    """添加消息到会话"""
-    with get_db() as conn:
+async def add_message(session_id: int, request: CreateMessageRequest) -> Message:
+    """添加消息到会话（买家消息可按需在后台预分析）"""
+    message = await run_in_db(_insert_message, session_id, request)
+
+    if _should_pre_analyze(request):
+        start_pre_analysis(session_id, message, request.llmConfig)
+
+    return message
+
+
+def _insert_message(session_id: int, request: CreateMessageRequest) -> Message:
+    """保存消息并更新会话时间"""
+    with get_db("_insert_message") as conn:
         cursor = conn.cursor()
         now = datetime.now().isoformat()
 
@@ -288,9 +556,40 @@ def add_message(session_id: int, request: CreateMessageRequest) -> Message:
         return _row_to_message(row)
 
 
+def get_message(session_id: int, message_id: int) -> Optional[Message]:
+    """获取会话中的单条消息"""
+    with get_db("get_message") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT * FROM messages WHERE id = ? AND session_id = ?",
+            (message_id, session_id)
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return _row_to_message(row)
+
+
+def get_message_by_id(message_id: int) -> Optional[Message]:
+    """按 ID 获取消息（不限定会话）"""
+    with get_db("get_message_by_id") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT * FROM messages WHERE id = ?", (message_id,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return _row_to_message(row)
+
+
 def get_messages(session_id: int) -> list[Message]:
     """获取会话的所有消息"""
-    with get_db() as conn:
+    with get_db("get_messages") as conn:
         cursor = conn.cursor()
 
         cursor.execute(
@@ -315,52 +614,90 @@ def save_analysis(
     price_max: Optional[int],
     price_basis: Optional[str],
     quick_tags: list[str],
+    provider: Optional[str] = None,
+    usage: Optional[list] = None,
 ) -> AIAnalysis:
-    """保存AI分析结果"""
-    with get_db() as conn:
+    """保存AI分析结果（usage 为本次分析的 LLM 用量记录，在同一事务中写入）"""
+    return save_analyses([dict(
+        session_id=session_id,
+        message_id=message_id,
+        suggested_replies=suggested_replies,
+        extracted_info=extracted_info,
+        missing_info=missing_info,
+        can_quote=can_quote,
+        price_min=price_min,
+        price_max=price_max,
+        price_basis=price_basis,
+        quick_tags=quick_tags,
+        provider=provider,
+        usage=usage,
+    )])[0]
+
+
+def save_analyses(items: list[dict]) -> list[AIAnalysis]:
+    """在同一个事务中批量保存AI分析结果（参数同 save_analysis）"""
+    if not items:
+        return []
+
+    with get_db("save_analyses") as conn:
         cursor = conn.cursor()
+        analysis_ids = []
 
-        cursor.execute(
-            """
-            INSERT INTO ai_analyses (
-                session_id, message_id, suggested_replies, extracted_info,
-                missing_info, can_quote, price_min, price_max, price_basis, quick_tags,
-                created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                session_id,
-                message_id,
-                json.dumps(suggested_replies, ensure_ascii=False),
-                json.dumps(extracted_info.model_dump(), ensure_ascii=False),
-                json.dumps(missing_info, ensure_ascii=False),
-                1 if can_quote else 0,
-                price_min,
-                price_max,
-                price_basis,
-                json.dumps(quick_tags, ensure_ascii=False),
-                datetime.now().isoformat(),  # 使用本地时间
-            )
-        )
-        analysis_id = cursor.lastrowid
+        for item in items:
+            extracted_info = item["extracted_info"]
+            now = datetime.now().isoformat()  # 使用本地时间
 
-        # 如果 AI 分析提取到了文章类型，自动更新到 session
-        if extracted_info.articleType:
             cursor.execute(
-                "UPDATE sessions SET article_type = ?, updated_at = ? WHERE id = ? AND article_type IS NULL",
-                (extracted_info.articleType, datetime.now().isoformat(), session_id)
+                """
+                INSERT INTO ai_analyses (
+                    session_id, message_id, suggested_replies, extracted_info,
+                    missing_info, can_quote, price_min, price_max, price_basis, quick_tags,
+                    provider, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    item["session_id"],
+                    item["message_id"],
+                    json.dumps(item["suggested_replies"], ensure_ascii=False),
+                    json.dumps(extracted_info.model_dump(), ensure_ascii=False),
+                    json.dumps(item["missing_info"], ensure_ascii=False),
+                    1 if item["can_quote"] else 0,
+                    item["price_min"],
+                    item["price_max"],
+                    item["price_basis"],
+                    json.dumps(item["quick_tags"], ensure_ascii=False),
+                    item.get("provider"),
+                    now,
+                )
             )
+            analysis_ids.append(cursor.lastrowid)
+            usage_service.insert_usage(
+                cursor,
+                item.get("usage") or [],
+                usage_service.ANALYSIS,
+                item["session_id"],
+                item["message_id"],
+                cursor.lastrowid,
+            )
+
+            # 如果 AI 分析提取到了文章类型，自动更新到 session
+            if extracted_info.articleType:
+                cursor.execute(
+                    "UPDATE sessions SET article_type = ?, updated_at = ? WHERE id = ? AND article_type IS NULL",
+                    (extracted_info.articleType, now, item["session_id"])
+                )
 
         # 获取创建的分析
-        cursor.execute("SELECT * FROM ai_analyses WHERE id = ?", (analysis_id,))
-        row = cursor.fetchone()
+        placeholders = ",".join("?" * len(analysis_ids))
+        cursor.execute(f"SELECT * FROM ai_analyses WHERE id IN ({placeholders})", analysis_ids)
+        rows = {row["id"]: row for row in cursor.fetchall()}
 
-        return _row_to_analysis(row)
+        return [_row_to_analysis(rows[analysis_id]) for analysis_id in analysis_ids]
 
 
 def get_latest_analysis(session_id: int) -> Optional[AIAnalysis]:
     """获取会话的最新AI分析"""
-    with get_db() as conn:
+    with get_db("get_latest_analysis") as conn:
         cursor = conn.cursor()
 
         cursor.execute(
@@ -380,11 +717,83 @@ def get_latest_analysis(session_id: int) -> Optional[AIAnalysis]:
         return _row_to_analysis(row)
 
 
+def get_analysis(analysis_id: int) -> Optional[AIAnalysis]:
+    """获取单条AI分析"""
+    with get_db("get_analysis") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT * FROM ai_analyses WHERE id = ?", (analysis_id,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return _row_to_analysis(row)
+
+
+def get_analysis_by_message(message_id: int) -> Optional[AIAnalysis]:
+    """获取某条消息的AI分析"""
+    with get_db("get_analysis_by_message") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT * FROM ai_analyses
+            WHERE message_id = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (message_id,)
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return _row_to_analysis(row)
+
+
+# ========== 对话滚动摘要 ==========
+
+def get_conversation_summary(session_id: int) -> Optional[dict]:
+    """获取会话的滚动摘要（覆盖到 last_message_id 为止的消息）"""
+    with get_db("get_conversation_summary") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT summary, last_message_id FROM conversation_summaries WHERE session_id = ?",
+            (session_id,)
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return {"summary": row["summary"], "lastMessageId": row["last_message_id"]}
+
+
+def save_conversation_summary(session_id: int, summary: str, last_message_id: int) -> None:
+    """保存会话的滚动摘要（只前进，不覆盖已覆盖到更新消息的摘要）"""
+    with get_db("save_conversation_summary") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO conversation_summaries (session_id, summary, last_message_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                summary = excluded.summary,
+                last_message_id = excluded.last_message_id,
+                updated_at = excluded.updated_at
+            WHERE excluded.last_message_id > conversation_summaries.last_message_id
+            """,
+            (session_id, summary, last_message_id, datetime.now().isoformat())
+        )
+
+
 # ========== 挽留话术管理 ==========
 
 def get_retention_template() -> Optional[RetentionTemplate]:
     """获取默认挽留话术"""
-    with get_db() as conn:
+    with get_db("get_retention_template") as conn:
         cursor = conn.cursor()
 
         cursor.execute(
@@ -405,7 +814,7 @@ def get_retention_template() -> Optional[RetentionTemplate]:
 
 def update_retention_template(request: UpdateRetentionTemplateRequest) -> bool:
     """更新默认挽留话术"""
-    with get_db() as conn:
+    with get_db("update_retention_template") as conn:
         cursor = conn.cursor()
 
         # 先检查是否存在默认模板
@@ -432,7 +841,7 @@ def update_retention_template(request: UpdateRetentionTemplateRequest) -> bool:
 
 def get_review_template() -> Optional[RetentionTemplate]:
     """获取默认要好评话术"""
-    with get_db() as conn:
+    with get_db("get_review_template") as conn:
         cursor = conn.cursor()
 
         cursor.execute(
@@ -453,7 +862,7 @@ def get_review_template() -> Optional[RetentionTemplate]:
 
 def update_review_template(request: UpdateRetentionTemplateRequest) -> bool:
     """更新默认要好评话术"""
-    with get_db() as conn:
+    with get_db("update_review_template") as conn:
         cursor = conn.cursor()
 
         # 先检查是否存在默认模板
@@ -512,16 +921,28 @@ def _row_to_analysis(row) -> AIAnalysis:
         canQuote=bool(row["can_quote"]),
         priceEstimate=price_estimate,
         quickTags=json.loads(row["quick_tags"]) if row["quick_tags"] else [],
+        provider=row["provider"],
         createdAt=datetime.fromisoformat(row["created_at"]),
     )
 
 
 # ========== 消息分析流程（异步） ==========
 
+# 进行中的分析（相同 key 的并发请求共享结果）
+_analyze_flights = SingleFlight()
+# 每个会话一把锁，同一会话的分析串行执行
+_session_locks = KeyedLocks()
+# 进行中的需求提炼
+_summary_flights = SingleFlight()
+# 后台进行中的滚动摘要更新（按会话）
+_history_summary_flights = SingleFlight()
+
+
 async def send_message_and_analyze(
     session_id: int,
     content: str,
     config,  # LLMConfig
+    use_cache: bool = True,
 ) -> dict:
     """
     发送买家消息并进行 AI 分析
@@ -530,88 +951,622 @@ async def send_message_and_analyze(
         session_id: 会话 ID
         content: 消息内容
         config: LLM 配置
+        use_cache: 是否使用 LLM 响应缓存
 
     Returns:
         dict: 包含 message 和 analysis 的响应
     """
+    # 相同会话、相同内容的并发请求（如重复点击、前端重试）共享同一次分析，
+    # 不会重复保存买家消息，也不会重复调用 LLM；
+    # use_cache=False（强制重新生成）不与使用缓存的请求合并
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return await _analyze_flights.do(
+        ("send", session_id, content_hash, use_cache),
+        lambda: _send_message_and_analyze(session_id, content, config, use_cache),
+    )
+
+
+async def _send_message_and_analyze(
+    session_id: int,
+    content: str,
+    config,  # LLMConfig
+    use_cache: bool,
+) -> dict:
+    """保存买家消息并分析"""
+    with metrics.ANALYZE_STAGE_DURATION.time("add_message"):
+        message = await add_message(session_id, CreateMessageRequest(content=content, role="buyer"))
+    return await analyze_message(session_id, message.id, config, use_cache)
+
+
+async def analyze_message(
+    session_id: int,
+    message_id: int,
+    config,  # LLMConfig
+    use_cache: bool = True,
+    writer: Optional[AnalysisBatchWriter] = None,
+    cancel_abandoned: bool = False,
+) -> dict:
+    """
+    分析已保存的买家消息
+
+    已有分析结果时直接返回；该消息正在（预）分析时等待同一次分析的结果。
+    传入 writer 时分析结果经由该写入器攒批保存。
+    cancel_abandoned 为 True 时，调用方被取消且没有其他请求等待该分析时一并取消 LLM 调用。
+
+    Returns:
+        dict: 包含 message 和 analysis 的响应
+    """
+    message = await run_in_db(get_message, session_id, message_id)
+    if message is None:
+        raise ValueError(f"Message {message_id} not found")
+
+    existing = await run_in_db(get_analysis_by_message, message_id)
+    if existing is not None:
+        return {"message": message, "analysis": existing}
+
+    return await _analyze_flights.do(
+        ("message", message_id),
+        lambda: _analyze_message(session_id, message, config, use_cache, writer),
+        cancel_abandoned=cancel_abandoned,
+    )
+
+
+def start_pre_analysis(session_id: int, message: Message, config) -> None:
+    """在后台提前分析刚保存的买家消息，结果保存后供之后的 /analyze 直接使用"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(f"No running event loop, skip pre-analysis of message {message.id}")
+        return
+
+    task = _analyze_flights.start(
+        ("message", message.id),
+        lambda: _analyze_message(session_id, message, config, True),
+    )
+    task.add_done_callback(lambda _t: _log_pre_analysis(message.id, _t))
+
+
+def _should_pre_analyze(request: CreateMessageRequest) -> bool:
+    if request.role != "buyer" or request.llmConfig is None:
+        return False
+    if request.preAnalyze is not None:
+        return request.preAnalyze
+    return app_config.SPECULATIVE_ANALYSIS
+
+
+def _log_pre_analysis(message_id: int, task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.warning(f"Pre-analysis of message {message_id} failed: {task.exception()}")
+    elif task.result().get("error"):
+        logger.warning(f"Pre-analysis of message {message_id} failed: {task.result()['error']}")
+
+
+async def _analyze_message(
+    session_id: int,
+    message: Message,
+    config,  # LLMConfig
+    use_cache: bool,
+    writer: Optional[AnalysisBatchWriter] = None,
+) -> dict:
+    """分析买家消息（同一会话的分析串行执行）"""
+    from . import llm_service
+
+    with metrics.ANALYZE_STAGE_DURATION.time("total"):
+        waiting_since = perf_counter()
+        async with _session_locks.get(session_id):
+            metrics.ANALYZE_STAGE_DURATION.observe(perf_counter() - waiting_since, "lock_wait")
+            # 等待会话锁期间可能已由其他请求分析完成
+            existing = await run_in_db(get_analysis_by_message, message.id)
+            if existing is not None:
+                return {"message": message, "analysis": existing}
+
+            with metrics.ANALYZE_STAGE_DURATION.time("load_history"):
+                # 1. 获取会话历史消息（截至本条消息）
+                all_messages = _messages_until(await run_in_db(get_messages, session_id), message.id)
+
+                # 2. 获取之前的累积信息（如果有）
+                latest_analysis = await run_in_db(get_latest_analysis, session_id)
+                accumulated_info = latest_analysis.extractedInfo if latest_analysis else None
+
+            # 3. 调用 LLM 分析
+            try:
+                # 按 token 预算截取上下文，更早的对话以滚动摘要代替
+                with metrics.ANALYZE_STAGE_DURATION.time("context"):
+                    window, history_summary = await _prepare_context(
+                        session_id, all_messages, accumulated_info, config, use_cache
+                    )
+
+                with usage_service.collect() as usage:
+                    try:
+                        result = await llm_service.analyze_conversation(
+                            messages=window,
+                            config=config,
+                            accumulated_info=accumulated_info,
+                            use_cache=use_cache,
+                            history_summary=history_summary,
+                        )
+                    except Exception:
+                        # 失败的分析同样消耗了 token
+                        await run_in_db(
+                            usage_service.save_usage,
+                            usage.records, usage_service.ANALYSIS, session_id, message.id
+                        )
+                        raise
+
+                # 4. 保存 AI 分析结果（批量分析时攒批写入，仍在会话锁内等待写入完成）
+                fields = dict(
+                    session_id=session_id,
+                    message_id=message.id,
+                    suggested_replies=result.suggested_replies,
+                    extracted_info=result.extracted_info,
+                    missing_info=result.missing_info,
+                    can_quote=result.can_quote,
+                    price_min=result.price_min,
+                    price_max=result.price_max,
+                    price_basis=result.price_basis,
+                    quick_tags=result.quick_tags,
+                    provider=result.provider,
+                    usage=usage.records,
+                )
+                with metrics.ANALYZE_STAGE_DURATION.time("save"):
+                    if writer is not None:
+                        analysis = await writer.save(**fields)
+                    else:
+                        analysis = await run_in_db(save_analysis, **fields)
+
+                return {
+                    "message": message,
+                    "analysis": analysis,
+                }
+
+            except Exception as e:
+                # 即使分析失败，消息也已保存
+                # 返回消息但分析为空
+                return {
+                    "message": message,
+                    "analysis": None,
+                    "error": str(e),
+                }
+
+
+async def _prepare_context(
+    session_id: int,
+    messages: list[Message],
+    accumulated_info: Optional[ExtractedInfoV3],
+    config,  # LLMConfig
+    use_cache: bool,
+) -> tuple[list[Message], Optional[str]]:
+    """
+    按 token 预算划分上下文窗口
+
+    使用已保存的滚动摘要 + 尚未折叠进摘要的消息原文，不在分析路径上等待摘要生成：
+    超出保留条数的消息累计到 CONTEXT_SUMMARY_BATCH 条时在后台用 LLM 更新摘要；
+    超出预算时本轮用本地截断摘要临时折叠更早的消息（不保存），逐步减少原文保留的条数。
+
+    Returns:
+        (原文保留的消息, 滚动摘要)
+    """
     from . import llm_service
 
-    # 1. 保存买家消息
-    message = add_message(session_id, CreateMessageRequest(content=content, role="buyer"))
+    stored = await run_in_db(get_conversation_summary, session_id)
+    summary = stored["summary"] if stored else None
+    summarized_until = stored["lastMessageId"] if stored else 0
+
+    # 摘要已覆盖到待分析消息之后（如补分析较早的消息），此时不使用摘要
+    if summarized_until >= messages[-1].id:
+        return messages[-context_window.keep_turns_candidates()[0]:], None
+
+    candidates = context_window.keep_turns_candidates()
+    overflow, _ = context_window.split_window(messages, candidates[0], summarized_until)
+    if len(overflow) >= max(app_config.CONTEXT_SUMMARY_BATCH, 1):
+        _schedule_history_summary(session_id, overflow, summary, config, use_cache)
+
+    recent = [msg for msg in messages if msg.id > summarized_until]
+    turn_summary = summary
+    for keep_turns in [None, *candidates]:
+        if keep_turns is not None:
+            to_fold, recent = context_window.split_window(messages, keep_turns, summarized_until)
+            turn_summary = summary
+            if to_fold:
+                turn_summary = context_window.local_summary(
+                    summary, to_fold, app_config.CONTEXT_SUMMARY_MAX_CHARS
+                )
+
+        tokens = llm_service.estimate_analyze_prompt_tokens(recent, accumulated_info, turn_summary)
+        if tokens <= app_config.CONTEXT_TOKEN_BUDGET:
+            break
+
+    return recent, turn_summary
 
-    # 2. 获取会话所有历史消息
-    all_messages = get_messages(session_id)
 
-    # 3. 获取之前的累积信息（如果有）
-    latest_analysis = get_latest_analysis(session_id)
-    accumulated_info = latest_analysis.extractedInfo if latest_analysis else None
+def _schedule_history_summary(
+    session_id: int,
+    to_summarize: list[Message],
+    summary: Optional[str],
+    config,  # LLMConfig
+    use_cache: bool,
+) -> None:
+    """在后台把溢出的消息合并进滚动摘要（同一会话同时只有一个）"""
+    _history_summary_flights.start(
+        session_id,
+        lambda: _refresh_history_summary(session_id, to_summarize, summary, config, use_cache),
+    )
+
+
+async def _refresh_history_summary(
+    session_id: int,
+    to_summarize: list[Message],
+    summary: Optional[str],
+    config,  # LLMConfig
+    use_cache: bool,
+) -> None:
+    from . import llm_service
 
-    # 4. 调用 LLM 分析
     try:
-        result = await llm_service.analyze_conversation(
-            messages=all_messages,
-            config=config,
-            accumulated_info=accumulated_info,
-        )
+        with usage_service.collect() as usage:
+            try:
+                summary = await llm_service.summarize_history(summary, to_summarize, config, use_cache)
+            finally:
+                await run_in_db(
+                    usage_service.save_usage,
+                    usage.records, usage_service.HISTORY_SUMMARY, session_id, to_summarize[-1].id
+                )
+    except Exception as e:
+        logger.warning(f"Rolling summary failed, using local summary: {type(e).__name__} - {e}")
+        summary = context_window.local_summary(summary, to_summarize, app_config.CONTEXT_SUMMARY_MAX_CHARS)
+
+    try:
+        await run_in_db(save_conversation_summary, session_id, summary, to_summarize[-1].id)
+    except Exception as e:
+        logger.warning(f"Saving rolling summary of session {session_id} failed: {type(e).__name__} - {e}")
+
+
+def _messages_until(messages: list[Message], message_id: int) -> list[Message]:
+    """截取到指定消息为止的历史（排除并发写入的更新消息）"""
+    return [msg for msg in messages if msg.id <= message_id]
+
+
+async def stream_message_analysis(
+    session_id: int,
+    message: Message,
+    config,  # LLMConfig
+    use_cache: bool = True,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    对已保存的买家消息进行流式 AI 分析
+
+    Args:
+        session_id: 会话 ID
+        message: 已保存的买家消息
+        config: LLM 配置
+        use_cache: 是否使用 LLM 响应缓存
+
+    Yields:
+        (事件名, 数据)：reply / extractedInfo / priceEstimate 为增量结果，
+        最后以 analysis（已保存的完整分析）或 error 结束
+    """
+    from . import llm_service
 
-        # 5. 保存 AI 分析结果
-        analysis = save_analysis(
-            session_id=session_id,
-            message_id=message.id,
-            suggested_replies=result.suggested_replies,
-            extracted_info=result.extracted_info,
-            missing_info=result.missing_info,
-            can_quote=result.can_quote,
-            price_min=result.price_min,
-            price_max=result.price_max,
-            price_basis=result.price_basis,
-            quick_tags=result.quick_tags,
+    # 该消息正在后台（预）分析时，等待其结果而不重复调用 LLM
+    pending = _analyze_flights.get(("message", message.id))
+    if pending is not None:
+        result = await _analyze_flights.wait(pending)
+        if result.get("analysis") is not None:
+            yield "analysis", result["analysis"].model_dump(mode="json")
+        else:
+            yield "error", {"error": result.get("error", "分析失败")}
+        return
+
+    # 与非流式分析共用会话锁，保证 accumulated_info 链按顺序推进
+    async with _session_locks.get(session_id):
+        existing = await run_in_db(get_analysis_by_message, message.id)
+        if existing is not None:
+            yield "analysis", existing.model_dump(mode="json")
+            return
+
+        all_messages = _messages_until(await run_in_db(get_messages, session_id), message.id)
+        latest_analysis = await run_in_db(get_latest_analysis, session_id)
+        accumulated_info = latest_analysis.extractedInfo if latest_analysis else None
+
+        try:
+            window, history_summary = await _prepare_context(
+                session_id, all_messages, accumulated_info, config, use_cache
+            )
+
+            with usage_service.collect() as usage:
+                saved = False
+                try:
+                    async for event, data in llm_service.analyze_conversation_stream(
+                        messages=window,
+                        config=config,
+                        accumulated_info=accumulated_info,
+                        use_cache=use_cache,
+                        history_summary=history_summary,
+                    ):
+                        if event != "result":
+                            yield event, data
+                            continue
+
+                        # 完整结果仍通过 save_analysis 保存
+                        analysis = await run_in_db(
+                            save_analysis,
+                            session_id=session_id,
+                            message_id=message.id,
+                            suggested_replies=data.suggested_replies,
+                            extracted_info=data.extracted_info,
+                            missing_info=data.missing_info,
+                            can_quote=data.can_quote,
+                            price_min=data.price_min,
+                            price_max=data.price_max,
+                            price_basis=data.price_basis,
+                            quick_tags=data.quick_tags,
+                            provider=data.provider,
+                            usage=usage.records,
+                        )
+                        saved = True
+                        yield "analysis", analysis.model_dump(mode="json")
+                finally:
+                    if not saved:
+                        await run_in_db(
+                            usage_service.save_usage,
+                            usage.records, usage_service.ANALYSIS, session_id, message.id
+                        )
+
+        except Exception as e:
+            # 消息已保存，仅分析失败
+            yield "error", {"error": str(e)}
+
+
+def get_unanswered_messages(session_ids: list[int]) -> dict[int, Message]:
+    """获取各会话尚未回复的最新买家消息（会话最后一条消息为买家消息时）"""
+    if not session_ids:
+        return {}
+
+    with get_db("get_unanswered_messages") as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(session_ids))
+        cursor.execute(
+            f"""
+            SELECT m.* FROM messages m
+            WHERE m.id IN (
+                SELECT MAX(id) FROM messages
+                WHERE session_id IN ({placeholders})
+                GROUP BY session_id
+            )
+            AND m.role = 'buyer'
+            """,
+            session_ids
         )
+        rows = cursor.fetchall()
 
-        return {
-            "message": message,
-            "analysis": analysis,
-        }
+        return {row["session_id"]: _row_to_message(row) for row in rows}
 
-    except Exception as e:
-        # 即使分析失败，消息也已保存
-        # 返回消息但分析为空
-        return {
-            "message": message,
-            "analysis": None,
-            "error": str(e),
-        }
+
+async def analyze_sessions_batch(
+    session_ids: list[int],
+    config,  # LLMConfig
+    use_cache: bool = True,
+) -> AsyncIterator[BatchAnalyzeItem]:
+    """
+    批量分析多个会话中尚未回复的最新买家消息
+
+    各会话并发分析（并发数由 BATCH_ANALYZE_CONCURRENCY 限制），分析结果攒批写入数据库。
+
+    Yields:
+        每个会话完成时产出一条结果（按完成顺序）：
+        BatchAnalyzeItem（status: succeeded / failed / skipped）
+    """
+    session_ids = list(dict.fromkeys(session_ids))
+    unanswered = await run_in_db(get_unanswered_messages, session_ids)
+
+    for session_id in session_ids:
+        if session_id not in unanswered:
+            yield BatchAnalyzeItem(sessionId=session_id, status="skipped", error="没有待回复的买家消息")
+
+    writer = AnalysisBatchWriter()
+    semaphore = asyncio.Semaphore(max(app_config.BATCH_ANALYZE_CONCURRENCY, 1))
+
+    async def run(session_id: int, message: Message) -> BatchAnalyzeItem:
+        async with semaphore:
+            try:
+                result = await analyze_message(
+                    session_id, message.id, config, use_cache, writer, cancel_abandoned=True
+                )
+            except Exception as e:
+                return BatchAnalyzeItem(sessionId=session_id, status="failed", message=message, error=str(e))
+
+        return BatchAnalyzeItem(
+            sessionId=session_id,
+            status="failed" if result.get("error") else "succeeded",
+            message=result["message"],
+            analysis=result.get("analysis"),
+            error=result.get("error"),
+        )
+
+    tasks = [
+        asyncio.ensure_future(run(session_id, message))
+        for session_id, message in unanswered.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端断开时取消尚未完成的分析（只由本批次等待的 LLM 调用一并取消，
+        # 与其他请求共享或后台预分析中的继续执行），并写入已产生的结果
+        for task in tasks:
+            task.cancel()
+        writer.flush()
 
 
 async def summarize_session_requirements(
     session_id: int,
     config,  # LLMConfig
+    use_cache: bool = True,
 ) -> dict:
     """
     提炼会话的需求要点
 
+    以上次提炼的结果（或最新分析累积的提取信息）为基础，只把之后新增的对话发给 LLM；
+    消息列表与上次提炼时完全相同时直接返回上次的结果。
+
     Args:
         session_id: 会话 ID
         config: LLM 配置
+        use_cache: 是否使用 LLM 响应缓存
 
     Returns:
         dict: RequirementSummary 的字典形式
     """
-    from . import llm_service
-
     # 获取所有消息
-    messages = get_messages(session_id)
+    messages = await run_in_db(get_messages, session_id)
 
     if not messages:
         raise ValueError("会话没有消息")
 
-    # 调用 LLM 提炼需求
-    summary = await llm_service.summarize_requirements(messages, config)
+    fingerprint = _messages_fingerprint(messages)
+    checkpoint = await run_in_db(_get_summary_checkpoint, session_id)
+    if checkpoint is not None and checkpoint["fingerprint"] == fingerprint:
+        stored = _parse_requirement_summary(checkpoint["summary"])
+        if stored is not None:
+            return stored.model_dump()
+
+    # 重复打开结束会话弹窗等并发请求共享同一次提炼
+    return await _summary_flights.do(
+        ("summary", session_id, fingerprint),
+        lambda: _summarize_requirements(session_id, messages, fingerprint, checkpoint, config, use_cache),
+    )
+
 
-    # 更新会话的 requirement_summary 字段
-    from ..models.schemas import UpdateSessionRequest
-    update_session(session_id, UpdateSessionRequest(
-        requirementSummary=json.dumps(summary.model_dump(), ensure_ascii=False)
-    ))
+async def _summarize_requirements(
+    session_id: int,
+    messages: list[Message],
+    fingerprint: str,
+    checkpoint: Optional[dict],
+    config,  # LLMConfig
+    use_cache: bool,
+) -> dict:
+    """增量提炼需求要点并保存检查点"""
+    from . import llm_service
 
+    # 确定起点：上次提炼的结果 > 最新分析的累积提取信息 > 从头提炼
+    previous = None
+    covered_until = 0
+    stored = _parse_requirement_summary(checkpoint["summary"]) if checkpoint else None
+    if stored is not None and checkpoint["messageId"]:
+        previous, covered_until = stored, checkpoint["messageId"]
+    else:
+        latest_analysis = await run_in_db(get_latest_analysis, session_id)
+        if latest_analysis is not None:
+            previous = _summary_from_extracted_info(latest_analysis.extractedInfo)
+            covered_until = latest_analysis.messageId
+
+    new_messages = [msg for msg in messages if msg.id > covered_until]
+
+    if previous is not None and not new_messages:
+        # 没有新增对话，直接使用已有的需求状态
+        summary = previous
+    else:
+        with usage_service.collect() as usage:
+            try:
+                summary = await llm_service.summarize_requirements(
+                    new_messages if previous is not None else messages,
+                    config,
+                    use_cache=use_cache,
+                    previous=previous,
+                )
+            finally:
+                await run_in_db(
+                    usage_service.save_usage,
+                    usage.records, usage_service.REQUIREMENT_SUMMARY, session_id, messages[-1].id
+                )
+
+    await run_in_db(_save_summary_checkpoint, session_id, summary, messages[-1].id, fingerprint)
     return summary.model_dump()
+
+
+def _messages_fingerprint(messages: list[Message]) -> str:
+    """消息列表指纹（ID、角色、内容）"""
+    digest = hashlib.sha256()
+    for msg in messages:
+        digest.update(f"{msg.id}\x1f{msg.role}\x1f{msg.content}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _get_summary_checkpoint(session_id: int) -> Optional[dict]:
+    """获取会话需求要点摘要及其检查点"""
+    with get_db("_get_summary_checkpoint") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT requirement_summary, summary_message_id, summary_fingerprint
+            FROM sessions WHERE id = ?
+            """,
+            (session_id,)
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            raise ValueError(f"Session {session_id} not found")
+
+        if row["requirement_summary"] is None:
+            return None
+
+        return {
+            "summary": row["requirement_summary"],
+            "messageId": row["summary_message_id"],
+            "fingerprint": row["summary_fingerprint"],
+        }
+
+
+def _save_summary_checkpoint(
+    session_id: int,
+    summary: RequirementSummary,
+    message_id: int,
+    fingerprint: str,
+) -> None:
+    """
+    保存需求要点摘要及其检查点
+
+    摘要由已有消息派生，不更新 updated_at（否则仅打开结束会话弹窗就会改变会话列表的排序）
+    """
+    with get_db("_save_summary_checkpoint") as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            UPDATE sessions
+            SET requirement_summary = ?, summary_message_id = ?, summary_fingerprint = ?
+            WHERE id = ?
+            """,
+            (
+                json.dumps(summary.model_dump(), ensure_ascii=False),
+                message_id,
+                fingerprint,
+                session_id,
+            )
+        )
+
+
+def _parse_requirement_summary(text: Optional[str]) -> Optional[RequirementSummary]:
+    """解析保存的需求要点摘要（手动修改为非 JSON 等无法解析时返回 None）"""
+    if not text:
+        return None
+    try:
+        return RequirementSummary(**json.loads(text))
+    except (ValueError, TypeError):
+        return None
+
+
+def _summary_from_extracted_info(info: ExtractedInfoV3) -> RequirementSummary:
+    """由分析累积的提取信息构造需求要点"""
+    return RequirementSummary(
+        articleType=info.articleType or "未知类型",
+        wordCount=info.wordCount,
+        deadline=info.deadline,
+        topic=info.topic,
+        requirements=list(info.specialRequirements),
+        notes=None,
+    )
@@ -0,0 +1,97 @@
+"""
+并发协调工具
+- SingleFlight：相同 key 的并发调用共享同一次执行结果
+- KeyedLocks：按 key 分配的互斥锁（如每个会话一把锁）
+"""
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    """相同 key 的并发调用只执行一次，其余调用等待并共享结果"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # 任务 -> 正在 do() 中等待的调用方数
+        self._waiters: dict[asyncio.Task, int] = {}
+        # 所有参与方都同意“无人等待时取消”的任务
+        self._abandonable: set[asyncio.Task] = set()
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cancel_abandoned: bool = False,
+    ) -> Any:
+        """
+        执行 fn；若相同 key 的调用正在进行，则直接等待其结果
+
+        默认某个调用方被取消时任务继续执行（结果供其他等待者或之后的请求使用）。
+        cancel_abandoned 为 True 时，若最后一个等待者被取消且任务没有其他参与方要求继续执行
+        （start() 启动的后台任务、不带该参数的 do()/wait() 调用方），则一并取消任务。
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self.start(key, fn)
+            if cancel_abandoned:
+                self._abandonable.add(task)
+        elif not cancel_abandoned:
+            self._abandonable.discard(task)
+        return await self._wait(task)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """在后台开始执行 fn（不等待）；若相同 key 的调用正在进行，则返回该任务"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._forget(key, _t))
+        else:
+            self._abandonable.discard(task)
+        return task
+
+    def get(self, key: Hashable) -> Optional[asyncio.Task]:
+        """获取相同 key 正在进行的任务"""
+        return self._inflight.get(key)
+
+    async def wait(self, task: asyncio.Task) -> Any:
+        """等待 get() 得到的任务（调用方被取消时任务继续执行）"""
+        self._abandonable.discard(task)
+        return await self._wait(task)
+
+    async def _wait(self, task: asyncio.Task) -> Any:
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield：某个调用方被取消时不影响其他等待者
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and task in self._abandonable:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._abandonable.discard(task)
+        # 标记异常已被读取，避免无人等待时输出警告
+        if not task.cancelled():
+            task.exception()
+
+
+class KeyedLocks:
+    """按 key 分配的 asyncio 锁，不再使用的锁会被自动回收"""
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def get(self, key: Hashable) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
@@ -0,0 +1,157 @@
+"""
+LLM 流式输出的增量 JSON 解析
+在完整响应生成之前，逐个提取 suggestedReplies 以及 extractedInfo / priceEstimate
+"""
+import json
+from typing import Any
+
+# 需要在闭合后整体推送的顶层对象字段
+OBJECT_FIELDS = ("extractedInfo", "priceEstimate")
+
+
+class AnalysisStreamParser:
+    """
+    增量解析分析结果 JSON
+
+    每次 feed 一段文本，返回本段内新完成的事件列表：
+    - ("reply", {"index": 0, "text": "..."})：suggestedReplies 中的一条回复
+    - ("extractedInfo", {...}) / ("priceEstimate", {...})：对应对象闭合时整体推送
+
+    根对象之前的内容（如 ```json 代码块标记）会被忽略。
+    """
+
+    def __init__(self):
+        # 完整文本按段保存，只在读取 text 时拼接一次
+        self._chunks: list[str] = []
+        # 解析缓冲区只保留尚未处理完的尾部（_offset 为其首字符在完整文本中的位置），
+        # 避免长输出时每段都复制整段文本
+        self._buffer = ""
+        self._offset = 0
+        self._pos = 0
+
+        self._started = False
+        self._finished = False
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+        self._expect_key = False
+        self._current_key = None
+        self._value_start = 0
+        self._reply_count = 0
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整文本"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """输入一段增量文本，返回新完成的事件"""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        events: list[tuple[str, Any]] = []
+
+        text = self._buffer
+        offset = self._offset
+        i = self._pos
+        end = offset + len(text)
+
+        while i < end and not self._finished:
+            ch = text[i - offset]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string(self._string_start, i, events)
+                i += 1
+                continue
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append("{")
+                    self._expect_key = True
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if len(self._stack) == 1:
+                    self._value_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if len(self._stack) == 1:
+                    self._on_value_closed(i, events)
+                elif not self._stack:
+                    self._finished = True
+            elif ch == "," and len(self._stack) == 1:
+                self._expect_key = True
+            i += 1
+
+        self._pos = i
+        self._compact()
+        return events
+
+    def _compact(self) -> None:
+        """丢弃缓冲区中之后不会再读取的部分（保留未闭合的字符串与顶层字段值）"""
+        keep = self._pos
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if len(self._stack) >= 2:
+            keep = min(keep, self._value_start)
+        if keep > self._offset:
+            self._buffer = self._buffer[keep - self._offset:]
+            self._offset = keep
+
+    def _slice(self, start: int, end: int) -> str:
+        """按完整文本中的位置截取缓冲区（含 end）"""
+        return self._buffer[start - self._offset:end - self._offset + 1]
+
+    def _on_string(self, start: int, end: int, events: list) -> None:
+        """字符串闭合"""
+        depth = len(self._stack)
+
+        # 模型输出的非法转义（如截断的 \u 序列）跳过该片段，由完整响应解析兜底
+        if depth == 1 and self._expect_key:
+            try:
+                self._current_key = json.loads(self._slice(start, end))
+            except ValueError:
+                self._current_key = None
+            self._expect_key = False
+            return
+
+        if (
+            depth == 2
+            and self._stack[1] == "["
+            and self._current_key == "suggestedReplies"
+        ):
+            index = self._reply_count
+            self._reply_count += 1
+            try:
+                text = json.loads(self._slice(start, end))
+            except ValueError:
+                return
+            events.append(("reply", {"index": index, "text": text}))
+
+    def _on_value_closed(self, end: int, events: list) -> None:
+        """顶层字段的对象/数组值闭合"""
+        if self._current_key not in OBJECT_FIELDS:
+            return
+        try:
+            value = json.loads(self._slice(self._value_start, end))
+        except ValueError:
+            return
+        if isinstance(value, dict):
+            events.append((self._current_key, value))
@@ -12,7 +12,7 @@ from ..models.schemas import (
 
 def get_templates() -> TemplateListResponse:
     """获取所有模板"""
-    with get_db() as conn:
+    with get_db("get_templates") as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM reply_templates ORDER BY sort_order ASC"
@@ -35,7 +35,7 @@ def get_templates() -> TemplateListResponse:
 
 def get_template_by_id(template_id: int) -> Optional[ReplyTemplate]:
     """获取单个模板"""
-    with get_db() as conn:
+    with get_db("get_template_by_id") as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM reply_templates WHERE id = ?", (template_id,))
         row = cursor.fetchone()
@@ -54,7 +54,7 @@ def get_template_by_id(template_id: int) -> Optional[ReplyTemplate]:
 
 def create_template(request: CreateTemplateRequest) -> ReplyTemplate:
     """创建模板"""
-    with get_db() as conn:
+    with get_db("create_template") as conn:
         cursor = conn.cursor()
 
         # 获取最大排序值
@@ -75,7 +75,7 @@ def create_template(request: CreateTemplateRequest) -> ReplyTemplate:
 
 def update_template(template_id: int, request: UpdateTemplateRequest) -> bool:
     """更新模板"""
-    with get_db() as conn:
+    with get_db("update_template") as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -90,7 +90,7 @@ def update_template(template_id: int, request: UpdateTemplateRequest) -> bool:
 
 def delete_template(template_id: int) -> bool:
     """删除模板"""
-    with get_db() as conn:
+    with get_db("delete_template") as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM reply_templates WHERE id = ?", (template_id,))
         return cursor.rowcount > 0
@@ -0,0 +1,309 @@
+"""
+LLM 用量与成本统计
+每次 LLM 调用的 token 数、模型、耗时与按 LLM_PRICING 计算的成本记入 llm_usage 表，
+与对应的 AI 分析（或摘要）关联，并提供按天 / 模型 / 提示词版本等维度的汇总
+"""
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterator, Optional
+
+from .. import config as app_config
+from ..database import get_db
+from ..models.schemas import LLMUsageRecord, UsageGroup, UsageSummaryResponse
+from .context_window import estimate_tokens
+
+# 用量类型
+ANALYSIS = "analysis"
+HISTORY_SUMMARY = "history_summary"
+REQUIREMENT_SUMMARY = "requirement_summary"
+
+# 汇总维度 -> SQL 表达式
+GROUP_BY_COLUMNS = {
+    "day": "substr(created_at, 1, 10)",
+    "model": "model_id",
+    "promptVersion": "prompt_version",
+    "kind": "kind",
+    "session": "session_id",
+}
+
+
+class UsageRecord:
+    """单次 LLM 调用的用量"""
+
+    def __init__(
+        self,
+        model_id: str,
+        base_url: str,
+        prompt_version: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        cached: bool = False,
+        estimated: bool = False,
+    ):
+        self.model_id = model_id
+        self.base_url = base_url
+        self.prompt_version = prompt_version
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_ms = latency_ms
+        self.cached = cached
+        self.estimated = estimated
+        self.cost = compute_cost(model_id, prompt_tokens, completion_tokens)
+
+
+class UsageCollector:
+    """收集一次分析（或摘要）过程中的全部 LLM 调用（含故障转移、对冲与重试）"""
+
+    def __init__(self):
+        self.records: list[UsageRecord] = []
+        self.prompt_version: Optional[str] = None
+
+
+_collector: ContextVar[Optional[UsageCollector]] = ContextVar("llm_usage_collector", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[UsageCollector]:
+    """在当前上下文中收集 LLM 用量（可嵌套，内层的调用只记入内层）"""
+    collector = UsageCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        try:
+            _collector.reset(token)
+        except ValueError:
+            # 流式生成器在其他上下文中被关闭时无法还原，直接清除
+            _collector.set(None)
+
+
+def set_prompt_version(version: str) -> None:
+    """标记之后的 LLM 调用所用的提示词版本"""
+    collector = _collector.get()
+    if collector is not None:
+        collector.prompt_version = version
+
+
+def record(
+    model_id: str,
+    base_url: str,
+    usage: Optional[dict],
+    latency_ms: float,
+    prompt: str = "",
+    completion: str = "",
+    cached: bool = False,
+) -> None:
+    """
+    记录一次 LLM 调用
+
+    usage 为响应中的 usage 字段；供应商未返回时按文本长度估算 token 数。
+    缓存命中不消耗 token，记为 0 以便统计命中率。
+    """
+    collector = _collector.get()
+    if collector is None:
+        return
+
+    estimated = False
+    if cached:
+        prompt_tokens = completion_tokens = 0
+    elif usage and usage.get("prompt_tokens") is not None:
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+    else:
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(completion)
+        estimated = True
+
+    collector.records.append(UsageRecord(
+        model_id=model_id,
+        base_url=base_url.rstrip("/"),
+        prompt_version=collector.prompt_version,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms=latency_ms,
+        cached=cached,
+        estimated=estimated,
+    ))
+
+
+def compute_cost(model_id: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """按 LLM_PRICING（每百万 token 单价）计算成本，未配置单价的模型返回 None"""
+    price = app_config.LLM_PRICING.get(model_id) or app_config.LLM_PRICING.get("*")
+    if not price:
+        return None
+    return (prompt_tokens * float(price.get("input", 0)) + completion_tokens * float(price.get("output", 0))) / 1e6
+
+
+def insert_usage(
+    cursor: sqlite3.Cursor,
+    records: list[UsageRecord],
+    kind: str,
+    session_id: Optional[int],
+    message_id: Optional[int] = None,
+    analysis_id: Optional[int] = None,
+) -> None:
+    """在调用方的事务中写入用量记录"""
+    if not records:
+        return
+
+    now = datetime.now().isoformat()
+    cursor.executemany(
+        """
+        INSERT INTO llm_usage (
+            kind, session_id, message_id, analysis_id, model_id, base_url, prompt_version,
+            prompt_tokens, completion_tokens, total_tokens, latency_ms, cost, cached, estimated, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                kind,
+                session_id,
+                message_id,
+                analysis_id,
+                item.model_id,
+                item.base_url,
+                item.prompt_version,
+                item.prompt_tokens,
+                item.completion_tokens,
+                item.prompt_tokens + item.completion_tokens,
+                round(item.latency_ms, 1),
+                item.cost,
+                1 if item.cached else 0,
+                1 if item.estimated else 0,
+                now,
+            )
+            for item in records
+        ]
+    )
+
+
+def save_usage(
+    records: list[UsageRecord],
+    kind: str,
+    session_id: Optional[int],
+    message_id: Optional[int] = None,
+    analysis_id: Optional[int] = None,
+) -> None:
+    """单独写入用量记录（未随 AI 分析一起保存时使用）"""
+    if not records:
+        return
+    with get_db("save_usage") as conn:
+        insert_usage(conn.cursor(), records, kind, session_id, message_id, analysis_id)
+
+
+# 用量汇总的聚合列（分组与合计共用）
+_AGGREGATE_COLUMNS = """
+    COUNT(*) AS calls,
+    SUM(cached) AS cached_calls,
+    SUM(estimated) AS estimated_calls,
+    SUM(prompt_tokens) AS prompt_tokens,
+    SUM(completion_tokens) AS completion_tokens,
+    SUM(total_tokens) AS total_tokens,
+    SUM(cost) AS cost,
+    AVG(CASE WHEN cached = 0 THEN latency_ms END) AS avg_latency_ms,
+    MAX(latency_ms) AS max_latency_ms
+"""
+
+
+def get_usage_summary(
+    group_by: str = "day",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    session_id: Optional[int] = None,
+    kind: Optional[str] = None,
+) -> UsageSummaryResponse:
+    """按维度汇总用量（since/until 为日期或 ISO 时间，含 since 不含 until）"""
+    column = GROUP_BY_COLUMNS.get(group_by)
+    if column is None:
+        raise ValueError(f"不支持的汇总维度: {group_by}（可选：{'、'.join(GROUP_BY_COLUMNS)}）")
+
+    conditions = []
+    params: list = []
+    if since:
+        conditions.append("created_at >= ?")
+        params.append(since)
+    if until:
+        conditions.append("created_at < ?")
+        params.append(until)
+    if session_id is not None:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    if kind:
+        conditions.append("kind = ?")
+        params.append(kind)
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    order = "group_key ASC" if group_by == "day" else "total_tokens DESC"
+    with get_db("get_usage_summary") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT {column} AS group_key, {_AGGREGATE_COLUMNS}
+            FROM llm_usage
+            {where_clause}
+            GROUP BY group_key
+            ORDER BY {order}
+            """,
+            params
+        )
+        groups = [_row_to_group(row) for row in cursor.fetchall()]
+
+        # 合计单独聚合一次（平均延迟不能由各组平均值求得）
+        cursor.execute(
+            f"SELECT 'total' AS group_key, {_AGGREGATE_COLUMNS} FROM llm_usage {where_clause}",
+            params
+        )
+        totals = _row_to_group(cursor.fetchone())
+
+    return UsageSummaryResponse(groupBy=group_by, items=groups, total=totals)
+
+
+def get_session_usage(session_id: int) -> list[LLMUsageRecord]:
+    """获取会话的全部 LLM 调用记录（按时间顺序）"""
+    with get_db("get_session_usage") as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM llm_usage WHERE session_id = ? ORDER BY id ASC",
+            (session_id,)
+        )
+        rows = cursor.fetchall()
+
+    return [
+        LLMUsageRecord(
+            id=row["id"],
+            kind=row["kind"],
+            sessionId=row["session_id"],
+            messageId=row["message_id"],
+            analysisId=row["analysis_id"],
+            modelId=row["model_id"],
+            baseUrl=row["base_url"],
+            promptVersion=row["prompt_version"],
+            promptTokens=row["prompt_tokens"],
+            completionTokens=row["completion_tokens"],
+            totalTokens=row["total_tokens"],
+            latencyMs=row["latency_ms"],
+            cost=row["cost"],
+            cached=bool(row["cached"]),
+            estimated=bool(row["estimated"]),
+            createdAt=datetime.fromisoformat(row["created_at"]),
+        )
+        for row in rows
+    ]
+
+
+def _row_to_group(row) -> UsageGroup:
+    return UsageGroup(
+        key=str(row["group_key"]) if row["group_key"] is not None else "unknown",
+        calls=row["calls"],
+        cachedCalls=row["cached_calls"] or 0,
+        estimatedCalls=row["estimated_calls"] or 0,
+        promptTokens=row["prompt_tokens"] or 0,
+        completionTokens=row["completion_tokens"] or 0,
+        totalTokens=row["total_tokens"] or 0,
+        cost=round(row["cost"], 6) if row["cost"] is not None else None,
+        avgLatencyMs=round(row["avg_latency_ms"], 1) if row["avg_latency_ms"] is not None else None,
+        maxLatencyMs=row["max_latency_ms"],
+    )
@@ -0,0 +1,111 @@
+"""
+LLM 响应 JSON 提取微基准
+
+对比旧版解析（json.loads + 正则提取）与 app.services.json_extract 在样本语料上的耗时与成功率。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_json_extract [--repeat 2000] [--corpus bench/corpus/llm_responses.jsonl]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from app.services.json_extract import LLMParseError, extract_json_object
+
+DEFAULT_CORPUS = Path(__file__).parent / "corpus" / "llm_responses.jsonl"
+EXPECTED_KEYS = ("suggestedReplies", "extractedInfo", "articleType")
+
+
+def legacy_parse(response_text: str) -> dict:
+    """旧版 parse_llm_response（仅用于对比）"""
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        pass
+
+    json_match = re.search(r"```json\s*(.*?)\s*```", response_text, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    brace_match = re.search(r"\{.*\}", response_text, re.DOTALL)
+    if brace_match:
+        try:
+            return json.loads(brace_match.group())
+        except json.JSONDecodeError:
+            pass
+
+    raise ValueError("无法解析 LLM 响应")
+
+
+def current_parse(response_text: str) -> dict:
+    return extract_json_object(response_text, EXPECTED_KEYS)
+
+
+def load_corpus(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def outcome(parse, text: str) -> str:
+    try:
+        data = parse(text)
+    except LLMParseError as e:
+        return f"error:{e.kind}"
+    except ValueError:
+        return "error"
+    if not any(key in data for key in EXPECTED_KEYS):
+        return "wrong-object"
+    return "ok"
+
+
+def time_per_call(parse, text: str, repeat: int) -> float:
+    """平均单次耗时（微秒），解析失败同样计时"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            parse(text)
+        except ValueError:
+            pass
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{'sample':<24}{'chars':>8}{'legacy µs':>12}{'legacy':>16}{'new µs':>10}{'new':>16}")
+
+    totals = {"legacy": 0.0, "new": 0.0}
+    ok = {"legacy": 0, "new": 0}
+    for sample in corpus:
+        text = sample["text"]
+        legacy_us = time_per_call(legacy_parse, text, args.repeat)
+        new_us = time_per_call(current_parse, text, args.repeat)
+        legacy_outcome = outcome(legacy_parse, text)
+        new_outcome = outcome(current_parse, text)
+
+        totals["legacy"] += legacy_us
+        totals["new"] += new_us
+        ok["legacy"] += legacy_outcome == "ok"
+        ok["new"] += new_outcome == "ok"
+        print(
+            f"{sample['name']:<24}{len(text):>8}{legacy_us:>12.1f}{legacy_outcome:>16}"
+            f"{new_us:>10.1f}{new_outcome:>16}"
+        )
+
+    print(
+        f"\n总计：legacy {totals['legacy']:.1f} µs，成功 {ok['legacy']}/{len(corpus)}；"
+        f"new {totals['new']:.1f} µs，成功 {ok['new']}/{len(corpus)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
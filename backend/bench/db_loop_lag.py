@@ -0,0 +1,143 @@
+"""
+数据库写入压力下的事件循环 lag
+
+在同一进程内以固定间隔 asyncio.sleep 探测事件循环（实际唤醒时间与预期之差即 lag），
+同时由多个协程持续写入消息，另有一个后台线程周期性持有写锁（模拟慢事务）。
+分别以两种方式执行写入并对比 lag：
+    inline    直接在事件循环中调用同步的数据库函数（改造前的做法）
+    executor  通过 await run_in_db(...) 在数据库线程池中执行
+
+用法（在 backend 目录下）：
+    python -m bench.db_loop_lag --writers 16 --duration 5 --hold-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 使用临时数据库，需在导入应用模块之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="xianyu-bench-")
+os.environ.setdefault("DATABASE_PATH", str(Path(_tmp_dir) / "bench.db"))
+
+from app.database import db_executor, init_db, run_in_db  # noqa: E402
+from app.database.database import DATABASE_PATH  # noqa: E402
+from app.models.schemas import CreateMessageRequest, CreateSessionRequest  # noqa: E402
+from app.services import session_service  # noqa: E402
+
+from .load_test import summarize  # noqa: E402
+
+
+async def probe_lag(interval: float, stop: asyncio.Event, samples: list[float]) -> None:
+    """按固定间隔休眠，记录实际唤醒延迟（毫秒）"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def write_loop(mode: str, session_id: int, stop: asyncio.Event, counter: list[int]) -> None:
+    request = CreateMessageRequest(content="你好，想写一篇3000字的新闻稿，明天要", role="buyer")
+    while not stop.is_set():
+        if mode == "inline":
+            session_service._insert_message(session_id, request)
+            # 让出事件循环，否则探测协程完全得不到调度
+            await asyncio.sleep(0)
+        else:
+            await run_in_db(session_service._insert_message, session_id, request)
+        counter[0] += 1
+
+
+def hold_write_lock(hold_ms: float, pause_ms: float, stop: threading.Event) -> None:
+    """周期性开启写事务并持有一段时间，模拟慢写入或锁等待"""
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    try:
+        while not stop.is_set():
+            conn.execute("BEGIN IMMEDIATE")
+            time.sleep(hold_ms / 1000)
+            conn.execute("COMMIT")
+            time.sleep(pause_ms / 1000)
+    finally:
+        conn.close()
+
+
+async def run_mode(mode: str, args: argparse.Namespace, session_ids: list[int]) -> dict:
+    stop = asyncio.Event()
+    lock_stop = threading.Event()
+    lag_samples: list[float] = []
+    counter = [0]
+
+    locker = None
+    if args.hold_ms > 0:
+        locker = threading.Thread(target=hold_write_lock, args=(args.hold_ms, args.pause_ms, lock_stop), daemon=True)
+        locker.start()
+
+    probe = asyncio.ensure_future(probe_lag(args.probe_interval, stop, lag_samples))
+    writers = [
+        asyncio.ensure_future(write_loop(mode, session_ids[i % len(session_ids)], stop, counter))
+        for i in range(args.writers)
+    ]
+
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(probe, *writers)
+    elapsed = time.perf_counter() - started
+
+    lock_stop.set()
+    if locker is not None:
+        locker.join()
+
+    return {
+        "mode": mode,
+        "writes": counter[0],
+        "writesPerSecond": round(counter[0] / elapsed, 1),
+        "lagMs": summarize(lag_samples),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    init_db()
+    session_ids = [
+        session_service.create_session(CreateSessionRequest())["id"]
+        for _ in range(max(args.writers, 1))
+    ]
+
+    results = []
+    for mode in args.modes:
+        result = await run_mode(mode, args, session_ids)
+        lag = result["lagMs"]
+        print(
+            f"{mode:>9}: {result['writesPerSecond']:>8} writes/s  "
+            f"lag p50 {lag.get('p50')} ms  p99 {lag.get('p99')} ms  max {lag.get('max')} ms"
+        )
+        results.append(result)
+
+    db_executor.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["inline", "executor"],
+                        help="逗号分隔：inline, executor")
+    parser.add_argument("--writers", type=int, default=16, help="并发写入协程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种方式的运行时间（秒）")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="lag 探测间隔（秒）")
+    parser.add_argument("--hold-ms", type=float, default=50.0, help="后台线程每次持有写锁的时间（毫秒），0 为不模拟")
+    parser.add_argument("--pause-ms", type=float, default=100.0, help="后台线程两次持锁之间的间隔（毫秒）")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+数据库连接池基准
+
+模拟一次“发送消息并分析”的数据库部分（add_message、get_messages、get_latest_analysis、save_analysis），
+在固定并发下通过 run_in_db 执行，对比两种配置的吞吐量与延迟：
+    baseline  每次操作新建连接、默认 PRAGMA（回滚日志模式，改造前的做法）
+    pooled    复用连接池中的连接，WAL + synchronous=NORMAL 等调优 PRAGMA
+
+每种配置使用独立的临时数据库。
+
+用法（在 backend 目录下）：
+    python -m bench.db_pool --concurrency 1,4,16 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app import config as app_config
+from app.database import database, db_executor, init_db, run_in_db
+from app.models.schemas import CreateMessageRequest, CreateSessionRequest, ExtractedInfoV3
+from app.services import session_service
+
+from .load_test import summarize
+
+MODES = {
+    "baseline": dict(size=0, pragmas={}),
+    "pooled": dict(size=app_config.DB_POOL_SIZE, pragmas=None),
+}
+
+
+def simulate_request(session_id: int, n: int) -> None:
+    """一次分析请求的全部数据库操作（不含 LLM 调用）"""
+    message = session_service._insert_message(
+        session_id, CreateMessageRequest(content=f"想写一篇3000字的新闻稿，第{n}次咨询", role="buyer")
+    )
+    session_service.get_messages(session_id)
+    session_service.get_latest_analysis(session_id)
+    session_service.save_analysis(
+        session_id=session_id,
+        message_id=message.id,
+        suggested_replies=["好的，3000字新闻稿可以写", "请问什么时候要？", "有参考资料吗？"],
+        extracted_info=ExtractedInfoV3(articleType="新闻稿", wordCount=3000),
+        missing_info=["截止时间"],
+        can_quote=True,
+        price_min=240,
+        price_max=480,
+        price_basis="80-160元/千字 × 3千字",
+        quick_tags=["确认需求"],
+    )
+
+
+async def run_level(concurrency: int, total: int, session_ids: list[int]) -> dict:
+    latencies: list[float] = []
+    counter = iter(range(total))
+
+    async def worker(index: int) -> None:
+        session_id = session_ids[index % len(session_ids)]
+        for n in counter:
+            started = time.perf_counter()
+            await run_in_db(simulate_request, session_id, n)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "requestsPerSecond": round(total / elapsed, 1),
+        "latencyMs": summarize(latencies),
+    }
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    path = Path(tempfile.mkdtemp(prefix="xianyu-bench-")) / f"{mode}.db"
+    database.DATABASE_PATH = path
+    database.set_pool(database.ConnectionPool(path, timeout=app_config.DB_POOL_TIMEOUT, **MODES[mode]))
+    init_db()
+
+    session_ids = [
+        session_service.create_session(CreateSessionRequest())["id"]
+        for _ in range(max(args.concurrency))
+    ]
+    levels = []
+    for concurrency in args.concurrency:
+        level = await run_level(concurrency, args.requests, session_ids)
+        latency = level["latencyMs"]
+        print(
+            f"{mode:>8} c={concurrency:<3} {level['requestsPerSecond']:>8} req/s  "
+            f"p50 {latency['p50']} ms  p99 {latency['p99']} ms"
+        )
+        levels.append(level)
+
+    return {"mode": mode, "pool": database.get_pool().snapshot(), "levels": levels}
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    results = [await run_mode(mode, args) for mode in args.modes]
+    db_executor.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=list(MODES),
+                        help="逗号分隔：baseline, pooled")
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1, 4, 16],
+                        help="逗号分隔的并发级别")
+    parser.add_argument("--requests", type=int, default=1000, help="每个并发级别的请求数")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+分析接口端到端压测
+
+在固定并发下持续请求 POST /api/sessions/{id}/analyze（每个并发 worker 使用独立会话），
+同时以固定间隔探测 /health：空闲时与压测中 /health 耗时之差即服务端事件循环的阻塞（lag）。
+输出吞吐量、p50/p95/p99 延迟与事件循环 lag，并保存为 JSON 便于对比多次运行。
+
+默认自动启动模拟 LLM 服务（bench.mock_llm_server）与使用临时数据库的应用进程。
+
+用法（在 backend 目录下）：
+    python -m bench.load_test --concurrency 1,4,16 --requests 200 --latency-ms 300
+    python -m bench.load_test --app-url http://127.0.0.1:8000 --mock-url http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from .mock_llm_server import add_mock_arguments
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT_DIR = Path(__file__).parent / "results"
+
+# 买家消息模板（带序号，避免命中 LLM 响应缓存与单飞合并）
+MESSAGE_TEMPLATES = (
+    "你好，想写一篇新闻稿，大概{words}字，{day}号之前要，第{n}篇",
+    "需要一篇演讲稿，主题是青春奋斗，{words}字左右，第{n}次咨询",
+    "帮忙写个实习报告，{words}字，有参考资料，{day}号交，编号{n}",
+)
+
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(values_ms: list[float]) -> dict:
+    if not values_ms:
+        return {"count": 0}
+    return {
+        "count": len(values_ms),
+        "mean": round(sum(values_ms) / len(values_ms), 2),
+        "p50": round(percentile(values_ms, 50), 2),
+        "p95": round(percentile(values_ms, 95), 2),
+        "p99": round(percentile(values_ms, 99), 2),
+        "max": round(max(values_ms), 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                response = await client.get(url, timeout=1.0)
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"服务未在 {timeout:.0f} 秒内就绪: {url}")
+            await asyncio.sleep(0.2)
+
+
+class HealthProbe:
+    """以固定间隔请求 /health，记录响应耗时（毫秒）"""
+
+    def __init__(self, client: httpx.AsyncClient, interval: float):
+        self.client = client
+        self.interval = interval
+        self.samples: list[float] = []
+        self.failures = 0
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.client.get("/health", timeout=10.0)
+                response.raise_for_status()
+                self.samples.append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                self.failures += 1
+            await asyncio.sleep(self.interval)
+
+
+async def measure_idle(client: httpx.AsyncClient, samples: int = 50) -> dict:
+    """空闲状态下的 /health 基线耗时"""
+    probe = HealthProbe(client, 0.01)
+    task = asyncio.create_task(probe.run())
+    while len(probe.samples) < samples and probe.failures < samples:
+        await asyncio.sleep(0.02)
+    task.cancel()
+    return summarize(probe.samples)
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    llm_config: dict,
+    concurrency: int,
+    total_requests: int,
+    probe_interval: float,
+    idle_p50: float,
+    stream: bool,
+) -> dict:
+    """在指定并发下完成 total_requests 次分析请求"""
+    session_ids = []
+    for _ in range(concurrency):
+        response = await client.post("/api/sessions", json={})
+        response.raise_for_status()
+        session_ids.append(response.json()["id"])
+
+    latencies: list[float] = []
+    outcomes = Counter()
+    counter = iter(range(total_requests))
+
+    async def worker(session_id: int) -> None:
+        for n in counter:
+            template = MESSAGE_TEMPLATES[n % len(MESSAGE_TEMPLATES)]
+            body = {
+                "content": template.format(words=(n % 9 + 1) * 1000, day=n % 28 + 1, n=n),
+                "role": "buyer",
+                "llmConfig": llm_config,
+                "useCache": False,
+            }
+            path = f"/api/sessions/{session_id}/analyze" + ("/stream" if stream else "")
+            started = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", path, json=body) as response:
+                        async for _ in response.aiter_bytes():
+                            pass
+                        outcome = str(response.status_code)
+                else:
+                    response = await client.post(path, json=body)
+                    outcome = str(response.status_code)
+                    if response.status_code == 200 and response.json().get("error"):
+                        outcome = "analysis_error"
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            outcomes[outcome] += 1
+
+    probe = HealthProbe(client, probe_interval)
+    probe_task = asyncio.create_task(probe.run())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(session_id) for session_id in session_ids))
+    elapsed = time.perf_counter() - started
+    probe_task.cancel()
+
+    lag = [max(sample - idle_p50, 0.0) for sample in probe.samples]
+    succeeded = outcomes.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "succeeded": succeeded,
+        "outcomes": dict(outcomes),
+        "durationSeconds": round(elapsed, 3),
+        "throughputRps": round(succeeded / elapsed, 2) if elapsed > 0 else None,
+        "latencyMs": summarize(latencies),
+        "healthMs": summarize(probe.samples),
+        "eventLoopLagMs": summarize(lag),
+        "healthProbeFailures": probe.failures,
+    }
+
+
+def start_process(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+
+def mock_process_args(args: argparse.Namespace, port: int) -> list[str]:
+    """把压测参数中的模拟服务参数转发给 bench.mock_llm_server"""
+    forwarded = [
+        "-m", "bench.mock_llm_server", "--port", str(port),
+        "--latency-ms", str(args.latency_ms),
+        "--latency-spread-ms", str(args.latency_spread_ms),
+        "--latency-dist", args.latency_dist,
+        "--latency-max-ms", str(args.latency_max_ms),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--retry-after", str(args.retry_after),
+        "--stream-chunk-chars", str(args.stream_chunk_chars),
+        "--stream-interval-ms", str(args.stream_interval_ms),
+    ]
+    if args.bodies:
+        forwarded += ["--bodies", str(args.bodies)]
+    if args.no_fence:
+        forwarded.append("--no-fence")
+    if args.seed is not None:
+        forwarded += ["--seed", str(args.seed)]
+    return forwarded
+
+
+async def run(args: argparse.Namespace) -> dict:
+    processes: list[subprocess.Popen] = []
+    tmp_dir = tempfile.TemporaryDirectory(prefix="xianyu-bench-")
+    try:
+        mock_url = args.mock_url
+        if mock_url is None:
+            port = free_port()
+            processes.append(start_process(mock_process_args(args, port), {}))
+            mock_url = f"http://127.0.0.1:{port}/v1"
+        await wait_until_ready(f"{mock_url.rstrip('/')}/models")
+
+        app_url = args.app_url
+        if app_url is None:
+            port = free_port()
+            app_env = {"DATABASE_PATH": str(Path(tmp_dir.name) / "bench.db")}
+            app_env.update(item.split("=", 1) for item in args.app_env)
+            processes.append(start_process(
+                ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning"],
+                app_env,
+            ))
+            app_url = f"http://127.0.0.1:{port}"
+        await wait_until_ready(f"{app_url}/health")
+
+        llm_config = {"baseUrl": mock_url, "apiKey": "bench", "modelId": "mock-model"}
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+            idle = await measure_idle(client)
+            print(f"空闲 /health：p50 {idle.get('p50')} ms，p99 {idle.get('p99')} ms")
+
+            levels = []
+            for concurrency in args.concurrency:
+                level = await run_level(
+                    client,
+                    llm_config,
+                    concurrency,
+                    args.requests,
+                    args.probe_interval,
+                    idle.get("p50", 0.0),
+                    args.stream,
+                )
+                levels.append(level)
+                print_level(level)
+
+        llm_stats = None
+        try:
+            async with httpx.AsyncClient() as client:
+                stats_url = mock_url.rstrip("/").removesuffix("/v1") + "/stats"
+                llm_stats = (await client.get(stats_url, timeout=5.0)).json()
+        except (httpx.HTTPError, ValueError):
+            pass
+
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "label": args.label,
+            "endpoint": "analyze/stream" if args.stream else "analyze",
+            "options": {
+                key: (str(value) if isinstance(value, Path) else value)
+                for key, value in vars(args).items()
+                if key not in ("output",)
+            },
+            "idleHealthMs": idle,
+            "levels": levels,
+            "mockLLM": llm_stats,
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        tmp_dir.cleanup()
+
+
+def print_level(level: dict) -> None:
+    latency = level["latencyMs"]
+    lag = level["eventLoopLagMs"]
+    print(
+        f"并发 {level['concurrency']:>3}：{level['succeeded']}/{level['requests']} 成功，"
+        f"{level['throughputRps']} req/s，"
+        f"延迟 p50/p95/p99 {latency.get('p50')}/{latency.get('p95')}/{latency.get('p99')} ms，"
+        f"loop lag p50/p95/p99 {lag.get('p50')}/{lag.get('p95')}/{lag.get('p99')} ms，"
+        f"结果 {level['outcomes']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1, 4, 16],
+                        help="并发级别，逗号分隔")
+    parser.add_argument("--requests", type=int, default=100, help="每个并发级别的请求总数")
+    parser.add_argument("--stream", action="store_true", help="压测流式分析接口 /analyze/stream")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="/health 探测间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求超时（秒）")
+    parser.add_argument("--app-url", default=None, help="已运行的应用地址（为空时自动启动）")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="自动启动应用时附加的环境变量，可重复")
+    parser.add_argument("--mock-url", default=None, help="已运行的模拟 LLM 地址（含 /v1，为空时自动启动）")
+    parser.add_argument("--label", default="", help="本次运行的备注")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径（默认 bench/results/ 下按时间命名）")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = args.output or DEFAULT_OUTPUT_DIR / f"load_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存：{output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+本地模拟 LLM 服务（OpenAI 兼容）
+
+提供 /v1/chat/completions（含 SSE 流式）与 /v1/models，用于在不调用真实供应商的情况下压测分析链路。
+支持按分布注入延迟、注入 500 错误与 429 限流，响应内容从预置的 JSON 样本中轮流取出。
+
+用法（在 backend 目录下）：
+    python -m bench.mock_llm_server --port 9100 --latency-ms 800 --latency-dist lognormal --error-rate 0.01
+
+应用中的 LLM 配置 baseUrl 填 http://127.0.0.1:9100/v1 即可。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+# 默认响应：符合分析提示词要求的 JSON
+DEFAULT_BODIES = [
+    {
+        "suggestedReplies": [
+            "亲，新闻稿 3000 字明天可以交哦，请问有参考材料吗？",
+            "您好，3000 字新闻稿明天交稿没问题，方便发一下活动资料吗？",
+            "可以的～麻烦把活动材料发我，我按要求来写 ✨",
+        ],
+        "extractedInfo": {
+            "articleType": "新闻稿",
+            "topic": "校园活动报道",
+            "wordCount": 3000,
+            "deadline": "明天",
+            "hasReference": None,
+            "specialRequirements": [],
+        },
+        "missingInfo": ["参考资料"],
+        "canQuote": True,
+        "priceEstimate": {"min": 312, "max": 624, "basis": "80-160元/千字 × 3千字 × 加急系数1.3"},
+        "quickTags": ["确认需求", "询问参考资料"],
+    },
+    {
+        "suggestedReplies": [
+            "亲，请问大概需要多少字、什么时候要呢？",
+            "您好，麻烦说一下字数和交付时间，我给您报价。",
+            "收到～字数和截止时间告诉我一下哦 😊",
+        ],
+        "extractedInfo": {
+            "articleType": "演讲稿",
+            "topic": None,
+            "wordCount": None,
+            "deadline": None,
+            "hasReference": None,
+            "specialRequirements": [],
+        },
+        "missingInfo": ["字数", "截止时间"],
+        "canQuote": False,
+        "priceEstimate": {"min": None, "max": None, "basis": None},
+        "quickTags": ["询问字数", "询问截止时间"],
+    },
+]
+
+
+class MockOptions:
+    """模拟服务参数"""
+
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        latency_spread_ms: float = 200.0,
+        latency_dist: str = "lognormal",
+        latency_max_ms: float = 30000.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        stream_chunk_chars: int = 16,
+        stream_interval_ms: float = 5.0,
+        bodies: Optional[list[str]] = None,
+        fenced: bool = True,
+        seed: Optional[int] = None,
+    ):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {latency_dist}")
+        self.latency_ms = latency_ms
+        self.latency_spread_ms = latency_spread_ms
+        self.latency_dist = latency_dist
+        self.latency_max_ms = latency_max_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_chunk_chars = max(stream_chunk_chars, 1)
+        self.stream_interval_ms = stream_interval_ms
+        self.bodies = bodies or [json.dumps(body, ensure_ascii=False) for body in DEFAULT_BODIES]
+        self.fenced = fenced
+        self.random = random.Random(seed)
+
+    def sample_latency(self) -> float:
+        """按配置的分布采样一次响应延迟（秒）"""
+        mean = self.latency_ms
+        spread = self.latency_spread_ms
+        if self.latency_dist == "fixed" or mean <= 0:
+            value = mean
+        elif self.latency_dist == "uniform":
+            value = self.random.uniform(mean - spread, mean + spread)
+        elif self.latency_dist == "normal":
+            value = self.random.gauss(mean, spread)
+        else:
+            # 对数正态（长尾）：均值为 mean、标准差为 spread
+            sigma2 = math.log(1 + (spread / mean) ** 2)
+            value = self.random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return min(max(value, 0.0), self.latency_max_ms) / 1000
+
+
+def load_bodies(path: Path) -> list[str]:
+    """
+    读取预置响应（JSONL）：每行为 {"content": "原始文本"}，或直接是要返回的 JSON 对象
+    """
+    bodies = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict) and isinstance(item.get("content"), str):
+                bodies.append(item["content"])
+            elif isinstance(item, dict) and isinstance(item.get("text"), str):
+                bodies.append(item["text"])
+            else:
+                bodies.append(json.dumps(item, ensure_ascii=False))
+    return bodies
+
+
+def create_app(options: MockOptions) -> FastAPI:
+    """创建模拟服务应用"""
+    app = FastAPI(title="Mock LLM")
+    bodies = itertools.cycle(options.bodies)
+    stats = Counter()
+
+    def next_content() -> str:
+        body = next(bodies)
+        return f"```json\n{body}\n```" if options.fenced else body
+
+    def injected_error() -> Optional[JSONResponse]:
+        roll = options.random.random()
+        if roll < options.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                headers={"Retry-After": f"{options.retry_after:g}"},
+            )
+        if roll < options.rate_limit_rate + options.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected server error", "type": "server_error"}},
+            )
+        return None
+
+    @app.get("/v1/models")
+    @app.get("/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "bench"}]}
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        stats["requests"] += 1
+        model = payload.get("model", "mock-model")
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+
+        await asyncio.sleep(options.sample_latency())
+        error = injected_error()
+        if error is not None:
+            return error
+
+        content = next_content()
+        usage = {
+            "prompt_tokens": prompt_chars // 2,
+            "completion_tokens": len(content) // 2,
+            "total_tokens": prompt_chars // 2 + len(content) // 2,
+        }
+        created = int(time.time())
+
+        if not payload.get("stream"):
+            stats["completed"] += 1
+            return {
+                "id": f"chatcmpl-mock-{stats['requests']}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        async def events():
+            step = options.stream_chunk_chars
+            for start in range(0, len(content), step):
+                chunk = {
+                    "id": f"chatcmpl-mock-{stats['requests']}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if options.stream_interval_ms > 0:
+                    await asyncio.sleep(options.stream_interval_ms / 1000)
+            stats["completed"] += 1
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        """已处理请求数（压测脚本用于核对实际到达 LLM 的调用次数）"""
+        return dict(stats)
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟服务的命令行参数（load_test 复用）"""
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="延迟均值（毫秒）")
+    parser.add_argument("--latency-spread-ms", type=float, default=200.0,
+                        help="延迟离散程度（毫秒）：uniform 为半宽，normal/lognormal 为标准差")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-max-ms", type=float, default=30000.0, help="延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--stream-chunk-chars", type=int, default=16, help="流式响应每段字符数")
+    parser.add_argument("--stream-interval-ms", type=float, default=5.0, help="流式响应分段间隔（毫秒）")
+    parser.add_argument("--bodies", type=Path, default=None, help="预置响应 JSONL 文件")
+    parser.add_argument("--no-fence", action="store_true", help="响应不包裹 ```json 代码块")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def options_from_args(args: argparse.Namespace) -> MockOptions:
+    return MockOptions(
+        latency_ms=args.latency_ms,
+        latency_spread_ms=args.latency_spread_ms,
+        latency_dist=args.latency_dist,
+        latency_max_ms=args.latency_max_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        stream_chunk_chars=args.stream_chunk_chars,
+        stream_interval_ms=args.stream_interval_ms,
+        bodies=load_bodies(args.bodies) if args.bodies else None,
+        fenced=not args.no_fence,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(options_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
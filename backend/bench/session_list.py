@@ -0,0 +1,161 @@
+"""
+会话列表查询基准
+
+在临时数据库中逐步生成会话（每个会话若干条消息），在各数据量下对比会话列表第一页的查询耗时：
+    legacy   改造前的查询：每行两个关联子查询（首条消息、消息数）
+    current  session_service.get_session_list（读取触发器维护的冗余列）
+并对比翻到列表中部（--deep 指定位置比例）时的耗时：
+    offset   page 参数（LIMIT/OFFSET，并统计总数）
+    cursor   nextCursor 游标（沿 (updated_at, id) 索引定位，不统计总数）
+
+用法（在 backend 目录下）：
+    python -m bench.session_list --sizes 1000,10000,100000 --messages 6
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 使用临时数据库，需在导入应用模块之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="xianyu-bench-")
+os.environ.setdefault("DATABASE_PATH", str(Path(_tmp_dir) / "bench.db"))
+
+from app.database import get_db, init_db  # noqa: E402
+from app.services import session_service  # noqa: E402
+
+from .load_test import summarize  # noqa: E402
+
+# 改造前 sessions 表没有 updated_at 索引，以 NOT INDEXED 还原当时的执行计划
+LEGACY_LIST_SQL = """
+    SELECT
+        s.id, s.status, s.deal_status, s.deal_price, s.article_type, s.created_at, s.updated_at,
+        (SELECT content FROM messages WHERE session_id = s.id ORDER BY created_at ASC LIMIT 1) as first_message,
+        (SELECT COUNT(*) FROM messages WHERE session_id = s.id) as message_count
+    FROM sessions s NOT INDEXED
+    ORDER BY s.updated_at DESC
+    LIMIT ? OFFSET ?
+"""
+
+SAMPLE_MESSAGES = (
+    "你好，想写一篇新闻稿，大概3000字，明天要",
+    "可以的，请问有参考资料吗？",
+    "有的，我发你看看，另外能加急吗",
+    "可以加急，加急费用是原价的1.3倍",
+    "好的，那就这样定了",
+    "好的，写完发您确认~",
+)
+
+
+def populate(start: int, count: int, messages_per_session: int) -> None:
+    """追加 count 个会话，每个会话 messages_per_session 条消息（消息插入触发器维护冗余列）"""
+    base = datetime(2024, 1, 1)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        sessions = []
+        for i in range(start, start + count):
+            created = base + timedelta(minutes=i)
+            updated = created + timedelta(minutes=random.randint(0, 60 * 24 * 30))
+            sessions.append((i + 1, random.choice(("active", "closed")), created.isoformat(), updated.isoformat()))
+        cursor.executemany(
+            "INSERT INTO sessions (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            sessions
+        )
+        cursor.executemany(
+            "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    session_id,
+                    "buyer" if n % 2 == 0 else "seller",
+                    SAMPLE_MESSAGES[n % len(SAMPLE_MESSAGES)],
+                    (datetime.fromisoformat(created) + timedelta(seconds=n)).isoformat(),
+                )
+                for session_id, _, created, _ in sessions
+                for n in range(messages_per_session)
+            ]
+        )
+
+
+def time_call(fn, repeats: int) -> dict:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def deep_cursor(position: int) -> str:
+    """构造指向第 position 行之后的游标（与上一页返回的 nextCursor 相同）"""
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT id, updated_at FROM sessions ORDER BY updated_at DESC, id DESC LIMIT 1 OFFSET ?",
+            (position - 1,)
+        ).fetchone()
+    return session_service._encode_cursor({"u": row["updated_at"], "i": row["id"]})
+
+
+def legacy_list(page_size: int) -> None:
+    with get_db() as conn:
+        conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        conn.execute(LEGACY_LIST_SQL, (page_size, 0)).fetchall()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=lambda value: [int(v) for v in value.split(",")], default=[1000, 10000, 100000],
+                        help="逗号分隔的会话数量（逐步追加）")
+    parser.add_argument("--messages", type=int, default=6, help="每个会话的消息数")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20, help="每个数据量下的查询次数")
+    parser.add_argument("--deep", type=float, default=0.5, help="深翻页位置（占会话总数的比例）")
+    parser.add_argument("--skip-legacy", action="store_true", help="不测改造前的查询（数据量很大时较慢）")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    init_db()
+    random.seed(42)
+
+    results = []
+    populated = 0
+    for size in args.sizes:
+        populate(populated, size - populated, args.messages)
+        populated = size
+
+        result = {
+            "sessions": size,
+            "current": time_call(lambda: session_service.get_session_list(page_size=args.page_size), args.repeats),
+        }
+        if not args.skip_legacy:
+            result["legacy"] = time_call(lambda: legacy_list(args.page_size), max(args.repeats // 4, 1))
+
+        deep_page = max(int(size * args.deep) // args.page_size, 1) + 1
+        cursor = deep_cursor((deep_page - 1) * args.page_size)
+        result["deepPage"] = deep_page
+        result["offset"] = time_call(
+            lambda: session_service.get_session_list(page=deep_page, page_size=args.page_size), args.repeats
+        )
+        result["cursor"] = time_call(
+            lambda: session_service.get_session_list(page_size=args.page_size, cursor=cursor), args.repeats
+        )
+        results.append(result)
+
+        line = f"{size:>8} sessions  current p50 {result['current']['p50']} ms"
+        if "legacy" in result:
+            line += f"  legacy p50 {result['legacy']['p50']} ms"
+        line += (
+            f"  | page {deep_page}: offset p50 {result['offset']['p50']} ms"
+            f"  cursor p50 {result['cursor']['p50']} ms"
+        )
+        print(line)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+会话搜索基准
+
+在临时数据库中生成会话与消息（默认 10 万会话 × 10 条消息 = 100 万条消息），
+对若干搜索词对比会话搜索第一页（含总数与高亮片段）的耗时：
+    fts   全文索引搜索（session_service.get_session_list，trigram + BM25 排序）
+    like  LIKE 降级搜索（无全文索引或搜索词少于 3 个字符时的路径）
+
+用法（在 backend 目录下）：
+    python -m bench.session_search --sessions 100000 --messages 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 使用临时数据库，需在导入应用模块之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="xianyu-bench-")
+os.environ.setdefault("DATABASE_PATH", str(Path(_tmp_dir) / "bench.db"))
+
+from app.database import get_db, init_db  # noqa: E402
+from app.services import session_service  # noqa: E402
+
+from .load_test import summarize  # noqa: E402
+
+ARTICLE_TYPES = ("新闻稿", "演讲稿", "读后感", "工作总结", "论文润色", "公众号推文", "产品文案", "述职报告")
+TOPICS = ("乡村振兴", "校园文化节", "年度营收", "人工智能", "志愿服务", "安全生产", "品牌发布会", "毕业典礼")
+TEMPLATES = (
+    "你好，想写一篇{type}，主题是{topic}，大概{words}字",
+    "可以的，{type}一般{price}元/千字，请问什么时候要？",
+    "{deadline}要，有参考资料，关于{topic}的",
+    "好的，{topic}这类{type}我们写过很多，可以加急",
+    "加急的话费用是原价的1.3倍，{deadline}前交稿",
+    "那就这样定了，{words}字的{type}",
+)
+DEADLINES = ("明天", "后天", "周五", "下周一", "月底")
+
+# (搜索词, 说明)
+QUERIES = (
+    ("新闻稿", "常见词"),
+    ("乡村振兴", "主题词"),
+    ("毕业典礼 演讲稿", "多个词"),
+    ("不存在的关键词", "无结果"),
+)
+
+
+def populate(sessions: int, messages_per_session: int, batch: int = 2000) -> None:
+    """生成会话与消息（消息插入时触发器同步维护冗余列与全文索引）"""
+    base = datetime(2024, 1, 1)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        for start in range(0, sessions, batch):
+            session_rows = []
+            message_rows = []
+            for i in range(start, min(start + batch, sessions)):
+                created = base + timedelta(minutes=i)
+                updated = created + timedelta(minutes=random.randint(0, 60 * 24 * 30))
+                fields = dict(
+                    type=random.choice(ARTICLE_TYPES),
+                    topic=random.choice(TOPICS),
+                    words=random.choice((800, 1500, 3000, 5000)),
+                    price=random.choice((60, 80, 120, 160)),
+                    deadline=random.choice(DEADLINES),
+                )
+                session_rows.append((
+                    i + 1, random.choice(("active", "closed")),
+                    f"{fields['type']}，{fields['topic']}，{fields['words']}字，{fields['deadline']}交",
+                    created.isoformat(), updated.isoformat(),
+                ))
+                for n in range(messages_per_session):
+                    message_rows.append((
+                        i + 1,
+                        "buyer" if n % 2 == 0 else "seller",
+                        TEMPLATES[n % len(TEMPLATES)].format(**fields),
+                        (created + timedelta(seconds=n)).isoformat(),
+                    ))
+            cursor.executemany(
+                "INSERT INTO sessions (id, status, requirement_summary, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                session_rows
+            )
+            cursor.executemany(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                message_rows
+            )
+
+
+def time_call(fn, repeats: int) -> tuple[dict, object]:
+    samples = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples), result
+
+
+def like_search(search: str, page_size: int):
+    with get_db() as conn:
+        return session_service._search_sessions_like(
+            conn.cursor(), session_service._search_terms(search), [], [], page_size, 0, True
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000, help="会话数")
+    parser.add_argument("--messages", type=int, default=10, help="每个会话的消息数")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10, help="每个搜索词的查询次数")
+    parser.add_argument("--skip-like", action="store_true", help="不测 LIKE 降级搜索（数据量很大时较慢）")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    init_db()
+    random.seed(42)
+
+    started = time.perf_counter()
+    populate(args.sessions, args.messages)
+    print(f"populated {args.sessions} sessions / {args.sessions * args.messages} messages "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    results = []
+    for search, label in QUERIES:
+        fts, response = time_call(
+            lambda: session_service.get_session_list(page_size=args.page_size, search=search), args.repeats
+        )
+        result = {"search": search, "label": label, "total": response.total, "fts": fts}
+        line = f"{label:>6} {search!r:<14} total {response.total:>7}  fts p50 {fts['p50']} ms"
+        if not args.skip_like:
+            like, (like_total, _, _) = time_call(lambda: like_search(search, args.page_size), max(args.repeats // 4, 1))
+            result["like"] = like
+            line += f"  like p50 {like['p50']} ms"
+            if like_total != response.total:
+                line += f"  (like total {like_total})"
+        results.append(result)
+        print(line)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
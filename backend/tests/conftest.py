@@ -0,0 +1,23 @@
+"""
+测试公共配置
+使用临时数据库，需在导入应用模块之前设置
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="xianyu-test-")
+os.environ.setdefault("DATABASE_PATH", str(Path(_tmp_dir) / "test.db"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def db():
+    """初始化临时数据库"""
+    from app.database import init_db
+
+    init_db()
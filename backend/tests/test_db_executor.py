@@ -0,0 +1,63 @@
+"""慢查询通过 run_in_db 在数据库线程中执行，不阻塞事件循环"""
+import asyncio
+import time
+
+from app.database import get_db, run_in_db
+
+# 探测间隔与允许的 p99 lag（毫秒）；基准 bench.db_loop_lag 中 executor 约 3 ms，直接同步调用约 73 ms
+PROBE_INTERVAL = 0.005
+MAX_P99_LAG_MS = 30
+# 慢查询：递归 CTE 计数，单次约数百毫秒
+SLOW_QUERY = """
+    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 500000)
+    SELECT COUNT(*) FROM c
+"""
+
+
+def _slow_query() -> int:
+    with get_db("test_slow_query") as conn:
+        return conn.execute(SLOW_QUERY).fetchone()[0]
+
+
+def _p99(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+
+
+async def _measure_lag(work) -> tuple[list[float], float]:
+    """执行 work() 期间按固定间隔探测事件循环 lag，返回 (lag 样本（毫秒）, work 耗时（秒）)"""
+    samples: list[float] = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            samples.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+    prober = asyncio.ensure_future(probe())
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    try:
+        await work()
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+    return samples, elapsed
+
+
+def test_slow_query_in_executor_keeps_loop_responsive(db):
+    async def inline():
+        _slow_query()
+
+    async def executor():
+        await asyncio.gather(*(run_in_db(_slow_query) for _ in range(2)))
+
+    # 对照：直接在事件循环中执行同一查询会卡住探测协程
+    inline_samples, inline_elapsed = asyncio.run(_measure_lag(inline))
+    assert max(inline_samples) > MAX_P99_LAG_MS, (inline_elapsed, max(inline_samples))
+
+    samples, elapsed = asyncio.run(_measure_lag(executor))
+    assert elapsed * 1000 > MAX_P99_LAG_MS * 3
+    assert _p99(samples) < MAX_P99_LAG_MS, sorted(samples)[-5:]
@@ -0,0 +1,46 @@
+"""简单消息的本地模板回复只用于对话开头"""
+import pytest
+
+from app.models.schemas import ExtractedInfoV3
+from app.services import llm_service, pre_extractor
+
+
+def _messages(*contents: str) -> list[dict]:
+    roles = ["buyer", "seller"]
+    return [
+        {"role": roles[(len(contents) - 1 - index) % 2], "content": content}
+        for index, content in enumerate(contents)
+    ]
+
+
+def _should_reply_locally(messages, accumulated_info=None, history_summary=None) -> bool:
+    pre = pre_extractor.extract(messages[-1]["content"])
+    return llm_service._should_reply_locally(pre, messages, accumulated_info, history_summary)
+
+
+@pytest.mark.parametrize("content", ["在吗", "谢谢"])
+def test_conversation_start_replies_locally(content):
+    assert _should_reply_locally(_messages(content))
+
+
+def test_greeting_mid_conversation_goes_to_llm():
+    messages = _messages("帮我写个新闻稿3000字明天要", "好的亲，稍等我看一下", "在吗")
+    assert not _should_reply_locally(messages)
+
+
+def test_greeting_with_accumulated_info_goes_to_llm():
+    info = ExtractedInfoV3(articleType="新闻稿", wordCount=3000, deadline="明天")
+    assert not _should_reply_locally(_messages("在吗"), accumulated_info=info)
+
+
+def test_thanks_with_history_summary_goes_to_llm():
+    assert not _should_reply_locally(_messages("谢谢"), history_summary="买家需要一篇3000字新闻稿，明天交稿")
+
+
+def test_ack_requires_flag(monkeypatch):
+    monkeypatch.setattr(llm_service.app_config, "LOCAL_REPLY_ACK_ENABLED", False)
+    assert not _should_reply_locally(_messages("好的"))
+
+    monkeypatch.setattr(llm_service.app_config, "LOCAL_REPLY_ACK_ENABLED", True)
+    assert _should_reply_locally(_messages("好的"))
+    assert not _should_reply_locally(_messages("帮我写个新闻稿3000字明天要", "报价200元", "好的"))
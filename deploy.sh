@@ -28,6 +28,7 @@ echo -e "${YELLOW}[1/3] 打包项目...${NC}"
 tar --exclude='node_modules' \
     --exclude='.git' \
     --exclude='backend/data/xianyu.db' \
+    --exclude='backend/data/xianyu.db-*' \
     --exclude='backend/venv' \
     --exclude='__pycache__' \
     --exclude='.DS_Store' \
@@ -44,8 +45,26 @@ echo -e "${YELLOW}[3/3] 服务器部署...${NC}"
 ssh ${SERVER} << 'ENDSSH'
 cd /www/wwwroot
 
-# 备份数据库和虚拟环境
-cp xianyu_answer/backend/data/xianyu.db ~/xianyu.db.backup 2>/dev/null || true
+DB=xianyu_answer/backend/data/xianyu.db
+
+# 备份数据库：服务仍在运行，直接复制主文件和 -wal 文件可能得到不一致的快照，
+# 这里用 SQLite 在线备份生成包含 WAL 中全部已提交事务的单个文件（失败时中止部署）
+rm -f ~/xianyu.db.backup ~/xianyu.db-wal.backup
+if [ -f "$DB" ]; then
+    if command -v sqlite3 > /dev/null 2>&1; then
+        sqlite3 "$DB" ".backup $HOME/xianyu.db.backup"
+    else
+        PY=xianyu_answer/backend/venv/bin/python
+        [ -x "$PY" ] || PY=python3
+        "$PY" -c 'import sqlite3, sys
+src, dst = sqlite3.connect(sys.argv[1]), sqlite3.connect(sys.argv[2])
+src.backup(dst)
+dst.close()
+src.close()' "$DB" ~/xianyu.db.backup
+    fi || { echo "数据库备份失败，已中止部署"; exit 1; }
+fi
+
+# 备份虚拟环境
 mv xianyu_answer/backend/venv ~/venv.backup 2>/dev/null || true
 
 # 解压新代码
@@ -53,10 +72,17 @@ rm -rf xianyu_answer
 mkdir xianyu_answer
 tar -xzvf xianyu_answer.tar.gz -C xianyu_answer > /dev/null 2>&1
 
-# 恢复数据库和虚拟环境
-cp ~/xianyu.db.backup xianyu_answer/backend/data/xianyu.db 2>/dev/null || true
+# 恢复数据库（只恢复本次备份的主文件，不使用任何 -wal/-shm 文件）和虚拟环境
+if [ -f ~/xianyu.db.backup ]; then
+    mkdir -p xianyu_answer/backend/data
+    mv ~/xianyu.db.backup "$DB"
+fi
+rm -f "$DB-wal" "$DB-shm"
 mv ~/venv.backup xianyu_answer/backend/venv 2>/dev/null || true
 
+# 执行数据库迁移（重启后服务只检查结构版本）
+(cd xianyu_answer/backend && venv/bin/python -m app.database.migrate)
+
 # 构建前端
 cd xianyu_answer/frontend
 rm -rf dist 2>/dev/null || true
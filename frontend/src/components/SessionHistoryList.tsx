@@ -3,7 +3,7 @@
  * 用于历史记录页面中展示对话会话
  */
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import type { SessionStatus, SessionDealStatus, SessionSummary } from '../types';
 import { useSessionList } from '../hooks/useSession';
 import { deleteSession } from '../services/sessionApi';
@@ -46,11 +46,12 @@ export function SessionHistoryList({ onSelectSession }: SessionHistoryListProps)
   const {
     sessions,
     total,
-    page,
-    totalPages,
+    hasMore,
     isLoading,
+    isLoadingMore,
     error,
     fetchSessions,
+    loadMore,
     refresh,
   } = useSessionList();
 
@@ -88,15 +89,19 @@ export function SessionHistoryList({ onSelectSession }: SessionHistoryListProps)
     return () => clearTimeout(timer);
   }, [searchQuery]);
 
-  // 翻页
-  const handlePageChange = (newPage: number) => {
-    fetchSessions({
-      page: newPage,
-      status: statusFilter || undefined,
-      dealStatus: dealStatusFilter || undefined,
-      search: searchQuery || undefined,
-    });
-  };
+  // 无限滚动：列表底部进入视口时按游标加载下一页
+  const loadMoreRef = useRef<HTMLDivElement>(null);
+  useEffect(() => {
+    const sentinel = loadMoreRef.current;
+    if (!sentinel || !hasMore) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) {
+        loadMore();
+      }
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, loadMore]);
 
   // 删除会话
   const handleDelete = async (sessionId: number) => {
@@ -258,9 +263,16 @@ export function SessionHistoryList({ onSelectSession }: SessionHistoryListProps)
                       </span>
                     )}
                   </div>
-                  <p className="text-sm text-gray-600 truncate">
-                    {session.previewMessage || '(无消息)'}
-                  </p>
+                  {session.snippet ? (
+                    <p
+                      className="text-sm text-gray-600 truncate [&_mark]:bg-yellow-100 [&_mark]:text-gray-800"
+                      dangerouslySetInnerHTML={{ __html: session.snippet }}
+                    />
+                  ) : (
+                    <p className="text-sm text-gray-600 truncate">
+                      {session.previewMessage || '(无消息)'}
+                    </p>
+                  )}
                   <div className="flex items-center gap-3 mt-2 text-xs text-gray-400">
                     <span>{session.messageCount} 条消息</span>
                   </div>
@@ -314,30 +326,24 @@ export function SessionHistoryList({ onSelectSession }: SessionHistoryListProps)
         )}
       </div>
 
-      {/* 分页 */}
-      {totalPages > 1 && (
+      {/* 加载更多 */}
+      {sessions.length > 0 && (
         <div className="flex items-center justify-between px-4 py-3 border-t border-gray-200">
           <span className="text-sm text-gray-500">
             共 {total} 条记录
           </span>
-          <div className="flex items-center gap-2">
-            <button
-              onClick={() => handlePageChange(page - 1)}
-              disabled={page <= 1 || isLoading}
-              className="px-3 py-1 border border-gray-300 rounded hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
-            >
-              上一页
-            </button>
-            <span className="text-sm text-gray-600">
-              {page} / {totalPages}
-            </span>
-            <button
-              onClick={() => handlePageChange(page + 1)}
-              disabled={page >= totalPages || isLoading}
-              className="px-3 py-1 border border-gray-300 rounded hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
-            >
-              下一页
-            </button>
+          <div ref={loadMoreRef}>
+            {hasMore ? (
+              <button
+                onClick={() => loadMore()}
+                disabled={isLoadingMore}
+                className="px-3 py-1 border border-gray-300 rounded hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {isLoadingMore ? '加载中...' : '加载更多'}
+              </button>
+            ) : (
+              <span className="text-sm text-gray-400">没有更多了</span>
+            )}
           </div>
         </div>
       )}
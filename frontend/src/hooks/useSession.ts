@@ -27,7 +27,9 @@ interface UseSessionListReturn {
   page: number;
   pageSize: number;
   totalPages: number;
+  hasMore: boolean;
   isLoading: boolean;
+  isLoadingMore: boolean;
   error: string | null;
   fetchSessions: (params?: {
     page?: number;
@@ -36,6 +38,7 @@ interface UseSessionListReturn {
     dealStatus?: SessionDealStatus;
     search?: string;
   }) => Promise<void>;
+  loadMore: () => Promise<void>;
   refresh: () => Promise<void>;
 }
 
@@ -65,7 +68,9 @@ export function useSessionList(): UseSessionListReturn {
   const [page, setPage] = useState(1);
   const [pageSize, setPageSize] = useState(20);
   const [totalPages, setTotalPages] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [lastParams, setLastParams] = useState<{
     page?: number;
@@ -89,10 +94,11 @@ export function useSessionList(): UseSessionListReturn {
     try {
       const response = await getSessionList(params);
       setSessions(response.items);
-      setTotal(response.total);
-      setPage(response.page);
+      setTotal(response.total ?? 0);
+      setPage(response.page ?? 1);
       setPageSize(response.pageSize);
-      setTotalPages(response.totalPages);
+      setTotalPages(response.totalPages ?? 1);
+      setNextCursor(response.nextCursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : '获取会话列表失败');
     } finally {
@@ -100,6 +106,23 @@ export function useSessionList(): UseSessionListReturn {
     }
   }, []);
 
+  // 按游标追加下一页（无限滚动），每页耗时与已加载的数量无关
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    setError(null);
+
+    try {
+      const response = await getSessionList({ ...lastParams, page: undefined, cursor: nextCursor });
+      setSessions(prev => [...prev, ...response.items]);
+      setNextCursor(response.nextCursor);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : '获取会话列表失败');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  }, [nextCursor, isLoadingMore, lastParams]);
+
   const refresh = useCallback(async () => {
     await fetchSessions(lastParams);
   }, [fetchSessions, lastParams]);
@@ -110,9 +133,12 @@ export function useSessionList(): UseSessionListReturn {
     page,
     pageSize,
     totalPages,
+    hasMore: nextCursor !== null,
     isLoading,
+    isLoadingMore,
     error,
     fetchSessions,
+    loadMore,
     refresh,
   };
 }
@@ -49,6 +49,7 @@ export async function getSessionList(params: {
   status?: SessionStatus;
   dealStatus?: SessionDealStatus;
   search?: string;
+  cursor?: string;
 } = {}): Promise<SessionListResponse> {
   const searchParams = new URLSearchParams();
 
@@ -57,6 +58,7 @@ export async function getSessionList(params: {
   if (params.status) searchParams.set('status', params.status);
   if (params.dealStatus) searchParams.set('dealStatus', params.dealStatus);
   if (params.search) searchParams.set('search', params.search);
+  if (params.cursor) searchParams.set('cursor', params.cursor);
 
   const url = `${API_BASE}/sessions?${searchParams.toString()}`;
   const response = await fetch(url);
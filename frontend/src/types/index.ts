@@ -65,16 +65,19 @@ export interface SessionSummary {
   articleType: string | null;
   previewMessage: string;
   messageCount: number;
+  lastMessageAt: string | null;
+  snippet?: string | null; // 搜索命中的高亮片段（后端已转义 HTML，命中处为 <mark>）
   createdAt: string;
   updatedAt: string;
 }
 
 export interface SessionListResponse {
   items: SessionSummary[];
-  total: number;
-  page: number;
+  total: number | null; // 按游标翻页时为 null
+  page: number | null;
   pageSize: number;
-  totalPages: number;
+  totalPages: number | null;
+  nextCursor: string | null; // 下一页游标，没有更多数据时为 null
 }
 
 export interface CreateSessionRequest {